@@ -1,5 +1,8 @@
 from kybra import (Record, Variant, Vec, query, update, Opt, Principal, ic, StableBTreeMap, 
-                   init, post_upgrade, pre_upgrade, void, nat64, float64, text, nat)
+                   init, post_upgrade, pre_upgrade, void, nat64, float64, text, nat, blob, Async, match)
+from kybra.canisters.management import management_canister
+import hashlib
+import operator
 
 # User Management Data Structures
 class User(Record):
@@ -26,6 +29,7 @@ class UpdateUserParams(Record):
 class ListUsersParams(Record):
     skip: nat64
     limit: nat64
+    cursor: Opt[str]  # opaque cursor from a previous next_cursor
 
 # Error Handling
 class Error(Variant):
@@ -53,6 +57,7 @@ class ListUsersResponse(Record):
     total: nat64
     skip: nat64
     limit: nat64
+    next_cursor: Opt[str]
 
 class ListUsersResult(Variant):
     Ok: 'ListUsersResponse'
@@ -81,6 +86,22 @@ class Assessment(Record):
     updated_at: nat64
     is_active: bool
 
+class AssessmentHeader(Record):
+    id: str
+    title: str
+    description: str
+    question_count: nat64  # questions live in assessment_questions_storage
+    time_limit: nat64  # in seconds
+    passing_score: nat64  # percentage
+    skill_id: str
+    creator_id: Principal
+    created_at: nat64
+    updated_at: nat64
+    is_active: bool
+
+class QuestionChunk(Record):
+    questions: Vec['Question']
+
 class CreateAssessmentParams(Record):
     title: str
     description: str
@@ -93,6 +114,8 @@ class ListAssessmentsParams(Record):
     skip: nat64
     limit: nat64
     skill_id: Opt[str]
+    cursor: Opt[str]  # opaque cursor from a previous next_cursor
+    projection: Opt[str]  # "summary" (default, no questions) or "full"
 
 class AssessmentResult(Record):
     id: str
@@ -114,6 +137,7 @@ class ListAssessmentsResponse(Record):
     total: nat64
     skip: nat64
     limit: nat64
+    next_cursor: Opt[str]
 
 class GetAssessmentResult(Variant):
     Ok: 'Assessment'
@@ -131,6 +155,38 @@ class SubmitAssessmentResult(Variant):
     Ok: 'AssessmentResult'
     Err: 'Error'
 
+class SubmitAssessmentsBatchResponse(Record):
+    outcomes: Vec['SubmitAssessmentResult']  # one per processed submission, in order
+    processed: nat64  # submissions graded in this call
+    remaining: nat64  # trailing submissions left for a follow-up call
+
+class SubmitAssessmentsBatchResult(Variant):
+    Ok: 'SubmitAssessmentsBatchResponse'
+    Err: 'Error'
+
+class AssessmentStats(Record):
+    assessment_id: str
+    attempt_count: nat64
+    pass_count: nat64
+    score_sum: nat64
+    score_sum_squares: nat64
+    time_taken_sum: nat64  # in seconds
+    question_correct_counts: Vec[nat64]  # one entry per question
+    score_histogram: Vec[nat64]  # SCORE_HISTOGRAM_BUCKETS buckets of 10 points
+
+class AssessmentStatsResponse(Record):
+    stats: 'AssessmentStats'
+    pass_rate: float64  # percentage
+    mean_score: float64
+    median_score: float64  # interpolated from the score histogram
+    score_std_dev: float64
+    average_time_taken: float64  # in seconds
+    question_p_values: Vec[float64]  # share of attempts answering correctly
+
+class GetAssessmentStatsResult(Variant):
+    Ok: 'AssessmentStatsResponse'
+    Err: 'Error'
+
 # Course Service Data Structures
 class CourseModule(Record):
     id: str
@@ -155,6 +211,20 @@ class Course(Record):
     is_published: bool
     enrollment_count: nat64
 
+class CourseSummary(Record):
+    id: str
+    title: str
+    description: str
+    module_count: nat64  # modules stay in courses_storage
+    skill_id: str
+    difficulty: str
+    estimated_duration: nat64  # in minutes
+    creator_id: Principal
+    created_at: nat64
+    updated_at: nat64
+    is_published: bool
+    enrollment_count: nat64
+
 class CreateCourseParams(Record):
     title: str
     description: str
@@ -169,6 +239,9 @@ class ListCoursesParams(Record):
     skill_id: Opt[str]
     difficulty: Opt[str]
     published_only: Opt[bool]
+    creator_id: Opt[Principal]
+    cursor: Opt[str]  # opaque cursor from a previous next_cursor
+    projection: Opt[str]  # "summary" (default, no modules) or "full"
 
 class CourseProgress(Record):
     id: str
@@ -180,6 +253,13 @@ class CourseProgress(Record):
     last_accessed: nat64
     completed_at: Opt[nat64]
 
+class CourseProgressState(Record):
+    id: str
+    completed_bits: blob  # little-endian bitset, bit i = i-th module in course order
+    started_at: nat64
+    last_accessed: nat64
+    completed_at: Opt[nat64]
+
 class EnrollCourseParams(Record):
     course_id: str
 
@@ -193,11 +273,23 @@ class ListCoursesResponse(Record):
     total: nat64
     skip: nat64
     limit: nat64
+    next_cursor: Opt[str]
 
 class GetCourseResult(Variant):
     Ok: 'Course'
     Err: 'Error'
 
+class ModuleContent(Record):
+    course_id: str
+    module_id: str
+    offset: nat64  # in characters
+    content: str
+    total_length: nat64  # length of the whole module body in characters
+
+class GetModuleContentResult(Variant):
+    Ok: 'ModuleContent'
+    Err: 'Error'
+
 class CreateCourseResult(Variant):
     Ok: 'Course'
     Err: 'Error'
@@ -254,6 +346,7 @@ class ListSkillsParams(Record):
     limit: nat64
     category: Opt[str]
     difficulty: Opt[str]
+    cursor: Opt[str]  # opaque cursor from a previous next_cursor
 
 class UpdateSkillProgressParams(Record):
     skill_id: str
@@ -265,18 +358,21 @@ class GetUserSkillsParams(Record):
     skip: nat64
     limit: nat64
     mastery_level: Opt[str]
+    cursor: Opt[str]  # opaque cursor from a previous next_cursor
 
 class ListSkillsResponse(Record):
     items: Vec['Skill']
     total: nat64
     skip: nat64
     limit: nat64
+    next_cursor: Opt[str]
 
 class ListUserSkillsResponse(Record):
     items: Vec['UserSkill']
     total: nat64
     skip: nat64
     limit: nat64
+    next_cursor: Opt[str]
 
 class GetSkillResult(Variant):
     Ok: 'Skill'
@@ -294,10 +390,70 @@ class UpdateSkillProgressResult(Variant):
     Ok: 'UserSkill'
     Err: 'Error'
 
+class XpEvent(Record):
+    sequence: nat64
+    activity_type: str
+    amount: nat64
+    timestamp: nat64
+
+class XpCheckpoint(Record):
+    through_sequence: nat64  # last event folded into this checkpoint
+    event_count: nat64
+    xp_gained: nat64
+    total_xp: nat64  # accumulated XP after the last folded event
+    first_at: nat64
+    last_at: nat64
+
+class XpLedger(Record):
+    next_sequence: nat64
+    compacted_through: nat64  # events before this sequence live in checkpoints
+    checkpoint_count: nat64
+
+class XpHistory(Record):
+    checkpoints: Vec['XpCheckpoint']  # first page only, oldest first
+    events: Vec['XpEvent']  # a page of the events not yet compacted, oldest first
+    next_cursor: Opt[str]
+
+class GetXpHistoryResult(Variant):
+    Ok: 'XpHistory'
+    Err: 'Error'
+
 class ListUserSkillsResult(Variant):
     Ok: 'ListUserSkillsResponse'
     Err: 'Error'
 
+# Leaderboard Data Structures
+class LeaderboardNode(Record):
+    left: str  # child node keys, "" when absent
+    right: str
+    priority: nat64
+    size: nat64  # nodes in this subtree, itself included
+
+class LeaderboardEntry(Record):
+    rank: nat64  # 1-based; users with equal XP share a rank
+    user_id: Principal
+    xp: nat64
+
+class LeaderboardPage(Record):
+    skill_id: str
+    entries: Vec['LeaderboardEntry']
+    total: nat64
+    next_cursor: Opt[str]
+
+class GetLeaderboardResult(Variant):
+    Ok: 'LeaderboardPage'
+    Err: 'Error'
+
+class UserRank(Record):
+    skill_id: str
+    rank: nat64
+    xp: nat64
+    total: nat64
+
+class GetUserRankResult(Variant):
+    Ok: 'UserRank'
+    Err: 'Error'
+
 # AI Service Data Structures
 class AIPrompt(Record):
     id: str
@@ -375,6 +531,44 @@ class ListBitcoinRewardsResult(Variant):
     Ok: Vec['BitcoinReward']
     Err: 'Error'
 
+# Secondary Index Data Structures
+class IndexEntry(Record):
+    prev_key: text  # primary key of the previous entry ("" = list head)
+    next_key: text  # primary key of the next entry ("" = list head)
+
+class IndexRebuildState(Record):
+    # "list_index", "clear" (dropping old entries), "list_records" or "link"
+    phase: text
+    chunk: nat64  # next queued chunk of keys to process
+    chunks: nat64  # chunks queued by the last listing phase
+
+class RebuildIndexesResult(Variant):
+    Ok: nat64  # number of records being re-indexed
+    Err: 'Error'
+
+# Skill Prerequisite Graph Data Structures
+class SkillGraphNode(Record):
+    ordinal: nat64  # bit position of this skill in closure bitsets
+    rank: nat64  # closure size; prerequisites always rank lower (topological order)
+    prerequisites: Vec[str]  # direct prerequisite skill IDs
+    closure: blob  # little-endian bitset of every transitive prerequisite
+
+class UpdateSkillPrerequisitesParams(Record):
+    skill_id: str
+    prerequisites: Vec[str]
+
+class UpdateSkillResult(Variant):
+    Ok: 'Skill'
+    Err: 'Error'
+
+class SkillPrerequisitesResult(Variant):
+    Ok: Vec[str]  # all transitive prerequisites in topological order
+    Err: 'Error'
+
+class SkillUnlockedResult(Variant):
+    Ok: bool
+    Err: 'Error'
+
 # ============================================================================
 # PERSISTENT STORAGE DECLARATIONS
 # ============================================================================
@@ -386,10 +580,18 @@ users_storage = StableBTreeMap[text, User](
     max_value_size=2000
 )
 
-# Assessment Storage
-assessments_storage = StableBTreeMap[text, Assessment](
+# Assessment Storage (headers only, questions are chunked separately)
+assessments_storage = StableBTreeMap[text, AssessmentHeader](
     memory_id=1,
     max_key_size=100,
+    max_value_size=2000
+)
+
+# Assessment Question Storage
+# Keyed "<assessment_id>\x00<chunk_no>", up to QUESTION_CHUNK_BYTES of questions per entry
+assessment_questions_storage = StableBTreeMap[text, QuestionChunk](
+    memory_id=18,
+    max_key_size=120,
     max_value_size=5000
 )
 
@@ -400,6 +602,23 @@ assessment_results_storage = StableBTreeMap[text, AssessmentResult](
     max_value_size=2000
 )
 
+# Assessment Answer Key Storage
+# Packed per assessment: byte 0 is the passing score, byte i + 1 the correct
+# option index of question i, so grading never deserializes Question records
+answer_keys_storage = StableBTreeMap[text, blob](
+    memory_id=17,
+    max_key_size=100,
+    max_value_size=2000
+)
+
+# Assessment Statistics Storage
+# Running aggregates per assessment, updated by every graded submission
+assessment_stats_storage = StableBTreeMap[text, AssessmentStats](
+    memory_id=19,
+    max_key_size=100,
+    max_value_size=12000
+)
+
 # Course Storage
 courses_storage = StableBTreeMap[text, Course](
     memory_id=3,
@@ -407,13 +626,42 @@ courses_storage = StableBTreeMap[text, Course](
     max_value_size=10000
 )
 
-# Course Progress Storage
-course_progress_storage = StableBTreeMap[text, CourseProgress](
+# Course Summary Storage (courses without modules, read by summary listings)
+course_summaries_storage = StableBTreeMap[text, CourseSummary](
+    memory_id=22,
+    max_key_size=100,
+    max_value_size=2000
+)
+
+# Module Content Storage
+# Keyed "<course_id>\x00<module_id>\x00<chunk_no>" (a hash replaces long module keys), MODULE_CONTENT_CHUNK_SIZE characters per entry
+module_content_storage = StableBTreeMap[text, text](
+    memory_id=23,
+    max_key_size=250,
+    max_value_size=4200
+)
+
+# Module Content Length Storage (characters per "<course_id>\x00<module_id>")
+module_content_lengths_storage = StableBTreeMap[text, nat64](
+    memory_id=24,
+    max_key_size=250,
+    max_value_size=100
+)
+
+# Course Progress Storage (keyed "<user_id>\x00<course_id>")
+course_progress_storage = StableBTreeMap[text, CourseProgressState](
     memory_id=4,
     max_key_size=100,
     max_value_size=2000
 )
 
+# Module Position Storage ("<course_id>\x00<module_id>" -> bit in progress bitsets)
+module_positions_storage = StableBTreeMap[text, nat64](
+    memory_id=25,
+    max_key_size=250,
+    max_value_size=100
+)
+
 # Skill Storage
 skills_storage = StableBTreeMap[text, Skill](
     memory_id=5,
@@ -421,13 +669,70 @@ skills_storage = StableBTreeMap[text, Skill](
     max_value_size=3000
 )
 
-# User Skills Storage
+# User Skills Storage (keyed "<user_id>\x00<skill_id>", current_xp is the XP accumulator)
 user_skills_storage = StableBTreeMap[text, UserSkill](
     memory_id=6,
     max_key_size=100,
     max_value_size=2000
 )
 
+# XP Ledger Storage (per "<user_id>\x00<skill_id>" sequence and compaction state)
+xp_ledgers_storage = StableBTreeMap[text, XpLedger](
+    memory_id=26,
+    max_key_size=200,
+    max_value_size=200
+)
+
+# XP Event Log Storage (append-only, keyed "<user_id>\x00<skill_id>\x00<sequence>")
+xp_events_storage = StableBTreeMap[text, XpEvent](
+    memory_id=27,
+    max_key_size=200,
+    max_value_size=300
+)
+
+# XP Checkpoint Storage (compacted event ranges, keyed "<user_id>\x00<skill_id>\x00<n>")
+xp_checkpoints_storage = StableBTreeMap[text, XpCheckpoint](
+    memory_id=28,
+    max_key_size=200,
+    max_value_size=300
+)
+
+# Leaderboard Node Storage
+# Keyed "<skill_id>\x00<inverted_xp>\x00<user_id>"; see LEADERBOARDS
+leaderboard_nodes_storage = StableBTreeMap[text, LeaderboardNode](
+    memory_id=30,
+    max_key_size=250,
+    max_value_size=600
+)
+
+# Leaderboard Root Storage (skill ID -> key of its tree's root node)
+leaderboard_roots_storage = StableBTreeMap[text, text](
+    memory_id=31,
+    max_key_size=100,
+    max_value_size=250
+)
+
+# Index Rebuild Storage (store name, or a rebuild such as "_leaderboards" -> progress of its batched rebuild)
+index_rebuilds_storage = StableBTreeMap[text, IndexRebuildState](
+    memory_id=37,
+    max_key_size=100,
+    max_value_size=300
+)
+
+# Index Rebuild Queue Storage ("<store>\x00<chunk>" -> keys a rebuild step processes)
+index_rebuild_queue_storage = StableBTreeMap[text, Vec[text]](
+    memory_id=38,
+    max_key_size=100,
+    max_value_size=16_000
+)
+
+# Controller Storage (principal -> time it installed or upgraded the code)
+controllers_storage = StableBTreeMap[text, nat64](
+    memory_id=39,
+    max_key_size=100,
+    max_value_size=100
+)
+
 # AI Prompt Storage
 ai_prompts_storage = StableBTreeMap[text, AIPrompt](
     memory_id=7,
@@ -449,6 +754,1089 @@ bitcoin_rewards_storage = StableBTreeMap[text, BitcoinReward](
     max_value_size=2000
 )
 
+# Secondary Index Storage
+# Keys are "<field>\x00<value>\x00<primary_key>"; see IndexedStore below.
+users_index_storage = StableBTreeMap[text, IndexEntry](
+    memory_id=10,
+    max_key_size=300,
+    max_value_size=300
+)
+
+assessments_index_storage = StableBTreeMap[text, IndexEntry](
+    memory_id=11,
+    max_key_size=300,
+    max_value_size=300
+)
+
+courses_index_storage = StableBTreeMap[text, IndexEntry](
+    memory_id=12,
+    max_key_size=300,
+    max_value_size=300
+)
+
+skills_index_storage = StableBTreeMap[text, IndexEntry](
+    memory_id=13,
+    max_key_size=300,
+    max_value_size=300
+)
+
+bitcoin_rewards_index_storage = StableBTreeMap[text, IndexEntry](
+    memory_id=14,
+    max_key_size=300,
+    max_value_size=300
+)
+
+user_skills_index_storage = StableBTreeMap[text, IndexEntry](
+    memory_id=29,
+    max_key_size=300,
+    max_value_size=300
+)
+
+# Record Counters Storage
+# Keys are "<store>\x00<field>\x00<value>"; the "_all" field holds store totals
+counters_storage = StableBTreeMap[text, nat64](
+    memory_id=15,
+    max_key_size=300,
+    max_value_size=100
+)
+
+# ID Sequence Storage (one monotonic counter per entity type)
+id_sequences_storage = StableBTreeMap[text, nat64](
+    memory_id=16,
+    max_key_size=100,
+    max_value_size=100
+)
+
+# Skill Prerequisite Graph Storage (one node per skill, see SKILL PREREQUISITE GRAPH)
+skill_graph_storage = StableBTreeMap[text, SkillGraphNode](
+    memory_id=20,
+    max_key_size=100,
+    max_value_size=5000
+)
+
+# Skill Ordinal Storage (closure bit position -> skill ID)
+skill_ordinals_storage = StableBTreeMap[text, text](
+    memory_id=21,
+    max_key_size=100,
+    max_value_size=100
+)
+
+# ============================================================================
+# ID ALLOCATION
+# ============================================================================
+
+# Crockford base32, whose ASCII order matches numeric order
+ID_ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"
+
+def _base32(value: int, width: int) -> str:
+    """Encode value as fixed-width base32 so encoded IDs sort numerically."""
+    chars = []
+    for _ in range(width):
+        chars.append(ID_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+def _next_id(entity: str) -> str:
+    """
+    Allocate a collision-free ID for an entity type.
+
+    IDs are "<entity>_<time><sequence>": 9 base32 digits of milliseconds
+    followed by 7 of a per-entity sequence persisted in stable memory. Two
+    creates in the same millisecond (or the same consensus round) still get
+    distinct IDs, and IDs sort by creation time, so new keys append to the
+    right edge of each B-tree.
+    """
+    sequence = id_sequences_storage.get(entity)
+    sequence = (sequence if sequence is not None else 0) + 1
+    id_sequences_storage.insert(entity, sequence)
+    return f"{entity}_{_base32(ic.time() // 1_000_000, 9)}{_base32(sequence, 7)}"
+
+# ============================================================================
+# SECONDARY INDEXES
+# ============================================================================
+
+# Pseudo-field holding every record of a store in insertion order
+ALL_RECORDS = "_all"
+
+# Bumped when index keys are encoded differently, so stores are rebuilt
+INDEX_SCHEMA_VERSION = 2
+
+# Records re-indexed (or stale entries dropped) per rebuild step
+INDEX_REBUILD_BATCH = 500
+
+# Keys per queued rebuild chunk (index keys are at most 300 bytes)
+INDEX_REBUILD_CHUNK = 50
+
+def _index_field(field) -> str:
+    """Name of an index field; a tuple of fields is a composite index."""
+    return "+".join(field) if isinstance(field, tuple) else field
+
+# Index fields computed from a record rather than stored in it
+DERIVED_INDEX_FIELDS = {
+    # Case- and whitespace-insensitive skill name, for learning goal lookups
+    "normalized_name": lambda record: _normalize_name(record["name"])
+}
+
+def _normalize_name(name: str) -> str:
+    return " ".join(name.split()).lower()
+
+def _record_value(record, field):
+    """Read an indexed field (a tuple of values for a composite index)."""
+    if isinstance(field, tuple):
+        return tuple(_record_value(record, name) for name in field)
+    if field in DERIVED_INDEX_FIELDS:
+        return DERIVED_INDEX_FIELDS[field](record)
+    return record[field]
+
+def _index_values(record, field):
+    """Index values of a record's field; a list field is indexed under each element."""
+    value = _record_value(record, field)
+    if isinstance(value, list):
+        return {_index_value(element) for element in value}
+    return {_index_value(value)}
+
+# Longer indexed values (or ones containing NUL) are replaced by a hash, so
+# index and counter keys stay within their max_key_size
+MAX_INDEX_VALUE_BYTES = 64
+
+def _index_value(value) -> str:
+    """Normalize a field value into its index key representation."""
+    if isinstance(value, tuple):
+        return "\x00".join(_index_value(part) for part in value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, Principal):
+        return value.to_str()
+    value = str(value)
+    if len(value.encode()) > MAX_INDEX_VALUE_BYTES or "\x00" in value:
+        return "#" + hashlib.sha256(value.encode()).hexdigest()[:40]
+    return value
+
+def _queue_rebuild_keys(name: str, keys) -> int:
+    """Queue keys in chunks for the following steps of a rebuild; returns the chunk count."""
+    chunks = 0
+    for start in range(0, len(keys), INDEX_REBUILD_CHUNK):
+        index_rebuild_queue_storage.insert(f"{name}\x00{chunks}", keys[start:start + INDEX_REBUILD_CHUNK])
+        chunks += 1
+    return chunks
+
+def _take_rebuild_keys(name: str, state, batch: int):
+    """
+    Remove the next queued chunks of a rebuild, about `batch` keys, and
+    store the progress. Returns (keys, whether the queue is now empty).
+    """
+    chunk = state["chunk"]
+    end = min(chunk + max(batch // INDEX_REBUILD_CHUNK, 1), state["chunks"])
+    keys = []
+    while chunk < end:
+        keys.extend(index_rebuild_queue_storage.remove(f"{name}\x00{chunk}"))
+        chunk += 1
+    index_rebuilds_storage.insert(name, IndexRebuildState(phase=state["phase"], chunk=chunk, chunks=state["chunks"]))
+    return keys, chunk >= state["chunks"]
+
+def _set_rebuild_phase(name: str, phase: str, keys=()) -> None:
+    """Move a rebuild to its next phase, queueing the keys that phase processes."""
+    index_rebuilds_storage.insert(name, IndexRebuildState(phase=phase, chunk=0, chunks=_queue_rebuild_keys(name, keys)))
+
+class IndexedStore:
+    """
+    A primary StableBTreeMap plus declarative secondary indexes.
+
+    StableBTreeMap only offers point lookups and full iteration, so each
+    (field, value) pair is kept as a circular doubly linked list inside the
+    index map. Entries live under "<field>\\x00<value>\\x00<primary_key>" and
+    the list head under "<field>\\x00<value>\\x00". Insert and remove cost
+    O(log n); walking k matches costs O(k log n) no matter how large the
+    store grows.
+
+    Every list also has a counter in counters_storage, updated in the same
+    call as the list itself, so totals are O(1) reads.
+
+    A field given as a tuple of record fields is a composite index whose
+    values are matching tuples, e.g. ("user_id", "mastery_level"). A list
+    field puts the record on the list of each of its elements.
+    """
+
+    def __init__(self, name, primary, index, fields):
+        self.name = name
+        self.primary = primary
+        self.index = index
+        self.fields = fields
+
+    def get(self, key: str):
+        return self.primary.get(key)
+
+    def insert(self, key: str, record) -> None:
+        """Insert or replace a record, keeping every index in sync."""
+        old = self.primary.insert(key, record)
+        if not self._is_indexed(key):
+            return
+        if old is None:
+            self._link(ALL_RECORDS, "", key)
+        for field in self.fields:
+            new_values = _index_values(record, field)
+            old_values = _index_values(old, field) if old is not None else set()
+            for value in old_values - new_values:
+                self._unlink(_index_field(field), value, key)
+            for value in new_values - old_values:
+                self._link(_index_field(field), value, key)
+
+    def remove(self, key: str):
+        """Remove a record and its index entries, returning the old record."""
+        old = self.primary.remove(key)
+        if old is None or not self._is_indexed(key):
+            return old
+        self._unlink(ALL_RECORDS, "", key)
+        for field in self.fields:
+            for value in _index_values(old, field):
+                self._unlink(_index_field(field), value, key)
+        return old
+
+    def contains(self, field: str, value, key: str) -> bool:
+        return self.index.contains_key(f"{_index_field(field)}\x00{_index_value(value)}\x00{key}")
+
+    def scan_keys(self, field: str = ALL_RECORDS, value="", after: str = "", limit: int = -1):
+        """
+        Walk the index list for field == value, starting after primary key
+        `after` ("" starts from the beginning). Returns at most `limit` keys
+        (all of them when limit is negative).
+        """
+        prefix = f"{_index_field(field)}\x00{_index_value(value)}\x00"
+        entry = self.index.get(prefix + after)
+        keys = []
+        while entry is not None and entry["next_key"] != "" and limit != len(keys):
+            key = entry["next_key"]
+            keys.append(key)
+            entry = self.index.get(prefix + key)
+        return keys
+
+    def scan(self, field: str = ALL_RECORDS, value="", after: str = "", limit: int = -1):
+        """Like scan_keys, but returns the records themselves."""
+        records = []
+        for key in self.scan_keys(field, value, after, limit):
+            record = self.primary.get(key)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def page(self, field: str = ALL_RECORDS, value="", skip: int = 0, limit: int = 20, cursor=None,
+             predicate=None, key_filter=None, source=None):
+        """
+        Fetch one page of records where field == value.
+
+        With a cursor the walk starts right after the cursor's entry, so a page
+        costs O(limit) lookups regardless of its position; skip is the
+        compatibility path and walks past `skip` matches first. `predicate`
+        filters records on fields that have no index of their own;
+        `key_filter` rejects primary keys before their records are loaded.
+        `source` loads records from another map sharing the primary keys
+        (such as a summary store) instead of the primary map.
+
+        Returns (records, next_cursor), or None when the cursor is unknown.
+        """
+        prefix = f"{_index_field(field)}\x00{_index_value(value)}\x00"
+        after = cursor if cursor is not None else ""
+        entry = self.index.get(prefix + after)
+        if entry is None and after != "":
+            return None
+
+        to_skip = skip if cursor is None else 0
+        records = []
+        last_key = after
+        while entry is not None and entry["next_key"] != "":
+            key = entry["next_key"]
+            entry = self.index.get(prefix + key)
+            if key_filter is not None and not key_filter(key):
+                continue
+            record = (source if source is not None else self.primary).get(key)
+            if record is None or (predicate is not None and not predicate(record)):
+                continue
+            if to_skip > 0:
+                to_skip -= 1
+                continue
+            if len(records) == limit:
+                # At least one more match exists past this page
+                return records, last_key
+            records.append(record)
+            last_key = key
+        return records, None
+
+    def select(self, filters, skip: int = 0, limit: int = 20, cursor=None, source=None):
+        """
+        Fetch one page of records matching every field == value in `filters`.
+
+        The planner walks the smallest matching list among the filtered fields
+        and the composite indexes made only of filtered fields. When one
+        composite covers every filter the page is O(limit) and the total an
+        O(1) counter read. Otherwise the remaining filters are checked with
+        point lookups on their index entries, and both the page and the total
+        walk the driving list, which is O(driver list) rather than O(store size).
+
+        Returns (records, next_cursor, total), or None when the cursor is unknown.
+        """
+        if not filters:
+            page = self.page(skip=skip, limit=limit, cursor=cursor, source=source)
+            return None if page is None else (page[0], page[1], self.count())
+
+        # Candidate lists: (index field, value, filter fields it covers)
+        candidates = [(field, value, {field}) for field, value in filters.items()]
+        for field in self.fields:
+            if isinstance(field, tuple) and set(field) <= filters.keys():
+                candidates.append((field, tuple(filters[name] for name in field), set(field)))
+        driver, driver_value, covered = min(
+            candidates, key=lambda candidate: (self.count(candidate[0], candidate[1]), -len(candidate[2])))
+        others = [(field, value) for field, value in filters.items() if field not in covered]
+        if not others:
+            page = self.page(driver, driver_value, skip, limit, cursor, source=source)
+            return None if page is None else (page[0], page[1], self.count(driver, driver_value))
+
+        def matches_others(key):
+            return all(self.contains(field, value, key) for field, value in others)
+
+        page = self.page(driver, driver_value, skip, limit, cursor, key_filter=matches_others, source=source)
+        if page is None:
+            return None
+        total = len([key for key in self.scan_keys(driver, driver_value) if matches_others(key)])
+        return page[0], page[1], total
+
+    def needs_rebuild(self) -> bool:
+        """True when the indexes are missing records or were built for other fields."""
+        return self.count() != self.primary.len() or not counters_storage.contains_key(self._schema_key())
+
+    def _is_indexed(self, key: str) -> bool:
+        # Until a rebuild reaches its link phase the old entries are being
+        # dropped, and every record present then is re-indexed from the queue
+        state = index_rebuilds_storage.get(self.name)
+        return state is None or state["phase"] == "link"
+
+    def mark_indexed(self) -> None:
+        """Record that the indexes match the current fields (and encoding)."""
+        counters_storage.insert(self._schema_key(), 1)
+
+    def start_rebuild(self) -> None:
+        """Begin a batched rebuild, unless one is already under way."""
+        if not index_rebuilds_storage.contains_key(self.name):
+            _set_rebuild_phase(self.name, "list_index")
+
+    def count(self, field: str = ALL_RECORDS, value="") -> int:
+        """Number of records where field == value (all records by default)."""
+        count = counters_storage.get(f"{self.name}\x00{_index_field(field)}\x00{_index_value(value)}")
+        return count if count is not None else 0
+
+    def rebuild_step(self, batch: int) -> bool:
+        """
+        Advance a started rebuild by one step; returns True once it is complete.
+
+        StableBTreeMap has no range reads, so a rebuild lists the index map
+        once and queues its keys in chunks, drops them at most `batch` per
+        step, then lists the primary keys once and re-indexes their records
+        the same way. Each step resumes from the stored chunk number with
+        point reads, so it costs O(batch) however large the store is.
+        """
+        state = index_rebuilds_storage.get(self.name)
+        if state is None:
+            return True
+        
+        if state["phase"] == "list_index":
+            counters_storage.remove(self._schema_key())
+            _set_rebuild_phase(self.name, "clear", self.index.keys())
+            return False
+        if state["phase"] == "list_records":
+            _set_rebuild_phase(self.name, "link", self.primary.keys())
+            return False
+        
+        keys, finished = _take_rebuild_keys(self.name, state, batch)
+        for key in keys:
+            if state["phase"] == "clear":
+                self._drop_index_key(key)
+            else:
+                self._index_record(key)
+        if not finished:
+            return False
+        if state["phase"] == "clear":
+            _set_rebuild_phase(self.name, "list_records")
+            return False
+        
+        self.mark_indexed()
+        index_rebuilds_storage.remove(self.name)
+        return True
+
+    def _drop_index_key(self, index_key: str) -> None:
+        """Remove an index entry; a list head also takes its counter with it."""
+        self.index.remove(index_key)
+        if index_key.endswith("\x00"):
+            counters_storage.remove(f"{self.name}\x00{index_key[:-1]}")
+
+    def _index_record(self, key: str) -> None:
+        """Link a stored record into every index (already linked entries are kept)."""
+        record = self.primary.get(key)
+        if record is None:
+            return
+        self._link(ALL_RECORDS, "", key)
+        for field in self.fields:
+            for value in _index_values(record, field):
+                self._link(_index_field(field), value, key)
+
+    def _schema_key(self) -> str:
+        # Marks which fields (and value encoding) the stored indexes were built for
+        fields = "|".join(_index_field(field) for field in self.fields)
+        return f"{self.name}\x00_schema\x00v{INDEX_SCHEMA_VERSION}\x00{fields}"
+
+    def _patch(self, prefix: str, key: str, prev_key=None, next_key=None) -> None:
+        entry = self.index.get(prefix + key)
+        if entry is None:
+            entry = IndexEntry(prev_key="", next_key="")
+        self.index.insert(prefix + key, IndexEntry(
+            prev_key=prev_key if prev_key is not None else entry["prev_key"],
+            next_key=next_key if next_key is not None else entry["next_key"]
+        ))
+
+    def _link(self, field: str, value: str, key: str) -> None:
+        prefix = f"{field}\x00{value}\x00"
+        if self.index.contains_key(prefix + key):
+            return
+        head = self.index.get(prefix)
+        tail = head["prev_key"] if head is not None else ""
+        self.index.insert(prefix + key, IndexEntry(prev_key=tail, next_key=""))
+        self._patch(prefix, tail, next_key=key)
+        self._patch(prefix, "", prev_key=key)
+        self._bump(field, value, 1)
+
+    def _unlink(self, field: str, value: str, key: str) -> None:
+        prefix = f"{field}\x00{value}\x00"
+        entry = self.index.remove(prefix + key)
+        if entry is None:
+            return
+        self._patch(prefix, entry["prev_key"], next_key=entry["next_key"])
+        self._patch(prefix, entry["next_key"], prev_key=entry["prev_key"])
+        head = self.index.get(prefix)
+        if head is not None and head["next_key"] == "":
+            self.index.remove(prefix)
+        self._bump(field, value, -1)
+
+    def _bump(self, field: str, value: str, delta: int) -> None:
+        counter_key = f"{self.name}\x00{field}\x00{value}"
+        count = counters_storage.get(counter_key)
+        count = (count if count is not None else 0) + delta
+        if count > 0:
+            counters_storage.insert(counter_key, count)
+        else:
+            counters_storage.remove(counter_key)
+
+# Declarative index configuration per store
+users_store = IndexedStore("users", users_storage, users_index_storage, [])
+assessments_store = IndexedStore("assessments", assessments_storage, assessments_index_storage, ["skill_id"])
+# Composite indexes serve the filter combinations list_courses and list_skills
+# see most, so their pages and totals skip the intersection walk
+courses_store = IndexedStore("courses", courses_storage, courses_index_storage,
+                             ["skill_id", "difficulty", "creator_id", "is_published",
+                              ("skill_id", "is_published"), ("difficulty", "is_published"),
+                              ("creator_id", "is_published"), ("skill_id", "difficulty", "is_published")])
+skills_store = IndexedStore("skills", skills_storage, skills_index_storage,
+                            ["category", "difficulty", ("category", "difficulty"), "normalized_name",
+                             "prerequisites"])
+bitcoin_rewards_store = IndexedStore("bitcoin_rewards", bitcoin_rewards_storage, bitcoin_rewards_index_storage, ["user_id"])
+user_skills_store = IndexedStore("user_skills", user_skills_storage, user_skills_index_storage,
+                                 ["user_id", ("user_id", "mastery_level")])
+
+INDEXED_STORES = {
+    "users": users_store,
+    "assessments": assessments_store,
+    "courses": courses_store,
+    "skills": skills_store,
+    "bitcoin_rewards": bitcoin_rewards_store,
+    "user_skills": user_skills_store
+}
+
+# List projections: "summary" leaves out module and question bodies
+PROJECTIONS = ("summary", "full")
+
+def _paginate_items(items, skip: int, limit: int, cursor, key=lambda item: item["id"]):
+    """
+    Cursor/skip pagination over an in-memory list (used by the mock data paths).
+    Returns (page, next_cursor), or None when the cursor is unknown.
+    """
+    start = min(skip, len(items))
+    if cursor is not None:
+        keys = [key(item) for item in items]
+        if cursor not in keys:
+            return None
+        start = keys.index(cursor) + 1
+
+    page = items[start:start + limit]
+    next_cursor = key(page[-1]) if page and start + limit < len(items) else None
+    return page, next_cursor
+
+# ============================================================================
+# SKILL PREREQUISITE GRAPH
+# ============================================================================
+
+# Every skill gets a dense ordinal, and its node stores the set of all
+# transitive prerequisites as a bitset over those ordinals. A prerequisite
+# edge p -> x would close a cycle exactly when x is p or x is in p's closure,
+# and since a skill's closure strictly contains each prerequisite's closure,
+# ordering by closure size (rank) is always a valid topological order.
+
+# skill_graph_storage values hold at most 5000 bytes: a closure over
+# MAX_GRAPH_SKILLS ordinals takes 3750 of them, and the direct prerequisite
+# IDs at most MAX_PREREQUISITE_BYTES
+MAX_GRAPH_SKILLS = 30_000
+MAX_PREREQUISITE_BYTES = 1000
+
+def _graph_is_full() -> bool:
+    ordinal = id_sequences_storage.get("skill_ordinal")
+    return ordinal is not None and ordinal >= MAX_GRAPH_SKILLS
+
+def _prerequisites_too_large(prerequisites) -> bool:
+    # Each ID is encoded with a length prefix of up to 5 bytes
+    return sum(len(prerequisite_id.encode()) + 5 for prerequisite_id in prerequisites) > MAX_PREREQUISITE_BYTES
+
+def _bits_to_blob(bits: int) -> bytes:
+    """Encode a closure bitset as little-endian bytes."""
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+def _blob_to_bits(data: bytes) -> int:
+    """Decode a closure bitset from little-endian bytes."""
+    return int.from_bytes(data, "little")
+
+def _closure_of(prerequisites):
+    """Union the prerequisites and their closures; None if one is unknown."""
+    bits = 0
+    for prerequisite_id in prerequisites:
+        node = skill_graph_storage.get(prerequisite_id)
+        if node is None:
+            return None
+        bits |= _blob_to_bits(node["closure"]) | (1 << node["ordinal"])
+    return bits
+
+def _store_graph_node(skill_id: str, ordinal: int, prerequisites, bits: int) -> None:
+    """Write a skill's graph node with a freshly computed closure."""
+    skill_graph_storage.insert(skill_id, SkillGraphNode(
+        ordinal=ordinal,
+        rank=bin(bits).count("1"),
+        prerequisites=prerequisites,
+        closure=_bits_to_blob(bits)
+    ))
+
+def _add_skill_to_graph(skill_id: str, prerequisites) -> bool:
+    """Add a new skill to the graph; False if a prerequisite is unknown or a limit is exceeded."""
+    bits = _closure_of(prerequisites)
+    if bits is None or _graph_is_full() or _prerequisites_too_large(prerequisites):
+        return False
+    
+    ordinal = id_sequences_storage.get("skill_ordinal")
+    ordinal = ordinal if ordinal is not None else 0
+    id_sequences_storage.insert("skill_ordinal", ordinal + 1)
+    skill_ordinals_storage.insert(str(ordinal), skill_id)
+    
+    _store_graph_node(skill_id, ordinal, prerequisites, bits)
+    return True
+
+def _set_graph_prerequisites(skill_id: str, prerequisites):
+    """
+    Replace a skill's direct prerequisites.
+    Returns an error message, or None once the skill and every dependent
+    closure have been updated.
+    """
+    # Descendants are found through the skills store's prerequisites index,
+    # which is incomplete until a rebuild of that store finishes
+    if (index_rebuilds_storage.contains_key(skills_store.name)
+            or index_rebuilds_storage.contains_key(SKILL_GRAPH_REBUILD)):
+        return "Skill indexes are being rebuilt; try again later"
+    node = skill_graph_storage.get(skill_id)
+    if node is None:
+        return f"Skill {skill_id} is beyond the prerequisite graph's limits"
+    own_bit = 1 << node["ordinal"]
+    
+    if _prerequisites_too_large(prerequisites):
+        return f"Prerequisites exceed {MAX_PREREQUISITE_BYTES} bytes"
+    for prerequisite_id in prerequisites:
+        prerequisite = skill_graph_storage.get(prerequisite_id)
+        if prerequisite is None:
+            return f"Prerequisite skill {prerequisite_id} not found"
+        if prerequisite_id == skill_id or _blob_to_bits(prerequisite["closure"]) & own_bit:
+            return f"Prerequisite {prerequisite_id} would create a cycle"
+    
+    _store_graph_node(skill_id, node["ordinal"], prerequisites, _closure_of(prerequisites))
+    
+    # Collect the descendants through the skills store's prerequisites index
+    # (a superset of the graph's edges), so only they are read and rewritten
+    dependents = {}
+    frontier = [skill_id]
+    while frontier:
+        for dependent_id in skills_store.scan_keys("prerequisites", frontier.pop()):
+            if dependent_id not in dependents:
+                dependent = skill_graph_storage.get(dependent_id)
+                if dependent is not None:
+                    dependents[dependent_id] = dependent
+                    frontier.append(dependent_id)
+    
+    # Dependents keep their relative order, so recomputing them by old rank
+    # sees every updated prerequisite before the skills that need it
+    for dependent_id, dependent in sorted(dependents.items(), key=lambda item: item[1]["rank"]):
+        _store_graph_node(dependent_id, dependent["ordinal"], dependent["prerequisites"],
+                          _closure_of(dependent["prerequisites"]))
+    
+    return None
+
+def _topological_skill_ids(bits: int):
+    """Skill IDs for the set bits of a closure, prerequisites first."""
+    # Jump between set bits with str.find instead of testing every ordinal
+    digits = bin(bits)[:1:-1]
+    skill_ids = []
+    ordinal = digits.find("1")
+    while ordinal >= 0:
+        skill_ids.append(skill_ordinals_storage.get(str(ordinal)))
+        ordinal = digits.find("1", ordinal + 1)
+    
+    nodes = [(skill_graph_storage.get(skill_id), skill_id) for skill_id in skill_ids]
+    return [skill_id for node, skill_id in sorted(nodes, key=lambda item: (item[0]["rank"], item[0]["ordinal"]))]
+
+def _completed_skill_bits(user_id) -> int:
+    """Bitset of the skills a user has completed."""
+    bits = 0
+    for user_skill in user_skills_store.scan("user_id", user_id):
+        if user_skill["completed_at"] is not None:
+            node = skill_graph_storage.get(user_skill["skill_id"])
+            if node is not None:
+                bits |= 1 << node["ordinal"]
+    return bits
+
+# Set once every stored skill has been offered a graph node
+SKILL_GRAPH_MIGRATION_KEY = "_migrations\x00skill_graph"
+
+# Name of the graph backfill in index_rebuilds_storage
+SKILL_GRAPH_REBUILD = "_skill_graph"
+
+# Graph nodes added per backfill step
+SKILL_GRAPH_REBUILD_BATCH = 200
+
+def _add_skill_with_prerequisites(skill_id: str, budget: int) -> bool:
+    """
+    Add a stored skill to the graph, adding its missing prerequisites first
+    (depth first, without recursion). A prerequisite that leads back into
+    the walk would close a cycle and is dropped; skills beyond the graph's
+    limits are left out. Returns False when `budget` nodes were added before
+    the walk finished; calling again continues where it stopped.
+    """
+    stack = [skill_id]
+    attempted = set()
+    while stack:
+        current = stack[-1]
+        skill = skills_storage.get(current)
+        if skill is None or current in attempted or skill_graph_storage.contains_key(current):
+            stack.pop()
+            continue
+        
+        prerequisites = [prerequisite_id for prerequisite_id in skill["prerequisites"]
+                         if prerequisite_id not in stack and skills_storage.contains_key(prerequisite_id)]
+        missing = [prerequisite_id for prerequisite_id in prerequisites
+                   if prerequisite_id not in attempted and not skill_graph_storage.contains_key(prerequisite_id)]
+        if missing:
+            stack.append(missing[0])
+            continue
+        
+        if budget <= 0:
+            return False
+        budget -= _add_skill_to_graph(current, prerequisites)
+        attempted.add(current)
+        stack.pop()
+    return True
+
+def _start_skill_graph_rebuild() -> None:
+    """Begin adding graph nodes for skills that predate the graph, unless already under way."""
+    if not index_rebuilds_storage.contains_key(SKILL_GRAPH_REBUILD):
+        _set_rebuild_phase(SKILL_GRAPH_REBUILD, "list_skills")
+    ic.set_timer(0, _continue_skill_graph_rebuild)
+
+def _continue_skill_graph_rebuild() -> void:
+    """
+    Timer callback: advance the graph backfill by one step. The skill IDs
+    are listed once, then each step adds at most SKILL_GRAPH_REBUILD_BATCH
+    nodes, resuming inside a chunk (or a prerequisite walk) where the last
+    step stopped.
+    """
+    state = index_rebuilds_storage.get(SKILL_GRAPH_REBUILD)
+    if state is None:
+        return
+    ic.set_timer(0, _continue_skill_graph_rebuild)
+    
+    if state["phase"] == "list_skills":
+        _set_rebuild_phase(SKILL_GRAPH_REBUILD, "add", skills_storage.keys())
+        return
+    
+    chunk = state["chunk"]
+    chunk_key = f"{SKILL_GRAPH_REBUILD}\x00{chunk}"
+    skill_ids = index_rebuild_queue_storage.get(chunk_key) if chunk < state["chunks"] else []
+    added_before = skill_graph_storage.len()
+    while skill_ids and not _graph_is_full():
+        budget = SKILL_GRAPH_REBUILD_BATCH - (skill_graph_storage.len() - added_before)
+        if not _add_skill_with_prerequisites(skill_ids[0], budget):
+            break
+        skill_ids.pop(0)
+    
+    if skill_ids and not _graph_is_full():
+        index_rebuild_queue_storage.insert(chunk_key, skill_ids)
+        return
+    if chunk < state["chunks"]:
+        index_rebuild_queue_storage.remove(chunk_key)
+        chunk += 1
+    if chunk < state["chunks"] and not _graph_is_full():
+        index_rebuilds_storage.insert(SKILL_GRAPH_REBUILD, IndexRebuildState(
+            phase="add", chunk=chunk, chunks=state["chunks"]))
+        return
+    
+    # Done, or the graph is full and no remaining skill can be added
+    for leftover in range(chunk, state["chunks"]):
+        index_rebuild_queue_storage.remove(f"{SKILL_GRAPH_REBUILD}\x00{leftover}")
+    index_rebuilds_storage.remove(SKILL_GRAPH_REBUILD)
+    counters_storage.insert(SKILL_GRAPH_MIGRATION_KEY, 1)
+
+# ============================================================================
+# LEARNING PATH PLANNER
+# ============================================================================
+
+# Memoized plans keyed by (normalized goals, known-skill bitset, difficulty),
+# so learners who know the same skills share a plan; cleared whenever skills,
+# prerequisites or courses change
+LEARNING_PATH_CACHE_SIZE = 256
+learning_path_cache = {}
+
+def _resolve_goal_skills(goals):
+    """Map learning goals to skill IDs by ID, then category, then name."""
+    skill_ids = []
+    for goal in goals:
+        if skill_graph_storage.contains_key(goal):
+            skill_ids.append(goal)
+            continue
+        category_skill_ids = skills_store.scan_keys("category", goal)
+        if category_skill_ids:
+            skill_ids.extend(category_skill_ids)
+        else:
+            skill_ids.extend(skills_store.scan_keys("normalized_name", _normalize_name(goal)))
+    return skill_ids
+
+def _select_course(skill_id: str, difficulty: str):
+    """Pick the course teaching a skill, preferring the requested difficulty."""
+    courses = [course for course in courses_store.scan("skill_id", skill_id) if course["is_published"]]
+    for course in courses:
+        if course["difficulty"] == difficulty:
+            return course
+    return courses[0] if courses else None
+
+def _course_minutes(course) -> int:
+    """Total study time of a course from its module durations."""
+    module_minutes = sum(module["duration"] for module in course["modules"])
+    return module_minutes if module_minutes > 0 else course["estimated_duration"]
+
+def _plan_learning_path(goals, known_skills, user_id, difficulty):
+    """
+    Plan the skills and courses needed to reach a set of goals.
+    Returns (course_ids, skill_ids, total_minutes), or None when no goal
+    resolves to a stored skill.
+    """
+    goals = sorted({goal.strip() for goal in goals})
+    known = _completed_skill_bits(user_id)
+    for skill_id in known_skills:
+        node = skill_graph_storage.get(skill_id)
+        if node is not None:
+            known |= 1 << node["ordinal"]
+    
+    cache_key = f"{goals}|{hashlib.sha256(_bits_to_blob(known)).hexdigest()}|{difficulty}"
+    if cache_key in learning_path_cache:
+        return learning_path_cache[cache_key]
+    
+    target_ids = _resolve_goal_skills(goals)
+    plan = _build_learning_path(target_ids, known, difficulty) if target_ids else None
+    
+    if len(learning_path_cache) >= LEARNING_PATH_CACHE_SIZE:
+        del learning_path_cache[next(iter(learning_path_cache))]
+    learning_path_cache[cache_key] = plan
+    return plan
+
+def _build_learning_path(target_ids, known: int, difficulty):
+    """
+    The skills and courses leading to target_ids, prerequisites first.
+    Skills left out of the graph (beyond its limits) are skipped.
+    """
+    # Targets plus everything they depend on, minus what the user knows
+    needed = 0
+    for skill_id in target_ids:
+        node = skill_graph_storage.get(skill_id)
+        if node is not None:
+            needed |= _blob_to_bits(node["closure"]) | (1 << node["ordinal"])
+    needed &= ~known
+    
+    skill_ids = _topological_skill_ids(needed)
+    course_ids = []
+    total_minutes = 0
+    for skill_id in skill_ids:
+        course = _select_course(skill_id, difficulty)
+        if course is not None:
+            course_ids.append(course["id"])
+            total_minutes += _course_minutes(course)
+    
+    return course_ids, skill_ids, total_minutes
+
+# ============================================================================
+# LEADERBOARDS
+# ============================================================================
+
+# Each skill's leaderboard is a treap (a search tree kept balanced by heap
+# ordered node priorities) over keys "<skill_id>\x00<inverted_xp>\x00<user_id>",
+# so key order is leaderboard order. Nodes carry their subtree size, which
+# lets rank and page lookups follow one root-to-leaf path: O(log n) expected.
+
+# XP is stored inverted against this bound so that higher XP sorts first
+LEADERBOARD_XP_BOUND = 10 ** 20 - 1
+
+# Most entries returned by one get_leaderboard call
+MAX_LEADERBOARD_PAGE = 100
+
+# Secret per-canister salt mixed into node priorities (in counters_storage),
+# so callers cannot pick user IDs or XP values that unbalance a tree
+LEADERBOARD_SALT_KEY = "_leaderboard\x00salt"
+
+# Seconds before retrying a failed salt draw
+LEADERBOARD_SALT_RETRY_SECONDS = 60
+
+def _leaderboard_key(skill_id: str, xp: int, user_text: str) -> str:
+    """Build a leaderboard node key; an empty user_text gives the XP prefix."""
+    return f"{skill_id}\x00{LEADERBOARD_XP_BOUND - xp:020d}\x00{user_text}"
+
+def _seed_leaderboard_salt() -> Async[void]:
+    """Timer callback: draw the priority salt from the management canister."""
+    randomness_result = yield management_canister.raw_rand()
+    if counters_storage.contains_key(LEADERBOARD_SALT_KEY):
+        return
+    
+    def retry(err):
+        ic.print(f"Leaderboard salt draw failed: {err}")
+        ic.set_timer(LEADERBOARD_SALT_RETRY_SECONDS, _seed_leaderboard_salt)
+    
+    match(randomness_result, {
+        "Ok": lambda randomness: counters_storage.insert(LEADERBOARD_SALT_KEY, int.from_bytes(randomness[:8], "big")),
+        "Err": retry
+    })
+
+def _leaderboard_priority(key: str) -> int:
+    """Pseudo-random heap priority: 64-bit FNV-1a of the canister's salt and the key."""
+    salt = counters_storage.get(LEADERBOARD_SALT_KEY) or 0
+    priority = 0xcbf29ce484222325
+    for byte in salt.to_bytes(8, "big") + key.encode():
+        priority = ((priority ^ byte) * 0x100000001b3) & 0xFFFFFFFFFFFFFFFF
+    return priority
+
+def _subtree_size(node_key: str) -> int:
+    return leaderboard_nodes_storage.get(node_key)["size"] if node_key else 0
+
+# The tree operations below walk one root-to-leaf path, keeping the visited
+# nodes on an explicit stack, then write them back bottom-up. Depth is only
+# logarithmic in expectation, so they do not recurse.
+
+def _treap_split(root: str, key: str):
+    """Split a tree into keys below key and the rest: (left, left_size, right, right_size)."""
+    path = []
+    node_key = root
+    while node_key:
+        node = leaderboard_nodes_storage.get(node_key)
+        path.append((node_key, node))
+        node_key = node["right"] if node_key < key else node["left"]
+    
+    lower, lower_size, upper, upper_size = "", 0, "", 0
+    for node_key, node in reversed(path):
+        if node_key < key:
+            node["right"] = lower
+            node["size"] -= upper_size
+            lower, lower_size = node_key, node["size"]
+        else:
+            node["left"] = upper
+            node["size"] -= lower_size
+            upper, upper_size = node_key, node["size"]
+        leaderboard_nodes_storage.insert(node_key, node)
+    return lower, lower_size, upper, upper_size
+
+def _treap_merge(left: str, right: str) -> str:
+    """Join two trees where every key in left sorts before right; returns the root."""
+    path = []  # (node key, node, whether it came from left, size of the other tree)
+    while left and right:
+        left_node = leaderboard_nodes_storage.get(left)
+        right_node = leaderboard_nodes_storage.get(right)
+        if left_node["priority"] >= right_node["priority"]:
+            path.append((left, left_node, True, right_node["size"]))
+            left = left_node["right"]
+        else:
+            path.append((right, right_node, False, left_node["size"]))
+            right = right_node["left"]
+    
+    root = left or right
+    for node_key, node, from_left, other_size in reversed(path):
+        if from_left:
+            node["right"] = root
+        else:
+            node["left"] = root
+        node["size"] += other_size
+        leaderboard_nodes_storage.insert(node_key, node)
+        root = node_key
+    return root
+
+def _treap_insert(root: str, key: str, priority: int) -> str:
+    """Insert a new key below root; returns the new root."""
+    path = []
+    node_key = root
+    while node_key:
+        node = leaderboard_nodes_storage.get(node_key)
+        if priority > node["priority"]:
+            break
+        path.append((node_key, node))
+        node_key = node["left"] if key < node_key else node["right"]
+    
+    lower, lower_size, upper, upper_size = _treap_split(node_key, key)
+    leaderboard_nodes_storage.insert(key, LeaderboardNode(
+        left=lower,
+        right=upper,
+        priority=priority,
+        size=lower_size + upper_size + 1
+    ))
+    return _treap_relink(path, key, key, 1)
+
+def _treap_remove(root: str, key: str) -> str:
+    """Remove a key known to be below root; returns the new root."""
+    path = []
+    node_key = root
+    while node_key != key:
+        node = leaderboard_nodes_storage.get(node_key)
+        path.append((node_key, node))
+        node_key = node["left"] if key < node_key else node["right"]
+    
+    node = leaderboard_nodes_storage.remove(key)
+    return _treap_relink(path, key, _treap_merge(node["left"], node["right"]), -1)
+
+def _treap_relink(path, key: str, subtree: str, delta: int) -> str:
+    """
+    Hang subtree where the search for key left the path, adding delta to
+    each path node's size; returns the new root.
+    """
+    for node_key, node in reversed(path):
+        if key < node_key:
+            node["left"] = subtree
+        else:
+            node["right"] = subtree
+        node["size"] += delta
+        leaderboard_nodes_storage.insert(node_key, node)
+        subtree = node_key
+    return subtree
+
+def _treap_count_below(root: str, key: str) -> int:
+    """Number of keys in the tree that sort before key."""
+    count = 0
+    node_key = root
+    while node_key:
+        node = leaderboard_nodes_storage.get(node_key)
+        if node_key < key:
+            count += _subtree_size(node["left"]) + 1
+            node_key = node["right"]
+        else:
+            node_key = node["left"]
+    return count
+
+def _treap_keys_from(root: str, key: str, limit: int):
+    """Up to limit keys that sort at or after key, in order."""
+    keys = []
+    stack = []
+    node_key = root
+    while node_key:
+        node = leaderboard_nodes_storage.get(node_key)
+        if node_key >= key:
+            stack.append((node_key, node))
+            node_key = node["left"]
+        else:
+            node_key = node["right"]
+    
+    while stack and len(keys) < limit:
+        node_key, node = stack.pop()
+        keys.append(node_key)
+        child_key = node["right"]
+        while child_key:
+            child = leaderboard_nodes_storage.get(child_key)
+            stack.append((child_key, child))
+            child_key = child["left"]
+    return keys
+
+def _update_leaderboard(skill_id: str, user_id, old_xp, new_xp: int) -> None:
+    """Move a user's leaderboard entry from old_xp (None if absent) to new_xp."""
+    if old_xp == new_xp:
+        return
+    # While a rebuild clears the trees, the entry is placed later from user_skills
+    state = index_rebuilds_storage.get(LEADERBOARD_REBUILD)
+    if state is not None and state["phase"] != "place":
+        return
+    
+    user_text = user_id.to_str()
+    root = leaderboard_roots_storage.get(skill_id) or ""
+    if old_xp is not None:
+        old_key = _leaderboard_key(skill_id, old_xp, user_text)
+        # A rebuild may not have placed the old entry yet
+        if leaderboard_nodes_storage.contains_key(old_key):
+            root = _treap_remove(root, old_key)
+    key = _leaderboard_key(skill_id, new_xp, user_text)
+    if not leaderboard_nodes_storage.contains_key(key):
+        root = _treap_insert(root, key, _leaderboard_priority(key))
+    leaderboard_roots_storage.insert(skill_id, root)
+
+# Name of the leaderboard rebuild in index_rebuilds_storage
+LEADERBOARD_REBUILD = "_leaderboards"
+
+# User skills placed per leaderboard rebuild step (each costs O(log n) node writes)
+LEADERBOARD_REBUILD_BATCH = 100
+
+def _start_leaderboard_rebuild() -> None:
+    """Begin rebuilding every leaderboard from user_skills, unless already under way."""
+    if not index_rebuilds_storage.contains_key(LEADERBOARD_REBUILD):
+        _set_rebuild_phase(LEADERBOARD_REBUILD, "list_roots")
+    ic.set_timer(0, _continue_leaderboard_rebuild)
+
+def _continue_leaderboard_rebuild() -> void:
+    """
+    Timer callback: advance the leaderboard rebuild by one step. The roots
+    and then the nodes are listed once and dropped in batches, then the
+    user skills are listed once and placed in batches.
+    """
+    state = index_rebuilds_storage.get(LEADERBOARD_REBUILD)
+    if state is None:
+        return
+    ic.set_timer(0, _continue_leaderboard_rebuild)
+    
+    if state["phase"] == "list_roots":
+        _set_rebuild_phase(LEADERBOARD_REBUILD, "clear_roots", leaderboard_roots_storage.keys())
+        return
+    if state["phase"] == "list_nodes":
+        _set_rebuild_phase(LEADERBOARD_REBUILD, "clear_nodes", leaderboard_nodes_storage.keys())
+        return
+    if state["phase"] == "list_user_skills":
+        _set_rebuild_phase(LEADERBOARD_REBUILD, "place", user_skills_storage.keys())
+        return
+    
+    keys, finished = _take_rebuild_keys(LEADERBOARD_REBUILD, state, LEADERBOARD_REBUILD_BATCH)
+    for key in keys:
+        if state["phase"] == "clear_roots":
+            leaderboard_roots_storage.remove(key)
+        elif state["phase"] == "clear_nodes":
+            leaderboard_nodes_storage.remove(key)
+        else:
+            user_skill = user_skills_storage.get(key)
+            if user_skill is not None:
+                _update_leaderboard(user_skill["skill_id"], user_skill["user_id"], None, user_skill["current_xp"])
+    if not finished:
+        return
+    
+    if state["phase"] == "clear_roots":
+        _set_rebuild_phase(LEADERBOARD_REBUILD, "list_nodes")
+    elif state["phase"] == "clear_nodes":
+        _set_rebuild_phase(LEADERBOARD_REBUILD, "list_user_skills")
+    else:
+        index_rebuilds_storage.remove(LEADERBOARD_REBUILD)
+
 # ============================================================================
 # SERVICE FUNCTIONS
 # ============================================================================
@@ -458,7 +1846,7 @@ bitcoin_rewards_storage = StableBTreeMap[text, BitcoinReward](
 def get_user_by_id(user_id: str) -> GetUserResult:
     """Get a user by ID from persistent storage."""
     # Try to get user from storage
-    user = users_storage.get(user_id)
+    user = users_store.get(user_id)
     
     if user is not None:
         return GetUserResult(Ok=user)
@@ -487,7 +1875,7 @@ def register_user(params: RegisterUserParams) -> RegisterUserResult:
     user_key = str(caller_principal)
     
     # Check if user already exists
-    existing_user = users_storage.get(user_key)
+    existing_user = users_store.get(user_key)
     if existing_user is not None:
         return RegisterUserResult(Err=Error(InvalidInput="User already exists"))
     
@@ -503,7 +1891,7 @@ def register_user(params: RegisterUserParams) -> RegisterUserResult:
     )
     
     # Store user in persistent storage
-    users_storage.insert(user_key, new_user)
+    users_store.insert(user_key, new_user)
     
     return RegisterUserResult(Ok=new_user)
 
@@ -516,7 +1904,7 @@ def update_user(params: UpdateUserParams) -> UpdateUserResult:
     user_key = str(caller_principal)
     
     # Get existing user from storage
-    existing_user = users_storage.get(user_key)
+    existing_user = users_store.get(user_key)
     if existing_user is None:
         return UpdateUserResult(Err=Error(NotFound="User not found"))
     
@@ -538,21 +1926,26 @@ def update_user(params: UpdateUserParams) -> UpdateUserResult:
     )
     
     # Store updated user
-    users_storage.insert(user_key, updated_user)
+    users_store.insert(user_key, updated_user)
     
     return UpdateUserResult(Ok=updated_user)
 
 # List Users Function
 @query
 def list_users(params: ListUsersParams) -> ListUsersResult:
-    """List users with pagination from persistent storage."""
-    # Get all users from storage
-    all_users = []
-    for user_key, user in users_storage.items():
-        all_users.append(user)
-    
-    # If no users in storage, create mock users for demonstration
-    if len(all_users) == 0:
+    """List users with cursor (or skip/limit) pagination from persistent storage."""
+    # Access params as dict
+    skip = params["skip"]
+    limit = params["limit"]
+    cursor = params["cursor"]
+    
+    if not users_storage.is_empty():
+        # Walk the store's insertion-ordered index, touching only this page's users
+        page = users_store.page(skip=skip, limit=limit, cursor=cursor)
+        total = users_store.count()
+    else:
+        # If no users in storage, create mock users for demonstration
+        mock_users = []
         for i in range(5):
             user = User(
                 id=ic.caller(),
@@ -563,37 +1956,193 @@ def list_users(params: ListUsersParams) -> ListUsersResult:
                 updated_at=1627984000000 + i * 1000,
                 is_active=True
             )
-            all_users.append(user)
-    
-    # Apply pagination (access params as dict)
-    skip = params["skip"]
-    limit = params["limit"]
+            mock_users.append(user)
+        page = _paginate_items(mock_users, skip, limit, cursor, key=lambda user: user["username"])
+        total = len(mock_users)
     
-    # Simple pagination
-    start_idx = min(skip, len(all_users))
-    end_idx = min(skip + limit, len(all_users))
-    paginated_users = all_users[start_idx:end_idx]
+    if page is None:
+        return ListUsersResult(Err=Error(InvalidInput="Invalid cursor"))
+    paginated_users, next_cursor = page
     
     result = ListUsersResponse(
         items=paginated_users,
-        total=len(all_users),
+        total=total,
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
     )
     
     return ListUsersResult(Ok=result)
 
 # Assessment Service Functions
+
+# One byte per question plus the passing score byte
+MAX_QUESTIONS = 1000
+
+# Answer key of the sample assessment returned for unknown IDs (70% to pass)
+SAMPLE_ANSWER_KEY = bytes([70, 1, 2])
+
+# Encoded question bytes per assessment_questions_storage entry, below its
+# max_value_size to leave room for the Candid header and type table
+QUESTION_CHUNK_BYTES = 4000
+
+def _question_chunk_key(assessment_id: str, chunk_no: int) -> str:
+    """Build the assessment_questions_storage key of one question chunk."""
+    return f"{assessment_id}\x00{chunk_no:05d}"
+
+def _to_assessment(header, questions) -> Assessment:
+    """Build the public Assessment record from a stored header."""
+    return Assessment(
+        id=header["id"],
+        title=header["title"],
+        description=header["description"],
+        questions=questions,
+        time_limit=header["time_limit"],
+        passing_score=header["passing_score"],
+        skill_id=header["skill_id"],
+        creator_id=header["creator_id"],
+        created_at=header["created_at"],
+        updated_at=header["updated_at"],
+        is_active=header["is_active"]
+    )
+
+def _question_size(question) -> int:
+    """Upper bound on the Candid-encoded size of a question."""
+    texts = [question["id"], question["question_text"], question["explanation"],
+             question["difficulty"], question["skill_id"], *question["options"]]
+    # Each text carries a LEB128 length of at most 5 bytes; the options vector
+    # a length too, and correct_answer 8 bytes
+    return sum(len(value.encode()) + 5 for value in texts) + 5 + 8
+
+def _chunk_questions(questions):
+    """Split questions, in order, into chunks of at most QUESTION_CHUNK_BYTES."""
+    chunks = [[]]
+    chunk_size = 0
+    for question in questions:
+        size = _question_size(question)
+        if chunks[-1] and chunk_size + size > QUESTION_CHUNK_BYTES:
+            chunks.append([])
+            chunk_size = 0
+        chunks[-1].append(question)
+        chunk_size += size
+    return chunks
+
+def _load_questions(header):
+    """Assemble an assessment's questions from its stored chunks."""
+    # Chunks hold varying numbers of questions, so read until all are found
+    questions = []
+    chunk_no = 0
+    while len(questions) < header["question_count"]:
+        chunk = assessment_questions_storage.get(_question_chunk_key(header["id"], chunk_no))
+        if chunk is None:
+            break
+        questions.extend(chunk["questions"])
+        chunk_no += 1
+    return questions
+
+def _pack_answer_key(assessment) -> bytes:
+    """Pack an assessment's passing score and correct option indices into bytes."""
+    return bytes([assessment["passing_score"]] + [question["correct_answer"] for question in assessment["questions"]])
+
+# Score histogram buckets: [0, 10), [10, 20), ... with 100 in the last one
+SCORE_HISTOGRAM_BUCKETS = 10
+
+def _grade(answer_key: bytes, answers):
+    """Score answers against a packed answer key as a percentage.
+    
+    Returns the score and the per-question correctness flags.
+    """
+    question_count = len(answer_key) - 1
+    correct = list(map(operator.eq, answers, answer_key[1:]))
+    return (sum(correct) * 100) // question_count, correct
+
+def _grade_submission(params, answer_key: bytes, user_id, completed_at):
+    """Grade one submission into an AssessmentResult with a fresh result ID.
+    
+    Returns the result and the per-question correctness flags.
+    """
+    score, correct = _grade(answer_key, params["answers"])
+    
+    assessment_result = AssessmentResult(
+        id=_next_id("result"),
+        assessment_id=params["assessment_id"],
+        user_id=user_id,
+        answers=params["answers"],
+        score=score,
+        passed=score >= answer_key[0],
+        completed_at=completed_at,
+        time_taken=params["time_taken"]
+    )
+    
+    return assessment_result, correct
+
+def _empty_stats(assessment_id: str, question_count: int) -> AssessmentStats:
+    """Create zeroed statistics for an assessment with no attempts."""
+    return AssessmentStats(
+        assessment_id=assessment_id,
+        attempt_count=0,
+        pass_count=0,
+        score_sum=0,
+        score_sum_squares=0,
+        time_taken_sum=0,
+        question_correct_counts=[0] * question_count,
+        score_histogram=[0] * SCORE_HISTOGRAM_BUCKETS
+    )
+
+def _load_stats(assessment_id: str, question_count: int) -> AssessmentStats:
+    """Load an assessment's running statistics, or zeroed ones."""
+    stats = assessment_stats_storage.get(assessment_id)
+    if stats is None:
+        stats = _empty_stats(assessment_id, question_count)
+    return stats
+
+def _record_attempt_stats(stats, result, correct) -> None:
+    """Fold one graded attempt into running statistics (caller stores them)."""
+    score = result["score"]
+    stats["attempt_count"] += 1
+    stats["pass_count"] += 1 if result["passed"] else 0
+    stats["score_sum"] += score
+    stats["score_sum_squares"] += score * score
+    stats["time_taken_sum"] += result["time_taken"]
+    stats["question_correct_counts"] = list(map(operator.add, stats["question_correct_counts"], correct))
+    stats["score_histogram"][min(score // 10, SCORE_HISTOGRAM_BUCKETS - 1)] += 1
+
+def _histogram_median(histogram, count: int) -> float:
+    """Estimate the median score by interpolating within the histogram bucket."""
+    half = count / 2
+    seen = 0
+    for bucket, bucket_count in enumerate(histogram):
+        if bucket_count and seen + bucket_count >= half:
+            return bucket * 10 + 10 * (half - seen) / bucket_count
+        seen += bucket_count
+    return 0.0
+
 @update
 def create_assessment(params: CreateAssessmentParams) -> CreateAssessmentResult:
     """Create a new assessment."""
     caller_principal = ic.caller()
     current_time = ic.time() // 1_000_000
     
+    # Validate passing score and questions (access params as dict)
+    if params["passing_score"] > 100:
+        return CreateAssessmentResult(Err=Error(InvalidInput="Passing score must be between 0 and 100"))
+    
+    questions = params["questions"]
+    if len(questions) == 0:
+        return CreateAssessmentResult(Err=Error(InvalidInput="Assessment must have at least one question"))
+    if len(questions) >= MAX_QUESTIONS:
+        return CreateAssessmentResult(Err=Error(InvalidInput=f"Assessment cannot have more than {MAX_QUESTIONS - 1} questions"))
+    
+    for question in questions:
+        if question["correct_answer"] >= len(question["options"]) or question["correct_answer"] > 255:
+            return CreateAssessmentResult(Err=Error(InvalidInput=f"Correct answer out of range for question {question['id']}"))
+        if _question_size(question) > QUESTION_CHUNK_BYTES:
+            return CreateAssessmentResult(Err=Error(InvalidInput=f"Question {question['id']} exceeds {QUESTION_CHUNK_BYTES} bytes"))
+    
     # Generate assessment ID
-    assessment_id = f"assessment_{current_time}"
+    assessment_id = _next_id("assessment")
     
-    # Create assessment (access params as dict)
+    # Create assessment
     assessment = Assessment(
         id=assessment_id,
         title=params["title"],
@@ -608,12 +2157,40 @@ def create_assessment(params: CreateAssessmentParams) -> CreateAssessmentResult:
         is_active=True
     )
     
+    # Store questions in size-bounded chunks, then the header (indexed by
+    # skill_id) and the packed answer key
+    for chunk_no, chunk in enumerate(_chunk_questions(questions)):
+        assessment_questions_storage.insert(
+            _question_chunk_key(assessment_id, chunk_no),
+            QuestionChunk(questions=chunk)
+        )
+    
+    header = AssessmentHeader(
+        id=assessment_id,
+        title=assessment["title"],
+        description=assessment["description"],
+        question_count=len(questions),
+        time_limit=assessment["time_limit"],
+        passing_score=assessment["passing_score"],
+        skill_id=assessment["skill_id"],
+        creator_id=caller_principal,
+        created_at=current_time,
+        updated_at=current_time,
+        is_active=True
+    )
+    assessments_store.insert(assessment_id, header)
+    answer_keys_storage.insert(assessment_id, _pack_answer_key(assessment))
+    
     return CreateAssessmentResult(Ok=assessment)
 
 @query
 def get_assessment_by_id(assessment_id: str) -> GetAssessmentResult:
     """Get an assessment by ID."""
-    # Create mock assessment for demonstration
+    header = assessments_store.get(assessment_id)
+    if header is not None:
+        return GetAssessmentResult(Ok=_to_assessment(header, _load_questions(header)))
+    
+    # If not found, return mock assessment for backward compatibility
     mock_questions = [
         Question(
             id="q1",
@@ -654,7 +2231,38 @@ def get_assessment_by_id(assessment_id: str) -> GetAssessmentResult:
 @query
 def list_assessments(params: ListAssessmentsParams) -> ListAssessmentsResult:
     """List assessments with pagination."""
-    # Create mock assessments for demonstration
+    skill_id = params["skill_id"]
+    projection = params["projection"] if params["projection"] is not None else "summary"
+    if projection not in PROJECTIONS:
+        return ListAssessmentsResult(Err=Error(InvalidInput=f"Unknown projection: {projection}"))
+    
+    if not assessments_storage.is_empty():
+        skip = params["skip"]
+        limit = params["limit"]
+        
+        # Walk the skill_id index when filtering, otherwise the whole store;
+        # summaries only read headers, full listings also load question chunks
+        if skill_id is not None:
+            page = assessments_store.page("skill_id", skill_id, skip, limit, params["cursor"])
+            total = assessments_store.count("skill_id", skill_id)
+        else:
+            page = assessments_store.page(skip=skip, limit=limit, cursor=params["cursor"])
+            total = assessments_store.count()
+        
+        if page is None:
+            return ListAssessmentsResult(Err=Error(InvalidInput="Invalid cursor"))
+        headers, next_cursor = page
+        
+        return ListAssessmentsResult(Ok=ListAssessmentsResponse(
+            items=[_to_assessment(header, _load_questions(header) if projection == "full" else [])
+                   for header in headers],
+            total=total,
+            skip=skip,
+            limit=limit,
+            next_cursor=next_cursor
+        ))
+    
+    # No assessments stored yet, create mock assessments for demonstration
     mock_assessments = []
     for i in range(3):
         assessment = Assessment(
@@ -676,16 +2284,17 @@ def list_assessments(params: ListAssessmentsParams) -> ListAssessmentsResult:
     skip = params["skip"]
     limit = params["limit"]
     
-    # Simple pagination
-    start_idx = min(skip, len(mock_assessments))
-    end_idx = min(skip + limit, len(mock_assessments))
-    paginated_assessments = mock_assessments[start_idx:end_idx]
+    page = _paginate_items(mock_assessments, skip, limit, params["cursor"])
+    if page is None:
+        return ListAssessmentsResult(Err=Error(InvalidInput="Invalid cursor"))
+    paginated_assessments, next_cursor = page
     
     result = ListAssessmentsResponse(
         items=paginated_assessments,
         total=len(mock_assessments),
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
     )
     
     return ListAssessmentsResult(Ok=result)
@@ -696,49 +2305,273 @@ def submit_assessment(params: SubmitAssessmentParams) -> SubmitAssessmentResult:
     caller_principal = ic.caller()
     current_time = ic.time() // 1_000_000
     
-    # Calculate score (simplified - assume 2 questions, each worth 50 points)
+    assessment_id = params["assessment_id"]
     answers = params["answers"]
-    correct_answers = [1, 2]  # Mock correct answers for the sample questions
     
-    score = 0
-    for i, answer in enumerate(answers):
-        if i < len(correct_answers) and answer == correct_answers[i]:
-            score += 50
+    # Grade against the stored answer key; unknown IDs fall back to the
+    # sample assessment served by get_assessment_by_id
+    answer_key = answer_keys_storage.get(assessment_id)
+    is_stored = answer_key is not None
+    if not is_stored:
+        answer_key = SAMPLE_ANSWER_KEY
     
-    passed = score >= 70  # 70% passing score
+    if is_stored and len(answers) != len(answer_key) - 1:
+        return SubmitAssessmentResult(Err=Error(InvalidInput="Number of answers does not match number of questions"))
     
-    # Generate result ID
-    result_id = f"result_{current_time}"
+    assessment_result, correct = _grade_submission(params, answer_key, caller_principal, current_time)
     
-    assessment_result = AssessmentResult(
-        id=result_id,
-        assessment_id=params["assessment_id"],
-        user_id=caller_principal,
-        answers=answers,
-        score=score,
-        passed=passed,
-        completed_at=current_time,
-        time_taken=params["time_taken"]
-    )
+    if is_stored:
+        assessment_results_storage.insert(assessment_result["id"], assessment_result)
+        stats = _load_stats(assessment_id, len(correct))
+        _record_attempt_stats(stats, assessment_result, correct)
+        assessment_stats_storage.insert(assessment_id, stats)
     
     return SubmitAssessmentResult(Ok=assessment_result)
 
+# Largest batch accepted by submit_assessments_batch
+MAX_BATCH_SUBMISSIONS = 1000
+
+# Instructions a batch may use before it stops and reports the remainder,
+# kept well below the per-message limit so the final writes never trap
+BATCH_INSTRUCTION_BUDGET = 15_000_000_000
+
+@update
+def submit_assessments_batch(submissions: Vec[SubmitAssessmentParams]) -> SubmitAssessmentsBatchResult:
+    """Grade many assessment submissions in one call.
+    
+    Submissions are graded in order until the instruction budget would be
+    exceeded; the response reports how many were processed so the caller
+    can resend the remainder.
+    """
+    if len(submissions) > MAX_BATCH_SUBMISSIONS:
+        return SubmitAssessmentsBatchResult(Err=Error(InvalidInput=f"Batch cannot have more than {MAX_BATCH_SUBMISSIONS} submissions"))
+    
+    caller_principal = ic.caller()
+    current_time = ic.time() // 1_000_000
+    
+    # Answer keys and statistics are read once per assessment and the
+    # statistics written back once at the end
+    answer_keys = {}
+    batch_stats = {}
+    outcomes = []
+    most_expensive = 0
+    
+    for params in submissions:
+        started = ic.performance_counter(0)
+        if started + most_expensive > BATCH_INSTRUCTION_BUDGET:
+            break
+        
+        assessment_id = params["assessment_id"]
+        if assessment_id not in answer_keys:
+            answer_keys[assessment_id] = answer_keys_storage.get(assessment_id)
+        answer_key = answer_keys[assessment_id]
+        
+        if answer_key is None:
+            outcomes.append(SubmitAssessmentResult(Err=Error(NotFound=f"Assessment {assessment_id} not found")))
+        elif len(params["answers"]) != len(answer_key) - 1:
+            outcomes.append(SubmitAssessmentResult(Err=Error(InvalidInput="Number of answers does not match number of questions")))
+        else:
+            assessment_result, correct = _grade_submission(params, answer_key, caller_principal, current_time)
+            assessment_results_storage.insert(assessment_result["id"], assessment_result)
+            
+            if assessment_id not in batch_stats:
+                batch_stats[assessment_id] = _load_stats(assessment_id, len(correct))
+            _record_attempt_stats(batch_stats[assessment_id], assessment_result, correct)
+            
+            outcomes.append(SubmitAssessmentResult(Ok=assessment_result))
+        
+        most_expensive = max(most_expensive, ic.performance_counter(0) - started)
+    
+    for assessment_id, stats in batch_stats.items():
+        assessment_stats_storage.insert(assessment_id, stats)
+    
+    return SubmitAssessmentsBatchResult(Ok=SubmitAssessmentsBatchResponse(
+        outcomes=outcomes,
+        processed=len(outcomes),
+        remaining=len(submissions) - len(outcomes)
+    ))
+
+@query
+def get_assessment_stats(assessment_id: str) -> GetAssessmentStatsResult:
+    """Get pass rate, score distribution and per-question difficulty for an assessment."""
+    header = assessments_store.get(assessment_id)
+    if header is None:
+        return GetAssessmentStatsResult(Err=Error(NotFound=f"Assessment {assessment_id} not found"))
+    
+    stats = assessment_stats_storage.get(assessment_id)
+    if stats is None:
+        stats = _empty_stats(assessment_id, header["question_count"])
+    
+    attempts = stats["attempt_count"]
+    if attempts == 0:
+        return GetAssessmentStatsResult(Ok=AssessmentStatsResponse(
+            stats=stats,
+            pass_rate=0.0,
+            mean_score=0.0,
+            median_score=0.0,
+            score_std_dev=0.0,
+            average_time_taken=0.0,
+            question_p_values=[0.0] * len(stats["question_correct_counts"])
+        ))
+    
+    mean_score = stats["score_sum"] / attempts
+    variance = max(0.0, stats["score_sum_squares"] / attempts - mean_score * mean_score)
+    
+    return GetAssessmentStatsResult(Ok=AssessmentStatsResponse(
+        stats=stats,
+        pass_rate=stats["pass_count"] * 100 / attempts,
+        mean_score=mean_score,
+        median_score=_histogram_median(stats["score_histogram"], attempts),
+        score_std_dev=variance ** 0.5,
+        average_time_taken=stats["time_taken_sum"] / attempts,
+        question_p_values=[correct / attempts for correct in stats["question_correct_counts"]]
+    ))
+
 # Course Service Functions
+def _course_summary(course) -> CourseSummary:
+    """Build the module-free summary stored alongside a course."""
+    return CourseSummary(
+        id=course["id"],
+        title=course["title"],
+        description=course["description"],
+        module_count=len(course["modules"]),
+        skill_id=course["skill_id"],
+        difficulty=course["difficulty"],
+        estimated_duration=course["estimated_duration"],
+        creator_id=course["creator_id"],
+        created_at=course["created_at"],
+        updated_at=course["updated_at"],
+        is_published=course["is_published"],
+        enrollment_count=course["enrollment_count"]
+    )
+
+def _summary_to_course(summary) -> Course:
+    """Build a Course record with empty modules from a stored summary."""
+    return Course(
+        id=summary["id"],
+        title=summary["title"],
+        description=summary["description"],
+        modules=[],
+        skill_id=summary["skill_id"],
+        difficulty=summary["difficulty"],
+        estimated_duration=summary["estimated_duration"],
+        creator_id=summary["creator_id"],
+        created_at=summary["created_at"],
+        updated_at=summary["updated_at"],
+        is_published=summary["is_published"],
+        enrollment_count=summary["enrollment_count"]
+    )
+
+# Characters per module content chunk (at most 4 bytes each in UTF-8)
+MODULE_CONTENT_CHUNK_SIZE = 1024
+
+# Most characters returned by one get_module_content call
+MAX_MODULE_CONTENT_READ = 64 * MODULE_CONTENT_CHUNK_SIZE
+
+# Longest "<course_id>\x00<module_id>" key kept verbatim: the module stores
+# allow 250-byte keys and content chunks append "\x00<chunk_no>". Longer
+# keys are replaced by a hash, like long index values.
+MAX_MODULE_KEY_BYTES = 243
+
+def _module_key(course_id: str, module_id: str) -> str:
+    """Build the per-module key shared by the module content, length and position stores."""
+    key = f"{course_id}\x00{module_id}"
+    if len(key.encode()) > MAX_MODULE_KEY_BYTES:
+        return "#" + hashlib.sha256(key.encode()).hexdigest()[:40]
+    return key
+
+def _module_content_key(course_id: str, module_id: str, chunk_no: int) -> str:
+    """Build the module_content_storage key of one content chunk."""
+    return f"{_module_key(course_id, module_id)}\x00{chunk_no:05d}"
+
+def _store_module_content(course_id: str, module_id: str, content: str) -> None:
+    """Split a module body into fixed-size chunks and store them."""
+    for chunk_no, start in enumerate(range(0, len(content), MODULE_CONTENT_CHUNK_SIZE)):
+        module_content_storage.insert(
+            _module_content_key(course_id, module_id, chunk_no),
+            content[start:start + MODULE_CONTENT_CHUNK_SIZE]
+        )
+    module_content_lengths_storage.insert(_module_key(course_id, module_id), len(content))
+
+def _load_module_content(course_id: str, module_id: str) -> str:
+    """Reassemble a whole module body from its chunks."""
+    total_length = module_content_lengths_storage.get(_module_key(course_id, module_id)) or 0
+    chunk_count = (total_length + MODULE_CONTENT_CHUNK_SIZE - 1) // MODULE_CONTENT_CHUNK_SIZE
+    return "".join(module_content_storage.get(_module_content_key(course_id, module_id, chunk_no)) or ""
+                   for chunk_no in range(chunk_count))
+
+def _with_module_content(course) -> Course:
+    """A stored course with its module bodies filled in from the content store."""
+    return {**course, "modules": [{**module, "content": _load_module_content(course["id"], module["id"])}
+                                  for module in course["modules"]]}
+
+# Set once every course keeps its module bodies in module_content_storage
+MODULE_CONTENT_MIGRATION_KEY = "_migrations\x00module_content"
+
+def _migrate_module_content() -> int:
+    """
+    Move module bodies of courses stored before chunked content into
+    module_content_storage, leaving the outline in the course, and give
+    their modules progress bit positions. Returns the number of courses
+    rewritten.
+    """
+    migrated = 0
+    for course_id, course in courses_storage.items():
+        ordered_modules = sorted(course["modules"], key=lambda module: module["order"])
+        for position, module in enumerate(ordered_modules):
+            if not module_positions_storage.contains_key(_module_key(course_id, module["id"])):
+                module_positions_storage.insert(_module_key(course_id, module["id"]), position)
+        if not any(module["content"] for module in course["modules"]):
+            continue
+        for module in course["modules"]:
+            _store_module_content(course_id, module["id"], module["content"])
+        courses_store.insert(course_id, {**course, "modules": [{**module, "content": ""}
+                                                               for module in course["modules"]]})
+        migrated += 1
+    counters_storage.insert(MODULE_CONTENT_MIGRATION_KEY, 1)
+    return migrated
+
+def _store_course(course) -> None:
+    """Write a course and its summary record."""
+    courses_store.insert(course["id"], course)
+    course_summaries_storage.insert(course["id"], _course_summary(course))
+
 @update
 def create_course(params: CreateCourseParams) -> CreateCourseResult:
     """Create a new course."""
     caller_principal = ic.caller()
     current_time = ic.time() // 1_000_000
     
+    module_ids = [module["id"] for module in params["modules"]]
+    if len(set(module_ids)) != len(module_ids):
+        return CreateCourseResult(Err=Error(InvalidInput="Module IDs must be unique within a course"))
+    
     # Generate course ID
-    course_id = f"course_{current_time}"
+    course_id = _next_id("course")
+    
+    # Module bodies go to the chunked content store; the course keeps the outline.
+    # Each module also gets its bit position (by order) for progress bitsets.
+    for module in params["modules"]:
+        _store_module_content(course_id, module["id"], module["content"])
+    ordered_modules = sorted(params["modules"], key=lambda module: module["order"])
+    for position, module in enumerate(ordered_modules):
+        module_positions_storage.insert(_module_key(course_id, module["id"]), position)
+    outline = [CourseModule(
+        id=module["id"],
+        title=module["title"],
+        content="",
+        order=module["order"],
+        duration=module["duration"],
+        video_url=module["video_url"],
+        resources=module["resources"]
+    ) for module in params["modules"]]
     
     # Create course (access params as dict)
     course = Course(
         id=course_id,
         title=params["title"],
         description=params["description"],
-        modules=params["modules"],
+        modules=outline,
         skill_id=params["skill_id"],
         difficulty=params["difficulty"],
         estimated_duration=params["estimated_duration"],
@@ -749,12 +2582,44 @@ def create_course(params: CreateCourseParams) -> CreateCourseResult:
         enrollment_count=0
     )
     
+    # Store course (indexes by skill_id, difficulty, creator and status) and its summary
+    _store_course(course)
+    learning_path_cache.clear()
+    
     return CreateCourseResult(Ok=course)
 
+@query
+def get_module_content(course_id: str, module_id: str, offset: nat64, length: nat64) -> GetModuleContentResult:
+    """Read part of a module body, touching only the chunks that cover it."""
+    total_length = module_content_lengths_storage.get(_module_key(course_id, module_id))
+    if total_length is None:
+        return GetModuleContentResult(Err=Error(NotFound=f"Module {module_id} not found in course {course_id}"))
+    
+    start = min(offset, total_length)
+    end = min(start + min(length, MAX_MODULE_CONTENT_READ), total_length)
+    
+    parts = []
+    for chunk_no in range(start // MODULE_CONTENT_CHUNK_SIZE, (end + MODULE_CONTENT_CHUNK_SIZE - 1) // MODULE_CONTENT_CHUNK_SIZE):
+        chunk = module_content_storage.get(_module_content_key(course_id, module_id, chunk_no))
+        chunk_start = chunk_no * MODULE_CONTENT_CHUNK_SIZE
+        parts.append(chunk[max(start - chunk_start, 0):end - chunk_start])
+    
+    return GetModuleContentResult(Ok=ModuleContent(
+        course_id=course_id,
+        module_id=module_id,
+        offset=start,
+        content="".join(parts),
+        total_length=total_length
+    ))
+
 @query
 def get_course_by_id(course_id: str) -> GetCourseResult:
-    """Get a course by ID."""
-    # Create mock course modules
+    """Get a course by ID (module bodies are read with get_module_content)."""
+    course = courses_store.get(course_id)
+    if course is not None:
+        return GetCourseResult(Ok=course)
+    
+    # If not found, create mock course modules for backward compatibility
     mock_modules = [
         CourseModule(
             id="module_1",
@@ -796,7 +2661,48 @@ def get_course_by_id(course_id: str) -> GetCourseResult:
 @query
 def list_courses(params: ListCoursesParams) -> ListCoursesResult:
     """List courses with pagination and filters."""
-    # Create mock courses for demonstration
+    projection = params["projection"] if params["projection"] is not None else "summary"
+    if projection not in PROJECTIONS:
+        return ListCoursesResult(Err=Error(InvalidInput=f"Unknown projection: {projection}"))
+    
+    if not courses_storage.is_empty():
+        skip = params["skip"]
+        limit = params["limit"]
+        
+        # Use a composite index for the filter combination, or intersect the
+        # skill/difficulty/published/creator indexes, most selective first
+        filters = {}
+        if params["skill_id"] is not None:
+            filters["skill_id"] = params["skill_id"]
+        if params["difficulty"] is not None:
+            filters["difficulty"] = params["difficulty"]
+        if params["published_only"]:
+            filters["is_published"] = True
+        if params["creator_id"] is not None:
+            filters["creator_id"] = params["creator_id"]
+        
+        # Summary listings never deserialize module bodies
+        if projection == "full":
+            page = courses_store.select(filters, skip, limit, params["cursor"])
+        else:
+            page = courses_store.select(filters, skip, limit, params["cursor"], source=course_summaries_storage)
+        if page is None:
+            return ListCoursesResult(Err=Error(InvalidInput="Invalid cursor"))
+        paginated_courses, next_cursor, total = page
+        if projection == "full":
+            paginated_courses = [_with_module_content(course) for course in paginated_courses]
+        else:
+            paginated_courses = [_summary_to_course(summary) for summary in paginated_courses]
+        
+        return ListCoursesResult(Ok=ListCoursesResponse(
+            items=paginated_courses,
+            total=total,
+            skip=skip,
+            limit=limit,
+            next_cursor=next_cursor
+        ))
+    
+    # No courses stored yet, create mock courses for demonstration
     mock_courses = []
     difficulties = ["beginner", "intermediate", "advanced"]
     skills = ["programming", "mathematics", "science"]
@@ -822,28 +2728,71 @@ def list_courses(params: ListCoursesParams) -> ListCoursesResult:
     skip = params["skip"]
     limit = params["limit"]
     
-    # Simple pagination
-    start_idx = min(skip, len(mock_courses))
-    end_idx = min(skip + limit, len(mock_courses))
-    paginated_courses = mock_courses[start_idx:end_idx]
+    page = _paginate_items(mock_courses, skip, limit, params["cursor"])
+    if page is None:
+        return ListCoursesResult(Err=Error(InvalidInput="Invalid cursor"))
+    paginated_courses, next_cursor = page
     
     result = ListCoursesResponse(
         items=paginated_courses,
         total=len(mock_courses),
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
     )
     
     return ListCoursesResult(Ok=result)
 
+def _progress_key(user_id, course_id: str) -> str:
+    """Build the course_progress_storage key for a user's course."""
+    return f"{user_id.to_str()}\x00{course_id}"
+
+def _to_course_progress(state, course, user_id) -> CourseProgress:
+    """Expand stored progress into the public CourseProgress record."""
+    bits = _blob_to_bits(state["completed_bits"])
+    ordered_modules = sorted(course["modules"], key=lambda module: module["order"])
+    module_count = len(ordered_modules)
+    
+    return CourseProgress(
+        id=state["id"],
+        course_id=course["id"],
+        user_id=user_id,
+        completed_modules=[module["id"] for position, module in enumerate(ordered_modules) if bits >> position & 1],
+        progress_percentage=bin(bits).count("1") * 100 // module_count if module_count else 0,
+        started_at=state["started_at"],
+        last_accessed=state["last_accessed"],
+        completed_at=state["completed_at"]
+    )
+
 @update
 def enroll_course(params: EnrollCourseParams) -> EnrollCourseResult:
     """Enroll a user in a course."""
     caller_principal = ic.caller()
     current_time = ic.time() // 1_000_000
     
+    course = courses_store.get(params["course_id"])
+    if course is not None:
+        progress_key = _progress_key(caller_principal, course["id"])
+        state = course_progress_storage.get(progress_key)
+        
+        # Enrolling twice returns the existing progress without recounting
+        if state is None:
+            state = CourseProgressState(
+                id=_next_id("progress"),
+                completed_bits=b"",
+                started_at=current_time,
+                last_accessed=current_time,
+                completed_at=None
+            )
+            course_progress_storage.insert(progress_key, state)
+            course["enrollment_count"] += 1
+            _store_course(course)
+        
+        return EnrollCourseResult(Ok=_to_course_progress(state, course, caller_principal))
+    
+    # Course not stored, return mock progress for backward compatibility
     # Generate progress ID
-    progress_id = f"progress_{current_time}"
+    progress_id = _next_id("progress")
     
     course_progress = CourseProgress(
         id=progress_id,
@@ -864,12 +2813,40 @@ def update_course_progress(params: UpdateProgressParams) -> UpdateProgressResult
     caller_principal = ic.caller()
     current_time = ic.time() // 1_000_000
     
-    # Mock progress update
+    course_id = params["course_id"]
+    module_id = params["module_id"]
+    course = courses_store.get(course_id)
+    if course is not None:
+        progress_key = _progress_key(caller_principal, course_id)
+        state = course_progress_storage.get(progress_key)
+        if state is None:
+            return UpdateProgressResult(Err=Error(NotFound=f"Not enrolled in course {course_id}"))
+        
+        position = module_positions_storage.get(_module_key(course_id, module_id))
+        if position is None:
+            return UpdateProgressResult(Err=Error(NotFound=f"Module {module_id} not found in course {course_id}"))
+        
+        # Flip the module's bit; the percentage is a popcount over the module count
+        bits = _blob_to_bits(state["completed_bits"])
+        bits = bits | (1 << position) if params["completed"] else bits & ~(1 << position)
+        all_completed = bits == (1 << len(course["modules"])) - 1
+        
+        state["completed_bits"] = _bits_to_blob(bits)
+        state["last_accessed"] = current_time
+        if not all_completed:
+            state["completed_at"] = None
+        elif state["completed_at"] is None:
+            state["completed_at"] = current_time
+        course_progress_storage.insert(progress_key, state)
+        
+        return UpdateProgressResult(Ok=_to_course_progress(state, course, caller_principal))
+    
+    # Course not stored, mock progress update for backward compatibility
     completed_modules = [params["module_id"]] if params["completed"] else []
     progress_percentage = 50 if params["completed"] else 0
     
     # Generate progress ID
-    progress_id = f"progress_{current_time}"
+    progress_id = _next_id("progress")
     
     course_progress = CourseProgress(
         id=progress_id,
@@ -891,8 +2868,18 @@ def create_skill(params: CreateSkillParams) -> CreateSkillResult:
     caller_principal = ic.caller()
     current_time = ic.time() // 1_000_000
     
+    if _graph_is_full():
+        return CreateSkillResult(Err=Error(InvalidInput=f"Skill catalog is limited to {MAX_GRAPH_SKILLS} skills"))
+    if _prerequisites_too_large(params["prerequisites"]):
+        return CreateSkillResult(Err=Error(InvalidInput=f"Prerequisites exceed {MAX_PREREQUISITE_BYTES} bytes"))
+    
+    # Prerequisites must already exist (a new skill cannot close a cycle)
+    for prerequisite_id in params["prerequisites"]:
+        if not skill_graph_storage.contains_key(prerequisite_id):
+            return CreateSkillResult(Err=Error(InvalidInput=f"Prerequisite skill {prerequisite_id} not found"))
+    
     # Generate skill ID
-    skill_id = f"skill_{current_time}"
+    skill_id = _next_id("skill")
     
     # Create skill (access params as dict)
     skill = Skill(
@@ -909,11 +2896,59 @@ def create_skill(params: CreateSkillParams) -> CreateSkillResult:
         is_active=True
     )
     
+    # Store skill (indexes by category and difficulty) and its graph node
+    skills_store.insert(skill_id, skill)
+    _add_skill_to_graph(skill_id, params["prerequisites"])
+    learning_path_cache.clear()
+    
     return CreateSkillResult(Ok=skill)
 
+@update
+def update_skill_prerequisites(params: UpdateSkillPrerequisitesParams) -> UpdateSkillResult:
+    """Replace a skill's prerequisites, rejecting changes that create a cycle."""
+    skill_id = params["skill_id"]
+    skill = skills_store.get(skill_id)
+    if skill is None:
+        return UpdateSkillResult(Err=Error(NotFound=f"Skill {skill_id} not found"))
+    
+    error = _set_graph_prerequisites(skill_id, params["prerequisites"])
+    if error is not None:
+        return UpdateSkillResult(Err=Error(InvalidInput=error))
+    
+    skill["prerequisites"] = params["prerequisites"]
+    skill["updated_at"] = ic.time() // 1_000_000
+    skills_store.insert(skill_id, skill)
+    learning_path_cache.clear()
+    
+    return UpdateSkillResult(Ok=skill)
+
+@query
+def get_skill_prerequisites(skill_id: str) -> SkillPrerequisitesResult:
+    """Get every direct and indirect prerequisite of a skill, in learning order."""
+    node = skill_graph_storage.get(skill_id)
+    if node is None:
+        return SkillPrerequisitesResult(Err=Error(NotFound=f"Skill {skill_id} not found"))
+    
+    return SkillPrerequisitesResult(Ok=_topological_skill_ids(_blob_to_bits(node["closure"])))
+
+@query
+def is_skill_unlocked(user_id: Principal, skill_id: str) -> SkillUnlockedResult:
+    """Check whether a user has completed every prerequisite of a skill."""
+    node = skill_graph_storage.get(skill_id)
+    if node is None:
+        return SkillUnlockedResult(Err=Error(NotFound=f"Skill {skill_id} not found"))
+    
+    closure = _blob_to_bits(node["closure"])
+    return SkillUnlockedResult(Ok=closure & ~_completed_skill_bits(user_id) == 0)
+
 @query
 def get_skill_by_id(skill_id: str) -> GetSkillResult:
     """Get a skill by ID."""
+    skill = skills_store.get(skill_id)
+    if skill is not None:
+        return GetSkillResult(Ok=skill)
+    
+    # If not found, return mock data for backward compatibility
     mock_skill = Skill(
         id=skill_id,
         name="Python Programming",
@@ -933,7 +2968,34 @@ def get_skill_by_id(skill_id: str) -> GetSkillResult:
 @query
 def list_skills(params: ListSkillsParams) -> ListSkillsResult:
     """List skills with pagination and filters."""
-    # Create mock skills for demonstration
+    category = params["category"]
+    difficulty = params["difficulty"]
+    
+    if not skills_storage.is_empty():
+        skip = params["skip"]
+        limit = params["limit"]
+        
+        # Walk the (category, difficulty) list, or the one filtered index
+        filters = {}
+        if category is not None:
+            filters["category"] = category
+        if difficulty is not None:
+            filters["difficulty"] = difficulty
+        
+        page = skills_store.select(filters, skip, limit, params["cursor"])
+        if page is None:
+            return ListSkillsResult(Err=Error(InvalidInput="Invalid cursor"))
+        paginated_skills, next_cursor, total = page
+        
+        return ListSkillsResult(Ok=ListSkillsResponse(
+            items=paginated_skills,
+            total=total,
+            skip=skip,
+            limit=limit,
+            next_cursor=next_cursor
+        ))
+    
+    # No skills stored yet, create mock skills for demonstration
     categories = ["Programming", "Mathematics", "Science", "Language"]
     difficulties = ["beginner", "intermediate", "advanced"]
     
@@ -958,46 +3020,165 @@ def list_skills(params: ListSkillsParams) -> ListSkillsResult:
     skip = params["skip"]
     limit = params["limit"]
     
-    # Simple pagination
-    start_idx = min(skip, len(mock_skills))
-    end_idx = min(skip + limit, len(mock_skills))
-    paginated_skills = mock_skills[start_idx:end_idx]
+    page = _paginate_items(mock_skills, skip, limit, params["cursor"])
+    if page is None:
+        return ListSkillsResult(Err=Error(InvalidInput="Invalid cursor"))
+    paginated_skills, next_cursor = page
     
     result = ListSkillsResponse(
         items=paginated_skills,
         total=len(mock_skills),
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
     )
     
     return ListSkillsResult(Ok=result)
 
+# Mastery threshold table: minimum accumulated XP for each level, ascending
+MASTERY_THRESHOLDS = [(0, "beginner"), (250, "intermediate"), (500, "advanced"), (750, "expert")]
+
+# Accumulated XP at which a skill counts as fully mastered (100%)
+MASTERY_XP = 1000
+
+# Compact a ledger once this many events are uncompacted, keeping the most
+# recent XP_RECENT_EVENTS as raw events
+XP_COMPACTION_THRESHOLD = 100
+XP_RECENT_EVENTS = 20
+
+# Checkpoints kept per ledger; when full, all but the newest are rolled into one
+XP_MAX_CHECKPOINTS = 8
+
+# Most XP events returned by one get_xp_history call
+MAX_XP_HISTORY_PAGE = 100
+
+# Longest activity_type an XP event stores; with the other fields this
+# keeps an event within xp_events_storage's 300-byte values
+MAX_ACTIVITY_TYPE_BYTES = 100
+
+def _user_skill_key(user_id, skill_id: str) -> str:
+    """Build the per-(user, skill) key shared by the XP stores."""
+    return f"{user_id.to_str()}\x00{skill_id}"
+
+def _mastery(total_xp: int):
+    """Look up the mastery level and progress percentage for accumulated XP."""
+    mastery_level = MASTERY_THRESHOLDS[0][1]
+    for threshold, level in MASTERY_THRESHOLDS:
+        if total_xp < threshold:
+            break
+        mastery_level = level
+    return mastery_level, min(100, total_xp * 100 // MASTERY_XP)
+
+def _roll_up_xp_checkpoints(ledger_key: str, ledger) -> None:
+    """Merge every checkpoint but the newest into checkpoint 0."""
+    keys = [f"{ledger_key}\x00{n:06d}" for n in range(ledger["checkpoint_count"])]
+    checkpoints = [xp_checkpoints_storage.get(key) for key in keys]
+    rolled, newest = checkpoints[:-1], checkpoints[-1]
+    
+    xp_checkpoints_storage.insert(keys[0], XpCheckpoint(
+        through_sequence=rolled[-1]["through_sequence"],
+        event_count=sum(checkpoint["event_count"] for checkpoint in rolled),
+        xp_gained=sum(checkpoint["xp_gained"] for checkpoint in rolled),
+        total_xp=rolled[-1]["total_xp"],
+        first_at=rolled[0]["first_at"],
+        last_at=rolled[-1]["last_at"]
+    ))
+    xp_checkpoints_storage.insert(keys[1], newest)
+    for key in keys[2:]:
+        xp_checkpoints_storage.remove(key)
+    ledger["checkpoint_count"] = 2
+
+def _compact_xp_log(ledger_key: str, ledger) -> None:
+    """Fold all but the most recent uncompacted events into one checkpoint."""
+    through = ledger["next_sequence"] - XP_RECENT_EVENTS
+    if ledger["checkpoint_count"] >= XP_MAX_CHECKPOINTS:
+        _roll_up_xp_checkpoints(ledger_key, ledger)
+    
+    previous = None
+    if ledger["checkpoint_count"] > 0:
+        previous = xp_checkpoints_storage.get(f"{ledger_key}\x00{ledger['checkpoint_count'] - 1:06d}")
+    total_xp = previous["total_xp"] if previous is not None else 0
+    
+    xp_gained = 0
+    first_at = None
+    last_at = 0
+    for sequence in range(ledger["compacted_through"], through):
+        event = xp_events_storage.remove(f"{ledger_key}\x00{sequence:010d}")
+        xp_gained += event["amount"]
+        first_at = event["timestamp"] if first_at is None else first_at
+        last_at = event["timestamp"]
+    
+    xp_checkpoints_storage.insert(f"{ledger_key}\x00{ledger['checkpoint_count']:06d}", XpCheckpoint(
+        through_sequence=through - 1,
+        event_count=through - ledger["compacted_through"],
+        xp_gained=xp_gained,
+        total_xp=total_xp + xp_gained,
+        first_at=first_at,
+        last_at=last_at
+    ))
+    ledger["compacted_through"] = through
+    ledger["checkpoint_count"] += 1
+
 @update
 def update_skill_progress(params: UpdateSkillProgressParams) -> UpdateSkillProgressResult:
-    """Update user's progress in a skill."""
+    """Add XP to the caller's progress in a skill."""
     caller_principal = ic.caller()
     current_time = ic.time() // 1_000_000
-    
-    # Calculate new progress
     xp_gained = params["xp_gained"]
-    new_total_xp = xp_gained  # Simplified - in real implementation, would add to existing XP
-    
-    # Determine mastery level based on XP
-    if new_total_xp < 250:
-        mastery_level = "beginner"
-        progress_percentage = (new_total_xp * 100) // 250
-    elif new_total_xp < 500:
-        mastery_level = "intermediate"
-        progress_percentage = 25 + ((new_total_xp - 250) * 25) // 250
-    elif new_total_xp < 750:
-        mastery_level = "advanced"
-        progress_percentage = 50 + ((new_total_xp - 500) * 25) // 250
-    else:
-        mastery_level = "expert"
-        progress_percentage = 75 + min(25, ((new_total_xp - 750) * 25) // 250)
+    
+    if len(params["activity_type"].encode()) > MAX_ACTIVITY_TYPE_BYTES:
+        return UpdateSkillProgressResult(Err=Error(InvalidInput=f"Activity type exceeds {MAX_ACTIVITY_TYPE_BYTES} bytes"))
+    
+    if skills_store.get(params["skill_id"]) is not None:
+        key = _user_skill_key(caller_principal, params["skill_id"])
+        user_skill = user_skills_storage.get(key)
+        if user_skill is None:
+            user_skill = UserSkill(
+                id=_next_id("user_skill"),
+                user_id=caller_principal,
+                skill_id=params["skill_id"],
+                current_xp=0,
+                mastery_level=MASTERY_THRESHOLDS[0][1],
+                progress_percentage=0,
+                started_at=current_time,
+                last_updated=current_time,
+                completed_at=None,
+                certificates_earned=[]
+            )
+        
+        # Append the event to the log, then fold it into the accumulator
+        ledger = xp_ledgers_storage.get(key)
+        if ledger is None:
+            ledger = XpLedger(next_sequence=0, compacted_through=0, checkpoint_count=0)
+        xp_events_storage.insert(f"{key}\x00{ledger['next_sequence']:010d}", XpEvent(
+            sequence=ledger["next_sequence"],
+            activity_type=params["activity_type"],
+            amount=xp_gained,
+            timestamp=current_time
+        ))
+        ledger["next_sequence"] += 1
+        if ledger["next_sequence"] - ledger["compacted_through"] >= XP_COMPACTION_THRESHOLD:
+            _compact_xp_log(key, ledger)
+        xp_ledgers_storage.insert(key, ledger)
+        
+        previous_xp = user_skill["current_xp"] if user_skills_storage.contains_key(key) else None
+        user_skill["current_xp"] += xp_gained
+        user_skill["mastery_level"], user_skill["progress_percentage"] = _mastery(user_skill["current_xp"])
+        user_skill["last_updated"] = current_time
+        if user_skill["progress_percentage"] == 100 and user_skill["completed_at"] is None:
+            user_skill["completed_at"] = current_time
+            user_skill["certificates_earned"] = user_skill["certificates_earned"] + ["completion_certificate"]
+        user_skills_store.insert(key, user_skill)
+        _update_leaderboard(params["skill_id"], caller_principal, previous_xp, user_skill["current_xp"])
+        
+        return UpdateSkillProgressResult(Ok=user_skill)
+    
+    # Skill not stored, report progress for this XP alone for backward compatibility
+    new_total_xp = xp_gained
+    mastery_level, progress_percentage = _mastery(new_total_xp)
     
     # Generate user skill ID
-    user_skill_id = f"user_skill_{current_time}"
+    user_skill_id = _next_id("user_skill")
     
     user_skill = UserSkill(
         id=user_skill_id,
@@ -1014,10 +3195,115 @@ def update_skill_progress(params: UpdateSkillProgressParams) -> UpdateSkillProgr
     
     return UpdateSkillProgressResult(Ok=user_skill)
 
+@query
+def get_xp_history(user_id: Principal, skill_id: str, cursor: Opt[str], limit: nat64) -> GetXpHistoryResult:
+    """
+    Get a page of a user's XP history in a skill: the compacted checkpoints
+    (first page only), then up to `limit` recent events. Pass next_cursor
+    back to continue; events compacted in between are covered by the
+    checkpoints.
+    """
+    key = _user_skill_key(user_id, skill_id)
+    ledger = xp_ledgers_storage.get(key)
+    if ledger is None:
+        return GetXpHistoryResult(Err=Error(NotFound=f"No XP recorded for skill {skill_id}"))
+    
+    # The cursor is the sequence of the next event to return
+    start = ledger["compacted_through"]
+    if cursor is not None:
+        if not cursor.isdigit():
+            return GetXpHistoryResult(Err=Error(InvalidInput="Invalid cursor"))
+        start = max(start, int(cursor))
+    end = min(ledger["next_sequence"], start + min(limit, MAX_XP_HISTORY_PAGE))
+    
+    return GetXpHistoryResult(Ok=XpHistory(
+        checkpoints=[xp_checkpoints_storage.get(f"{key}\x00{n:06d}") for n in range(ledger["checkpoint_count"])]
+                    if cursor is None else [],
+        events=[xp_events_storage.get(f"{key}\x00{sequence:010d}") for sequence in range(start, end)],
+        next_cursor=str(end) if end < ledger["next_sequence"] else None
+    ))
+
+@query
+def get_leaderboard(skill_id: str, cursor: Opt[str], limit: nat64) -> GetLeaderboardResult:
+    """Get a page of a skill's leaderboard, highest XP first."""
+    if not skills_storage.contains_key(skill_id):
+        return GetLeaderboardResult(Err=Error(NotFound=f"Skill {skill_id} not found"))
+    
+    root = leaderboard_roots_storage.get(skill_id) or ""
+    # The cursor is the tail of the last key returned; resume right after it
+    start = f"{skill_id}\x00{cursor}\x00" if cursor is not None else f"{skill_id}\x00"
+    keys = _treap_keys_from(root, start, min(limit, MAX_LEADERBOARD_PAGE))
+    
+    entries = []
+    position = _treap_count_below(root, keys[0]) if keys else 0
+    for node_key in keys:
+        _, inverted_xp, user_text = node_key.split("\x00")
+        xp = LEADERBOARD_XP_BOUND - int(inverted_xp)
+        if entries and entries[-1]["xp"] == xp:
+            rank = entries[-1]["rank"]
+        elif entries:
+            rank = position + 1
+        else:
+            rank = _treap_count_below(root, _leaderboard_key(skill_id, xp, "")) + 1
+        entries.append(LeaderboardEntry(rank=rank, user_id=Principal.from_str(user_text), xp=xp))
+        position += 1
+    
+    total = _subtree_size(root)
+    next_cursor = None
+    if keys and position < total:
+        next_cursor = keys[-1][len(skill_id) + 1:]
+    
+    return GetLeaderboardResult(Ok=LeaderboardPage(
+        skill_id=skill_id,
+        entries=entries,
+        total=total,
+        next_cursor=next_cursor
+    ))
+
+@query
+def get_user_rank(user_id: Principal, skill_id: str) -> GetUserRankResult:
+    """Get a user's rank on a skill's leaderboard."""
+    user_skill = user_skills_storage.get(_user_skill_key(user_id, skill_id))
+    if user_skill is None:
+        return GetUserRankResult(Err=Error(NotFound=f"No XP recorded for skill {skill_id}"))
+    
+    root = leaderboard_roots_storage.get(skill_id) or ""
+    xp = user_skill["current_xp"]
+    return GetUserRankResult(Ok=UserRank(
+        skill_id=skill_id,
+        rank=_treap_count_below(root, _leaderboard_key(skill_id, xp, "")) + 1,
+        xp=xp,
+        total=_subtree_size(root)
+    ))
+
 @query
 def get_user_skills(params: GetUserSkillsParams) -> ListUserSkillsResult:
     """Get user's skills with progress."""
-    # Create mock user skills for demonstration
+    if not user_skills_storage.is_empty():
+        skip = params["skip"]
+        limit = params["limit"]
+        user_id = params["user_id"]
+        
+        # Walk the user's list, or the (user, mastery level) list when filtering
+        if params["mastery_level"] is not None:
+            filters = {("user_id", "mastery_level"): (user_id, params["mastery_level"])}
+        else:
+            filters = {"user_id": user_id}
+        
+        page = user_skills_store.select(filters, skip, limit, params["cursor"])
+        if page is None:
+            return ListUserSkillsResult(Err=Error(InvalidInput="Invalid cursor"))
+        paginated_user_skills, next_cursor, total = page
+        
+        return ListUserSkillsResult(Ok=ListUserSkillsResponse(
+            items=paginated_user_skills,
+            total=total,
+            skip=skip,
+            limit=limit,
+            next_cursor=next_cursor
+        ))
+    
+    # No user skills stored yet, create mock user skills for demonstration
     mock_user_skills = []
     mastery_levels = ["beginner", "intermediate", "advanced", "expert"]
     
@@ -1040,16 +3326,17 @@ def get_user_skills(params: GetUserSkillsParams) -> ListUserSkillsResult:
     skip = params["skip"]
     limit = params["limit"]
     
-    # Simple pagination
-    start_idx = min(skip, len(mock_user_skills))
-    end_idx = min(skip + limit, len(mock_user_skills))
-    paginated_user_skills = mock_user_skills[start_idx:end_idx]
+    page = _paginate_items(mock_user_skills, skip, limit, params["cursor"])
+    if page is None:
+        return ListUserSkillsResult(Err=Error(InvalidInput="Invalid cursor"))
+    paginated_user_skills, next_cursor = page
     
     result = ListUserSkillsResponse(
         items=paginated_user_skills,
         total=len(mock_user_skills),
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
     )
     
     return ListUserSkillsResult(Ok=result)
@@ -1062,7 +3349,7 @@ def generate_course_content(params: GenerateCourseContentParams) -> GenerateCour
     current_time = ic.time() // 1_000_000
     
     # Generate prompt ID
-    prompt_id = f"prompt_{current_time}"
+    prompt_id = _next_id("prompt")
     
     # Create AI prompt
     ai_prompt = AIPrompt(
@@ -1118,7 +3405,7 @@ def validate_answer(params: ValidateAnswerParams) -> ValidateAnswerResult:
     current_time = ic.time() // 1_000_000
     
     # Generate prompt ID
-    prompt_id = f"prompt_{current_time}"
+    prompt_id = _next_id("prompt")
     
     # Create AI prompt
     ai_prompt = AIPrompt(
@@ -1164,7 +3451,7 @@ def generate_nft_metadata(params: GenerateNFTMetadataParams) -> GenerateNFTMetad
     current_time = ic.time() // 1_000_000
     
     # Generate prompt ID
-    prompt_id = f"prompt_{current_time}"
+    prompt_id = _next_id("prompt")
     
     # Create AI prompt
     ai_prompt = AIPrompt(
@@ -1207,7 +3494,7 @@ def create_bitcoin_reward(params: CreateBitcoinRewardParams) -> CreateBitcoinRew
     current_time = ic.time() // 1_000_000
     
     # Generate reward ID
-    reward_id = f"btc_reward_{current_time}"
+    reward_id = _next_id("btc_reward")
     
     # Create Bitcoin reward
     bitcoin_reward = BitcoinReward(
@@ -1220,6 +3507,9 @@ def create_bitcoin_reward(params: CreateBitcoinRewardParams) -> CreateBitcoinRew
         status="pending"
     )
     
+    # Store reward (indexed by user_id)
+    bitcoin_rewards_store.insert(reward_id, bitcoin_reward)
+    
     return CreateBitcoinRewardResult(Ok=bitcoin_reward)
 
 @update
@@ -1227,6 +3517,13 @@ def process_bitcoin_reward(reward_id: str) -> ProcessBitcoinRewardResult:
     """Process a pending Bitcoin reward."""
     current_time = ic.time() // 1_000_000
     
+    stored_reward = bitcoin_rewards_store.get(reward_id)
+    if stored_reward is not None:
+        # In real implementation would interact with Bitcoin network before completing
+        stored_reward["status"] = "completed"
+        bitcoin_rewards_store.insert(reward_id, stored_reward)
+        return ProcessBitcoinRewardResult(Ok=stored_reward)
+    
     # Mock processing - in real implementation would interact with Bitcoin network
     processed_reward = BitcoinReward(
         id=reward_id,
@@ -1243,6 +3540,10 @@ def process_bitcoin_reward(reward_id: str) -> ProcessBitcoinRewardResult:
 @query
 def get_bitcoin_reward(reward_id: str) -> GetBitcoinRewardResult:
     """Get a specific Bitcoin reward by ID."""
+    stored_reward = bitcoin_rewards_store.get(reward_id)
+    if stored_reward is not None:
+        return GetBitcoinRewardResult(Ok=stored_reward)
+    
     # Mock reward for demonstration
     mock_reward = BitcoinReward(
         id=reward_id,
@@ -1259,7 +3560,11 @@ def get_bitcoin_reward(reward_id: str) -> GetBitcoinRewardResult:
 @query
 def get_user_bitcoin_rewards(user_id: Principal) -> ListBitcoinRewardsResult:
     """Get all Bitcoin rewards for a user."""
-    # Mock rewards for demonstration
+    if not bitcoin_rewards_storage.is_empty():
+        # Walk the user_id index rather than scanning every reward
+        return ListBitcoinRewardsResult(Ok=bitcoin_rewards_store.scan("user_id", user_id))
+    
+    # No rewards stored yet, return mock rewards for demonstration
     mock_rewards = [
         BitcoinReward(
             id="btc_reward_1",
@@ -1402,6 +3707,7 @@ class ListAIAgentsResponse(Record):
     total: nat64
     skip: nat64
     limit: nat64
+    next_cursor: Opt[str]
 
 class ListAIAgentsResult(Variant):
     Ok: 'ListAIAgentsResponse'
@@ -1412,6 +3718,7 @@ class ListTutorSessionsResponse(Record):
     total: nat64
     skip: nat64
     limit: nat64
+    next_cursor: Opt[str]
 
 class ListTutorSessionsResult(Variant):
     Ok: 'ListTutorSessionsResponse'
@@ -1439,7 +3746,7 @@ class GetLearningAnalyticsResult(Variant):
 @query
 def get_user_count(dummy: str) -> nat64:
     """Get the total number of users."""
-    return 42
+    return users_store.count()
 
 @query
 def get_greeting(name: str) -> str:
@@ -1451,7 +3758,7 @@ def get_greeting(name: str) -> str:
 def create_ai_agent(params: CreateAIAgentParams) -> CreateAIAgentResult:
     """Create a new AI agent."""
     current_time = ic.time() // 1_000_000
-    agent_id = f"agent_{current_time}_{ic.caller()}"
+    agent_id = _next_id("agent")
     
     ai_agent = AIAgent(
         id=agent_id,
@@ -1494,7 +3801,7 @@ def get_ai_agent(agent_id: str) -> GetAIAgentResult:
     return GetAIAgentResult(Ok=mock_agent)
 
 @query
-def list_ai_agents(skip: nat64, limit: nat64) -> ListAIAgentsResult:
+def list_ai_agents(skip: nat64, limit: nat64, cursor: Opt[str]) -> ListAIAgentsResult:
     """List available AI agents."""
     # Mock AI agents for demonstration
     mock_agents = [
@@ -1545,11 +3852,17 @@ def list_ai_agents(skip: nat64, limit: nat64) -> ListAIAgentsResult:
         )
     ]
     
+    page = _paginate_items(mock_agents, skip, limit, cursor)
+    if page is None:
+        return ListAIAgentsResult(Err=Error(InvalidInput="Invalid cursor"))
+    paginated_agents, next_cursor = page
+    
     response = ListAIAgentsResponse(
-        items=mock_agents,
-        total=3,
+        items=paginated_agents,
+        total=len(mock_agents),
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
     )
     
     return ListAIAgentsResult(Ok=response)
@@ -1558,7 +3871,7 @@ def list_ai_agents(skip: nat64, limit: nat64) -> ListAIAgentsResult:
 def chat_with_agent(params: ChatWithAgentParams) -> ChatWithAgentResult:
     """Chat with an AI agent."""
     current_time = ic.time() // 1_000_000
-    interaction_id = f"interaction_{current_time}"
+    interaction_id = _next_id("interaction")
     
     # Simulate AI response based on agent type and message
     message = params["message"].lower()
@@ -1755,11 +4068,11 @@ def get_{topic.lower().replace(' ', '_')}(id: str) -> str:
 def start_tutor_session(params: StartTutorSessionParams) -> StartTutorSessionResult:
     """Start a new AI tutoring session."""
     current_time = ic.time() // 1_000_000
-    session_id = f"session_{current_time}"
+    session_id = _next_id("session")
     
     # Create initial interaction
     initial_interaction = AIInteraction(
-        id=f"interaction_{current_time}_001",
+        id=_next_id("interaction"),
         agent_id=params["agent_id"],
         user_id=ic.caller(),
         prompt=params["initial_message"],
@@ -1791,14 +4104,45 @@ def start_tutor_session(params: StartTutorSessionParams) -> StartTutorSessionRes
 def generate_learning_path(params: GenerateLearningPathParams) -> GenerateLearningPathResult:
     """Generate a personalized learning path using AI."""
     current_time = ic.time() // 1_000_000
-    path_id = f"path_{current_time}"
+    path_id = _next_id("path")
     
     # AI-generated learning path based on user parameters
     user_skills = params["user_skills"]
     learning_goals = params["learning_goals"]
     difficulty = params["preferred_difficulty"]
     
-    # Determine recommended courses based on skills and goals
+    if params["time_commitment"] == 0:
+        return GenerateLearningPathResult(Err=Error(InvalidInput="Time commitment must be at least one hour per week"))
+    
+    # Plan over the skill graph: goal skills and their prerequisites the
+    # user has not completed, in prerequisite order
+    plan = _plan_learning_path(learning_goals, user_skills, ic.caller(), difficulty)
+    if plan is not None:
+        recommended_courses, skill_priorities, total_minutes = plan
+        hours_per_week = params["time_commitment"]
+        estimated_timeline = (total_minutes + hours_per_week * 60 - 1) // (hours_per_week * 60)  # weeks
+    else:
+        recommended_courses, skill_priorities = _keyword_learning_path(learning_goals)
+        estimated_timeline = params["time_commitment"] * 12  # weeks based on hours per week
+    
+    learning_path = PersonalizedLearningPath(
+        id=path_id,
+        user_id=ic.caller(),
+        generated_by_agent="agent_learning_path_ai",
+        recommended_courses=recommended_courses,
+        skill_priorities=skill_priorities,
+        difficulty_progression=f"Start with {difficulty} level, progress to intermediate, then advanced",
+        estimated_timeline=estimated_timeline,
+        adaptive_adjustments='{"learning_style_adaptations": "visual_learner", "pacing_adjustments": "standard", "difficulty_scaling": "gradual"}',
+        created_at=current_time,
+        updated_at=current_time,
+        is_active=True
+    )
+    
+    return GenerateLearningPathResult(Ok=learning_path)
+
+def _keyword_learning_path(learning_goals):
+    """Keyword-based recommendations used when no goal matches a stored skill."""
     recommended_courses = []
     skill_priorities = []
     
@@ -1819,21 +4163,7 @@ def generate_learning_path(params: GenerateLearningPathParams) -> GenerateLearni
         recommended_courses = ["blockchain_basics", "web3_introduction", "smart_contract_security"]
         skill_priorities = ["programming_fundamentals", "blockchain_concepts", "security_practices"]
     
-    learning_path = PersonalizedLearningPath(
-        id=path_id,
-        user_id=ic.caller(),
-        generated_by_agent="agent_learning_path_ai",
-        recommended_courses=recommended_courses,
-        skill_priorities=skill_priorities,
-        difficulty_progression=f"Start with {difficulty} level, progress to intermediate, then advanced",
-        estimated_timeline=params["time_commitment"] * 12,  # weeks based on hours per week
-        adaptive_adjustments='{"learning_style_adaptations": "visual_learner", "pacing_adjustments": "standard", "difficulty_scaling": "gradual"}',
-        created_at=current_time,
-        updated_at=current_time,
-        is_active=True
-    )
-    
-    return GenerateLearningPathResult(Ok=learning_path)
+    return recommended_courses, skill_priorities
 
 @query
 def get_learning_analytics(user_id: Principal) -> GetLearningAnalyticsResult:
@@ -1863,11 +4193,54 @@ def get_learning_analytics(user_id: Principal) -> GetLearningAnalyticsResult:
     
     return GetLearningAnalyticsResult(Ok=analytics)
 
+# Storage Maintenance Functions
+def _continue_index_rebuilds() -> void:
+    """Timer callback: advance the first started rebuild by one step until all are done."""
+    for store in INDEXED_STORES.values():
+        if index_rebuilds_storage.contains_key(store.name):
+            store.rebuild_step(INDEX_REBUILD_BATCH)
+            ic.set_timer(0, _continue_index_rebuilds)
+            return
+
+def _record_controller() -> None:
+    """Remember the principal installing or upgrading the code, which is a controller."""
+    controllers_storage.insert(ic.caller().to_str(), ic.time())
+
+def _is_controller(principal) -> bool:
+    # Kybra 0.5 has no controller check, so trust the recorded installers
+    return controllers_storage.contains_key(principal.to_str())
+
+@update
+def rebuild_indexes(store_name: str) -> RebuildIndexesResult:
+    """
+    Rebuild the secondary indexes of a store from its existing records
+    (controllers only). The rebuild runs in batches on timers; listings of
+    the store are incomplete until it finishes.
+    """
+    if not _is_controller(ic.caller()):
+        return RebuildIndexesResult(Err=Error(Unauthorized="Only controllers can rebuild indexes"))
+    
+    store = INDEXED_STORES.get(store_name)
+    if store is None:
+        return RebuildIndexesResult(Err=Error(NotFound=f"Unknown store: {store_name}"))
+
+    store.start_rebuild()
+    ic.set_timer(0, _continue_index_rebuilds)
+    return RebuildIndexesResult(Ok=store.primary.len())
+
 # Lifecycle functions
 @init
 def init_function() -> void:
     """Initialize the canister state."""
-    pass
+    _record_controller()
+    
+    # A fresh canister has no records to index or course content to migrate
+    for store in INDEXED_STORES.values():
+        store.mark_indexed()
+    counters_storage.insert(MODULE_CONTENT_MIGRATION_KEY, 1)
+    counters_storage.insert(SKILL_GRAPH_MIGRATION_KEY, 1)
+    
+    ic.set_timer(0, _seed_leaderboard_salt)
 
 @pre_upgrade
 def pre_upgrade_function() -> void:
@@ -1877,4 +4250,36 @@ def pre_upgrade_function() -> void:
 @post_upgrade
 def post_upgrade_function() -> void:
     """Restore state after canister upgrade."""
-    pass
+    _record_controller()
+    
+    # Backfill indexes and counters for stores holding records written before
+    # they existed, in batches on timers (an interrupted rebuild continues)
+    for store in INDEXED_STORES.values():
+        if store.needs_rebuild():
+            store.start_rebuild()
+    if not index_rebuilds_storage.is_empty():
+        ic.set_timer(0, _continue_index_rebuilds)
+    
+    # Move module bodies of courses stored before chunked content into chunks
+    if not counters_storage.contains_key(MODULE_CONTENT_MIGRATION_KEY):
+        _migrate_module_content()
+    
+    # Add summaries for courses stored before summary records existed
+    if course_summaries_storage.len() != courses_storage.len():
+        for course_id, course in courses_storage.items():
+            if not course_summaries_storage.contains_key(course_id):
+                course_summaries_storage.insert(course_id, _course_summary(course))
+    
+    # Add prerequisite graph nodes for skills created before the graph
+    # existed, once, in batches on timers (an interrupted backfill continues)
+    if not counters_storage.contains_key(SKILL_GRAPH_MIGRATION_KEY):
+        _start_skill_graph_rebuild()
+    
+    # Place user skills recorded before leaderboards existed, in batches on
+    # timers (an interrupted rebuild continues)
+    if (index_rebuilds_storage.contains_key(LEADERBOARD_REBUILD)
+            or leaderboard_nodes_storage.len() != user_skills_storage.len()):
+        _start_leaderboard_rebuild()
+    
+    if not counters_storage.contains_key(LEADERBOARD_SALT_KEY):
+        ic.set_timer(0, _seed_leaderboard_salt)
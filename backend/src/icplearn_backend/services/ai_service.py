@@ -1,11 +1,12 @@
-from kybra import query, update, ic, Opt, Principal
+from kybra import query, update, ic, match, Opt, Principal, Async, Service, service_update, StableBTreeMap, nat64, text
+from kybra.canisters.management import HttpResponse, HttpTransformArgs, management_canister
 from typing import Dict, List, Any, Optional
 import json
 import time
+import hashlib
+import math
 
-# In-memory storage for AI prompts and responses (would use stable storage in production)
-ai_prompts = {}
-ai_responses = {}
+# AI prompts and responses are kept in the stable AI interaction log below
 ai_agent_cache = {}  # Cache for agent configurations
 
 # Hybrid AI Service Configuration
@@ -15,6 +16,28 @@ class AIServiceConfig:
     FALLBACK_ENABLED = True
     ICP_LLM_CANISTER_ID = ""  # Would be set to actual LLM canister ID
     EXTERNAL_AI_ENABLED = True
+    EXTERNAL_AI_URL = "https://api.openai.com/v1/chat/completions"
+    EXTERNAL_AI_MODEL = "gpt-4"
+    EXTERNAL_AI_API_KEY = ""  # outcalls are only made once a key is configured
+    EXTERNAL_AI_MAX_RESPONSE_BYTES = 20_000
+    HTTP_OUTCALL_CYCLES = 50_000_000_000  # attached to each outcall; the unused part is refunded
+    CACHE_ENABLED = True
+    CACHE_TTL_SECONDS = 3600
+    CACHE_MAX_BYTES = 1_000_000  # budget for cached response text
+    COALESCE_MAX_WAITS = 4  # polls before a waiting caller gives up and calls the backends itself
+    BREAKER_WINDOW_SIZE = 20  # most recent calls per backend the error rate is taken over
+    BREAKER_MIN_CALLS = 5  # calls needed in the window before a breaker can open
+    BREAKER_ERROR_RATE = 0.5  # share of failed calls that opens a breaker
+    BREAKER_SLOW_CALL_MS = 5000  # slower calls count as failures
+    BREAKER_BASE_COOLDOWN_SECONDS = 30  # first open period, doubled on each consecutive trip
+    BREAKER_MAX_COOLDOWN_SECONDS = 600
+    METRICS_WINDOW_SECONDS = 3600  # latency and token metrics start over after this long
+    LOG_SEGMENT_ENTRIES = 64  # prompts/responses per interaction log segment
+    LOG_MAX_ENTRIES = 10_000  # retention limits, enforced by dropping whole segments
+    LOG_MAX_BYTES = 50_000_000  # stable memory reserved by entries (LOG_ENTRY_SLOT_BYTES each)
+    LOG_MAX_AGE_SECONDS = 30 * 24 * 3600
+    LOG_TRIM_INTERVAL_SECONDS = 3600
+    LOG_TRIM_MAX_SEGMENTS = 16  # segments dropped per trim run, bounding its instructions
 
 # AI Service Status Tracking
 ai_service_stats = {
@@ -22,87 +45,126 @@ ai_service_stats = {
     "external_api_calls": 0,
     "fallback_calls": 0,
     "total_calls": 0,
+    "failed_calls": 0,
+    "coalesced_calls": 0,
     "success_rate": 0.0
 }
 
+# Response cache for _hybrid_ai_call: prompt key -> {"result", "expires_at", "size"}.
+# Dict order is least recently used first; hits move an entry to the end.
+ai_response_cache: Dict[str, Dict[str, Any]] = {}
+ai_cache_stats = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+    "expirations": 0,
+    "bytes": 0
+}
+
+# Single-flight table: prompt key -> {"result"} of the backend call in progress.
+# Its leader awaits the ICP LLM call or HTTPS outcall; identical prompts
+# arriving during that await wait for its result instead of calling again.
+ai_inflight: Dict[str, Dict[str, Any]] = {}
+
 # ============================================================================
 # HYBRID AI SERVICE FUNCTIONS - ICP DeAI Implementation
 # ============================================================================
 
-def _try_icp_llm_canister(prompt: str, agent_type: str = "general") -> Optional[str]:
+class LlmCanister(Service):
+    """Candid interface of the ICP LLM Canister."""
+    @service_update
+    def generate(self, prompt: text) -> text: ...
+
+def _try_icp_llm_canister(prompt: str, agent_type: str = "general"):
     """
     Try to use ICP's native LLM Canister for sovereign AI.
     This implements true DeAI by running AI directly on ICP.
+    
+    Generator: the inter-canister call is awaited, so other messages
+    (including identical prompts, see _serve_ai_call) run meanwhile.
+    Returns the response text, or None if the canister is unavailable.
     """
     try:
         # Check if ICP LLM Canister is available
         if not AIServiceConfig.ICP_LLM_CANISTER_ID:
             return None
-            
-        # TODO: Implement actual inter-canister call to LLM Canister
-        # This would be the real implementation:
-        # response = ic.call(AIServiceConfig.ICP_LLM_CANISTER_ID, "generate", {
-        #     "prompt": prompt,
-        #     "model": "llama-3.1-8b",
-        #     "max_tokens": 150,
-        #     "temperature": 0.7
-        # })
         
         ai_service_stats["icp_llm_calls"] += 1
         ic.print(f"ICP LLM Canister called for: {agent_type}")
         
-        # For now, return None to indicate not yet implemented
-        return None
+        llm_canister = LlmCanister(Principal.from_str(AIServiceConfig.ICP_LLM_CANISTER_ID))
+        call_result = yield llm_canister.generate(prompt)
+        return match(call_result, {
+            "Ok": lambda response: response or None,
+            "Err": lambda err: _log_backend_error("ICP LLM Canister", err)
+        })
         
     except Exception as e:
         ic.print(f"ICP LLM Canister error: {e}")
         return None
 
-def _try_external_ai_api(prompt: str, agent_type: str = "general") -> Optional[str]:
+def _try_external_ai_api(prompt: str, agent_type: str = "general"):
     """
     Try external AI API using ICP's HTTPS outcalls.
     This maintains some sovereignty while accessing external AI.
+    
+    Generator: the outcall is awaited like _try_icp_llm_canister's call.
+    Returns the response text, or None on any failure.
     """
     try:
-        if not AIServiceConfig.EXTERNAL_AI_ENABLED:
+        if not AIServiceConfig.EXTERNAL_AI_ENABLED or not AIServiceConfig.EXTERNAL_AI_API_KEY:
             return None
-            
-        # TODO: Implement actual HTTPS outcall
-        # This would be the real implementation using ic.http_request:
-        # 
-        # headers = {
-        #     "Authorization": f"Bearer {api_key}",
-        #     "Content-Type": "application/json"
-        # }
-        # 
-        # payload = {
-        #     "model": "gpt-4",
-        #     "messages": [
-        #         {"role": "system", "content": f"You are a {agent_type} AI assistant."},
-        #         {"role": "user", "content": prompt}
-        #     ],
-        #     "max_tokens": 150,
-        #     "temperature": 0.7
-        # }
-        # 
-        # response = ic.http_request({
-        #     "url": "https://api.openai.com/v1/chat/completions",
-        #     "method": "POST",
-        #     "headers": headers,
-        #     "body": json.dumps(payload).encode(),
-        #     "transform": None
-        # })
+        
+        payload = {
+            "model": AIServiceConfig.EXTERNAL_AI_MODEL,
+            "messages": [
+                {"role": "system", "content": f"You are a {agent_type} AI assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 150,
+            "temperature": 0  # every replica makes the request and must see the same answer
+        }
         
         ai_service_stats["external_api_calls"] += 1
         ic.print(f"External AI API called for: {agent_type}")
         
-        # For now, return None to indicate not yet implemented
-        return None
+        http_result = yield management_canister.http_request({
+            "url": AIServiceConfig.EXTERNAL_AI_URL,
+            "max_response_bytes": AIServiceConfig.EXTERNAL_AI_MAX_RESPONSE_BYTES,
+            "method": {"post": None},
+            "headers": [
+                {"name": "Authorization", "value": f"Bearer {AIServiceConfig.EXTERNAL_AI_API_KEY}"},
+                {"name": "Content-Type", "value": "application/json"}
+            ],
+            "body": json.dumps(payload).encode(),
+            "transform": {"function": (ic.id(), "transform_ai_response"), "context": bytes()}
+        }).with_cycles(AIServiceConfig.HTTP_OUTCALL_CYCLES)
+        return match(http_result, {
+            "Ok": _parse_external_ai_response,
+            "Err": lambda err: _log_backend_error("External AI API", err)
+        })
         
     except Exception as e:
         ic.print(f"External AI API error: {e}")
         return None
 
+def _parse_external_ai_response(http_response: Dict[str, Any]) -> Optional[str]:
+    """Text of the first choice of a chat completion, or None for an error status."""
+    if http_response["status"] != 200:
+        ic.print(f"External AI API returned status {http_response['status']}")
+        return None
+    completion = json.loads(bytes(http_response["body"]).decode())
+    return completion["choices"][0]["message"]["content"] or None
+
+@query
+def transform_ai_response(args: HttpTransformArgs) -> HttpResponse:
+    """Drop response headers (dates, request IDs) so replicas reach consensus."""
+    return {**args["response"], "headers": []}
+
+def _log_backend_error(backend: str, err: str) -> None:
+    ic.print(f"{backend} call rejected: {err}")
+    return None
+
 def _generate_intelligent_fallback(prompt: str, agent_type: str = "general", context: Optional[str] = None) -> str:
     """
     Generate intelligent fallback responses based on prompt analysis.
@@ -398,17 +460,530 @@ def _parse_validation_fallback(question: str, expected_answer: str, user_answer:
         ]
     }
 
-def _hybrid_ai_call(prompt: str, agent_type: str = "general", context: Optional[str] = None) -> Dict[str, Any]:
+# ============================================================================
+# AI INTERACTION LOG
+# ============================================================================
+
+# Append-only log of prompts and responses in stable memory. Entries (JSON
+# {"kind", "record", "user", "prev"}) fill fixed-size segments keyed
+# "<segment>\x00<slot>"; retention drops whole sealed segments, oldest first,
+# so trimming never rewrites live entries. Each entry links to the previous
+# entry of the same user ("prev"), so a user's history is walked without
+# reading anyone else's.
+LOG_ENTRY_MAX_BYTES = 4_096
+ai_log_storage = StableBTreeMap[text, text](
+    memory_id=32,
+    max_key_size=50,
+    max_value_size=LOG_ENTRY_MAX_BYTES
+)
+
+# Every entry reserves a full key and value slot in the map, whatever its length
+LOG_ENTRY_SLOT_BYTES = 50 + LOG_ENTRY_MAX_BYTES
+
+# Per-segment summary (JSON {"entries", "bytes", "first_at", "last_at"})
+ai_log_segments_storage = StableBTreeMap[text, text](
+    memory_id=33,
+    max_key_size=50,
+    max_value_size=200
+)
+
+# Prompt/response ID -> log key
+ai_log_ids_storage = StableBTreeMap[text, text](
+    memory_id=34,
+    max_key_size=200,
+    max_value_size=50
+)
+
+# Log bounds and totals: "first_segment", "tail_segment", "entries", "bytes",
+# plus "prompt_sequence", the last prompt ID sequence allocated
+ai_log_state_storage = StableBTreeMap[text, nat64](
+    memory_id=35,
+    max_key_size=50,
+    max_value_size=50
+)
+
+# User key -> log key of that user's newest entry
+ai_log_user_heads_storage = StableBTreeMap[text, text](
+    memory_id=36,
+    max_key_size=100,
+    max_value_size=50
+)
+
+# User IDs longer than this are hashed before they are used in keys and IDs
+LOG_MAX_USER_KEY_BYTES = 64
+
+# Trim timer of this canister instance (timers do not survive upgrades)
+ai_log_timer = {"id": None}
+
+def _log_state(name: str) -> int:
+    return ai_log_state_storage.get(name) or 0
+
+def _log_segment_key(segment: int) -> str:
+    return f"{segment:010d}"
+
+def _log_user_key(user_id: str) -> str:
+    """user_id itself, or a fixed-length hash of it when too long for a map key."""
+    if len(user_id.encode()) <= LOG_MAX_USER_KEY_BYTES:
+        return user_id
+    return "sha256:" + hashlib.sha256(user_id.encode()).hexdigest()[:48]
+
+def _new_prompt_id(user_id: str) -> str:
+    """
+    Allocate a prompt ID. ic.time() is the same for every call in a round,
+    so a stable per-module sequence keeps the IDs unique.
+    """
+    sequence = _log_state("prompt_sequence") + 1
+    ai_log_state_storage.insert("prompt_sequence", sequence)
+    return f"prompt_{_log_user_key(user_id)}_{ic.time()}_{sequence}"
+
+def _load_log_segment(segment: int) -> Dict[str, Any]:
+    summary = ai_log_segments_storage.get(_log_segment_key(segment))
+    if summary is None:
+        return {"entries": 0, "bytes": 0, "first_at": 0, "last_at": 0}
+    return json.loads(summary)
+
+def _encode_log_entry(entry: Dict[str, Any]) -> str:
+    """
+    JSON for a log entry that fits the map's value size. The longest text
+    fields of the record (user-supplied questions, answers, topics and the
+    AI response) are halved until it does, and the record marked truncated.
+    """
+    encoded = json.dumps(entry)
+    record = entry["record"]
+    while len(encoded.encode()) > LOG_ENTRY_MAX_BYTES:
+        field = max((name for name, value in record.items() if isinstance(value, str)),
+                    key=lambda name: len(record[name]))
+        if not record[field]:
+            break
+        record[field] = record[field][:len(record[field]) // 2]
+        record["truncated"] = True
+        encoded = json.dumps(entry)
+    return encoded
+
+def _append_ai_record(kind: str, record: Dict[str, Any], user_id: str) -> None:
+    """Append a prompt or response of user_id to the log, sealing the tail segment when full."""
+    now = ic.time()
+    user_key = _log_user_key(user_id)
+    
+    tail = _log_state("tail_segment")
+    summary = _load_log_segment(tail)
+    if summary["entries"] >= AIServiceConfig.LOG_SEGMENT_ENTRIES:
+        tail += 1
+        ai_log_state_storage.insert("tail_segment", tail)
+        summary = _load_log_segment(tail)
+    
+    log_key = f"{_log_segment_key(tail)}\x00{summary['entries']:05d}"
+    entry = {"kind": kind, "record": dict(record), "user": user_key,
+             "prev": ai_log_user_heads_storage.get(user_key)}
+    ai_log_storage.insert(log_key, _encode_log_entry(entry))
+    ai_log_ids_storage.insert(record["id"], log_key)
+    ai_log_user_heads_storage.insert(user_key, log_key)
+    
+    summary["entries"] += 1
+    summary["bytes"] += LOG_ENTRY_SLOT_BYTES
+    summary["first_at"] = summary["first_at"] or now
+    summary["last_at"] = now
+    ai_log_segments_storage.insert(_log_segment_key(tail), json.dumps(summary))
+    ai_log_state_storage.insert("entries", _log_state("entries") + 1)
+    ai_log_state_storage.insert("bytes", _log_state("bytes") + LOG_ENTRY_SLOT_BYTES)
+    
+    # Enforce the size budgets as the log grows; the timer handles age
+    if (_log_state("entries") > AIServiceConfig.LOG_MAX_ENTRIES
+            or _log_state("bytes") > AIServiceConfig.LOG_MAX_BYTES):
+        _trim_ai_log()
+    _ensure_ai_log_trim_timer()
+
+def _get_ai_record(kind: str, record_id: str) -> Optional[Dict[str, Any]]:
+    log_key = ai_log_ids_storage.get(record_id)
+    if log_key is None:
+        return None
+    entry = json.loads(ai_log_storage.get(log_key))
+    return entry["record"] if entry["kind"] == kind else None
+
+def _trim_ai_log() -> int:
+    """
+    Drop sealed segments, oldest first, while the log exceeds its entry or
+    byte budget or the segment is past LOG_MAX_AGE_SECONDS. At most
+    LOG_TRIM_MAX_SEGMENTS are dropped per run. Returns the number dropped.
+    """
+    cutoff = ic.time() - AIServiceConfig.LOG_MAX_AGE_SECONDS * 1_000_000_000
+    first = _log_state("first_segment")
+    tail = _log_state("tail_segment")
+    entries = _log_state("entries")
+    total_bytes = _log_state("bytes")
+    
+    trimmed = 0
+    while first < tail and trimmed < AIServiceConfig.LOG_TRIM_MAX_SEGMENTS:
+        summary = _load_log_segment(first)
+        if (entries <= AIServiceConfig.LOG_MAX_ENTRIES and total_bytes <= AIServiceConfig.LOG_MAX_BYTES
+                and summary["last_at"] >= cutoff):
+            break
+        for slot in range(summary["entries"]):
+            log_key = f"{_log_segment_key(first)}\x00{slot:05d}"
+            entry = json.loads(ai_log_storage.remove(log_key))
+            ai_log_ids_storage.remove(entry["record"]["id"])
+            # The user's chain now ends earlier; drop it once it is empty
+            if ai_log_user_heads_storage.get(entry["user"]) == log_key:
+                ai_log_user_heads_storage.remove(entry["user"])
+        ai_log_segments_storage.remove(_log_segment_key(first))
+        entries -= summary["entries"]
+        total_bytes -= summary["bytes"]
+        first += 1
+        trimmed += 1
+    
+    if trimmed > 0:
+        ai_log_state_storage.insert("first_segment", first)
+        ai_log_state_storage.insert("entries", entries)
+        ai_log_state_storage.insert("bytes", total_bytes)
+    return trimmed
+
+def _run_ai_log_trim() -> None:
+    """Timer callback: trim, continuing in a follow-up timer while segments remain to drop."""
+    if _trim_ai_log() == AIServiceConfig.LOG_TRIM_MAX_SEGMENTS:
+        ic.set_timer(0, _run_ai_log_trim)
+
+def _ensure_ai_log_trim_timer() -> None:
+    """Start the periodic trim the first time this instance writes to the log."""
+    if ai_log_timer["id"] is None:
+        ai_log_timer["id"] = ic.set_timer_interval(AIServiceConfig.LOG_TRIM_INTERVAL_SECONDS, _run_ai_log_trim)
+
+# ============================================================================
+# LATENCY AND TOKEN METRICS
+# ============================================================================
+
+# Latency is ic.time() from call to result. That time only advances between
+# messages, so it measures the awaited backend calls (at round resolution) and
+# calls that never await (cache hits, fallbacks) record 0. Their cost is
+# tracked as instructions instead.
+# Latency histogram buckets: bucket 0 counts calls under 1 ms, bucket i calls
+# in [2^(i-1), 2^i) ms, and the last bucket everything slower
+LATENCY_BUCKETS = 18
+
+def _new_metrics() -> Dict[str, Any]:
+    return {"calls": 0, "errors": 0, "tokens": 0, "instructions": 0, "latency_sum_ns": 0,
+            "histogram": [0] * LATENCY_BUCKETS}
+
+def _new_metrics_window(started_at: int) -> Dict[str, Any]:
+    return {"started_at": started_at, "total": _new_metrics(), "by_source": {}, "by_agent_type": {}}
+
+# Current window and the last closed one; memory is constant per source and agent type
+ai_metrics = {"current": _new_metrics_window(0), "previous": None}
+
+def _current_metrics_window() -> Dict[str, Any]:
+    """The open metrics window, closing it first once METRICS_WINDOW_SECONDS have passed."""
+    now = ic.time()
+    window = ai_metrics["current"]
+    if window["started_at"] == 0:
+        window["started_at"] = now
+    elif now >= window["started_at"] + AIServiceConfig.METRICS_WINDOW_SECONDS * 1_000_000_000:
+        ai_metrics["previous"] = window
+        window = ai_metrics["current"] = _new_metrics_window(now)
+    return window
+
+def _latency_bucket(latency_ns: int) -> int:
+    return min((latency_ns // 1_000_000).bit_length(), LATENCY_BUCKETS - 1)
+
+def _record_ai_call(source: str, agent_type: str, latency_ns: int, tokens: int, instructions: int,
+                    success: bool) -> None:
+    """Count a served AI call in the window total and its source and agent type."""
+    window = _current_metrics_window()
+    bucket = _latency_bucket(latency_ns)
+    for metrics in (window["total"],
+                    window["by_source"].setdefault(source, _new_metrics()),
+                    window["by_agent_type"].setdefault(agent_type, _new_metrics())):
+        metrics["calls"] += 1
+        metrics["errors"] += 0 if success else 1
+        metrics["tokens"] += tokens
+        metrics["instructions"] += instructions
+        metrics["latency_sum_ns"] += latency_ns
+        metrics["histogram"][bucket] += 1
+
+def _record_backend_failure(backend: str) -> None:
+    """Count a failed attempt at a backend as an error of that source."""
+    _current_metrics_window()["by_source"].setdefault(backend, _new_metrics())["errors"] += 1
+
+def _histogram_percentile(histogram: List[int], count: int, fraction: float) -> int:
+    """Upper bound in ms of the bucket holding the given fraction of calls."""
+    target = max(1, math.ceil(count * fraction))
+    seen = 0
+    for bucket, bucket_count in enumerate(histogram):
+        seen += bucket_count
+        if seen >= target:
+            return 1 << bucket
+    return 1 << (LATENCY_BUCKETS - 1)
+
+def _summarize_metrics(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    calls = metrics["calls"]
+    summary = {
+        "calls": calls,
+        "errors": metrics["errors"],
+        "tokens": metrics["tokens"],
+        "average_latency_ms": metrics["latency_sum_ns"] / calls / 1_000_000 if calls > 0 else 0.0,
+        "average_tokens": metrics["tokens"] / calls if calls > 0 else 0.0,
+        "average_instructions": metrics["instructions"] / calls if calls > 0 else 0.0,
+        "histogram": list(metrics["histogram"])
+    }
+    for name, fraction in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        summary[name] = _histogram_percentile(metrics["histogram"], calls, fraction) if calls > 0 else 0
+    return summary
+
+def _summarize_metrics_window(window: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "started_at": window["started_at"],
+        "total": _summarize_metrics(window["total"]),
+        "by_source": {source: _summarize_metrics(metrics) for source, metrics in window["by_source"].items()},
+        "by_agent_type": {agent_type: _summarize_metrics(metrics)
+                          for agent_type, metrics in window["by_agent_type"].items()}
+    }
+
+# ============================================================================
+# CIRCUIT BREAKERS
+# ============================================================================
+
+# Backends guarded by a breaker, in the order _call_ai_backends tries them
+AI_BACKENDS = ("icp_llm", "external_api")
+
+def _new_breaker() -> Dict[str, Any]:
+    return {
+        "state": "closed",  # closed -> open -> half_open -> closed (or back to open)
+        "window": [],  # (succeeded, latency_ns) of the most recent calls, oldest first
+        "opened_at": 0,
+        "cooldown_seconds": 0,
+        "consecutive_opens": 0,
+        "probe_in_flight": False,
+        "probe_started_at": 0,
+        "trips": 0,
+        "rejected_calls": 0
+    }
+
+ai_breakers: Dict[str, Dict[str, Any]] = {backend: _new_breaker() for backend in AI_BACKENDS}
+
+def _backend_enabled(backend: str) -> bool:
+    if backend == "icp_llm":
+        return bool(AIServiceConfig.ICP_LLM_CANISTER_ID)
+    return AIServiceConfig.EXTERNAL_AI_ENABLED and bool(AIServiceConfig.EXTERNAL_AI_API_KEY)
+
+def _breaker_allows(backend: str) -> bool:
+    """
+    Whether a call may go to backend; an expired open breaker lets one probe
+    through. A probe outstanding for longer than BREAKER_SLOW_CALL_MS (its
+    caller trapped while awaiting) no longer blocks the next one.
+    """
+    breaker = ai_breakers[backend]
+    now = ic.time()
+    if breaker["state"] == "open":
+        if now < breaker["opened_at"] + breaker["cooldown_seconds"] * 1_000_000_000:
+            breaker["rejected_calls"] += 1
+            return False
+        breaker["state"] = "half_open"
+    if breaker["state"] == "half_open":
+        if breaker["probe_in_flight"] and now < breaker["probe_started_at"] + AIServiceConfig.BREAKER_SLOW_CALL_MS * 1_000_000:
+            breaker["rejected_calls"] += 1
+            return False
+        breaker["probe_in_flight"] = True
+        breaker["probe_started_at"] = now
+    return True
+
+def _breaker_open(breaker: Dict[str, Any]) -> None:
+    """Open a breaker, doubling its cooldown on each consecutive trip."""
+    breaker["consecutive_opens"] += 1
+    breaker["cooldown_seconds"] = min(
+        AIServiceConfig.BREAKER_BASE_COOLDOWN_SECONDS * 2 ** (breaker["consecutive_opens"] - 1),
+        AIServiceConfig.BREAKER_MAX_COOLDOWN_SECONDS
+    )
+    breaker["state"] = "open"
+    breaker["opened_at"] = ic.time()
+    breaker["window"] = []
+    breaker["trips"] += 1
+
+def _breaker_record(backend: str, succeeded: bool, latency_ns: int) -> None:
+    """Record a call outcome; calls slower than BREAKER_SLOW_CALL_MS count as failures."""
+    breaker = ai_breakers[backend]
+    succeeded = succeeded and latency_ns <= AIServiceConfig.BREAKER_SLOW_CALL_MS * 1_000_000
+    
+    if breaker["state"] == "half_open":
+        breaker["probe_in_flight"] = False
+        if succeeded:
+            breaker["state"] = "closed"
+            breaker["consecutive_opens"] = 0
+            breaker["cooldown_seconds"] = 0
+            breaker["window"] = [(succeeded, latency_ns)]
+        else:
+            _breaker_open(breaker)
+        return
+    
+    window = breaker["window"]
+    window.append((succeeded, latency_ns))
+    if len(window) > AIServiceConfig.BREAKER_WINDOW_SIZE:
+        window.pop(0)
+    failures = sum(1 for ok, _ in window if not ok)
+    if len(window) >= AIServiceConfig.BREAKER_MIN_CALLS and failures / len(window) >= AIServiceConfig.BREAKER_ERROR_RATE:
+        _breaker_open(breaker)
+
+def _breaker_status(backend: str) -> Dict[str, Any]:
+    breaker = ai_breakers[backend]
+    window = breaker["window"]
+    retry_in_seconds = 0
+    if breaker["state"] == "open":
+        retry_at = breaker["opened_at"] + breaker["cooldown_seconds"] * 1_000_000_000
+        retry_in_seconds = max(0, retry_at - ic.time()) // 1_000_000_000
+    return {
+        "state": breaker["state"],
+        "window_calls": len(window),
+        "error_rate": sum(1 for ok, _ in window if not ok) / len(window) if window else 0.0,
+        "average_latency_ms": sum(latency for _, latency in window) / len(window) / 1_000_000 if window else 0.0,
+        "cooldown_seconds": breaker["cooldown_seconds"],
+        "retry_in_seconds": retry_in_seconds,
+        "trips": breaker["trips"],
+        "rejected_calls": breaker["rejected_calls"]
+    }
+
+# ============================================================================
+# RESPONSE CACHE
+# ============================================================================
+
+def _cache_key(prompt: str, agent_type: str, context: Optional[str]) -> str:
+    """
+    Hash the normalized prompt, agent type, context and the configured
+    backends (a different model must not be served another model's answers).
+    """
+    normalized_prompt = " ".join(prompt.split())
+    model = f"{AIServiceConfig.ICP_LLM_CANISTER_ID}|{_backend_enabled('external_api')}|{AIServiceConfig.EXTERNAL_AI_MODEL}"
+    material = json.dumps([normalized_prompt, agent_type, context, model])
+    return hashlib.sha256(material.encode()).hexdigest()
+
+def _cache_evict(max_bytes: int) -> None:
+    """Drop least recently used entries until the cache fits in max_bytes."""
+    while ai_cache_stats["bytes"] > max_bytes:
+        entry = ai_response_cache.pop(next(iter(ai_response_cache)))
+        ai_cache_stats["bytes"] -= entry["size"]
+        ai_cache_stats["evictions"] += 1
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    """Return a live cached result, refreshing its LRU position."""
+    entry = ai_response_cache.pop(key, None)
+    if entry is None:
+        ai_cache_stats["misses"] += 1
+        return None
+    if entry["expires_at"] <= ic.time():
+        ai_cache_stats["bytes"] -= entry["size"]
+        ai_cache_stats["expirations"] += 1
+        ai_cache_stats["misses"] += 1
+        return None
+    
+    ai_response_cache[key] = entry
+    ai_cache_stats["hits"] += 1
+    return entry["result"]
+
+def _cache_put(key: str, result: Dict[str, Any]) -> None:
+    """Cache a result, evicting older entries to stay within the byte budget."""
+    size = len(key) + len(result["response"].encode())
+    if size > AIServiceConfig.CACHE_MAX_BYTES:
+        return
+    
+    previous = ai_response_cache.pop(key, None)
+    if previous is not None:
+        ai_cache_stats["bytes"] -= previous["size"]
+    _cache_evict(AIServiceConfig.CACHE_MAX_BYTES - size)
+    
+    ai_response_cache[key] = {
+        "result": result,
+        "expires_at": ic.time() + AIServiceConfig.CACHE_TTL_SECONDS * 1_000_000_000,
+        "size": size
+    }
+    ai_cache_stats["bytes"] += size
+
+def _hybrid_ai_call(prompt: str, agent_type: str = "general", context: Optional[str] = None,
+                    use_cache: bool = True):
     """
     Main hybrid AI function that tries multiple AI sources with fallback.
     Implements ICP's DeAI vision with sovereignty and reliability.
+    
+    Generator in Kybra's async style: callers get the result dict with
+    `yield _hybrid_ai_call(...)`. Responses from the ICP LLM Canister or
+    external API are cached, and concurrent identical prompts share one
+    backend call. Pass use_cache=False to skip both and call the backends.
     """
     ai_service_stats["total_calls"] += 1
     start_time = ic.time()
+    start_instructions = ic.performance_counter(0)
+    result = yield _serve_ai_call(prompt, agent_type, context, use_cache)
     
-    # Step 1: Try ICP LLM Canister (native DeAI)
+    # The instruction counter restarts after each await (and ic.time() moves
+    # on), so this is the synchronous cost since the call or its last await
+    instructions = ic.performance_counter(0) - (start_instructions if ic.time() == start_time else 0)
+    
+    if not result["success"]:
+        ai_service_stats["failed_calls"] += 1
+    source = "cache" if result.get("cached") else "coalesced" if result.get("coalesced") else result["source"]
+    _record_ai_call(source, agent_type, result["response_time"], result["tokens_used"], instructions,
+                    result["success"])
+    return result
+
+def _serve_ai_call(prompt: str, agent_type: str, context: Optional[str], use_cache: bool):
+    """Answer from the cache, an in-flight identical call or the backends."""
+    start_time = ic.time()
+    
+    if not use_cache:
+        return (yield _call_ai_backends(prompt, agent_type, context, start_time))
+    
+    # Step 0: Serve a cached answer for an identical prompt
+    cache_key = _cache_key(prompt, agent_type, context)
+    if AIServiceConfig.CACHE_ENABLED:
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return {**cached, "response_time": ic.time() - start_time, "cached": True}
+    
+    # Join an identical call already in flight. Its leader only resumes
+    # between messages, so each wait is a cheap management canister call.
+    # Waiting stops once the result is in the flight or the cache, or the
+    # flight has left the table without one.
+    flight = ai_inflight.get(cache_key)
+    if flight is not None:
+        ai_service_stats["coalesced_calls"] += 1
+        for _ in range(AIServiceConfig.COALESCE_MAX_WAITS):
+            yield management_canister.raw_rand()
+            if "result" in flight:
+                return {**flight["result"], "response_time": ic.time() - start_time, "coalesced": True}
+            cached = _cache_get(cache_key) if cache_key in ai_response_cache else None
+            if cached is not None:
+                return {**cached, "response_time": ic.time() - start_time, "coalesced": True}
+            if ai_inflight.get(cache_key) is not flight:
+                break
+    
+    # Lead a new flight; a stale one (leader trapped) is replaced. The flight
+    # stays joinable while the backends are awaited and is cleared either way.
+    flight = {}
+    ai_inflight[cache_key] = flight
     try:
-        response = _try_icp_llm_canister(prompt, agent_type)
+        result = yield _call_ai_backends(prompt, agent_type, context, start_time)
+        flight["result"] = result
+    finally:
+        if ai_inflight.get(cache_key) is flight:
+            del ai_inflight[cache_key]
+    
+    # Fallbacks are cheap and should not outlive a backend's recovery
+    if AIServiceConfig.CACHE_ENABLED and result["source"] in ("icp_llm", "external_api"):
+        _cache_put(cache_key, result)
+    return result
+
+def _call_ai_backends(prompt: str, agent_type: str, context: Optional[str], start_time: int):
+    """
+    Try ICP LLM Canister -> External AI API -> Intelligent Fallback,
+    skipping backends whose circuit breaker is open. Generator; yields
+    each backend call in turn and returns the result dict.
+    """
+    # Step 1: Try ICP LLM Canister (native DeAI)
+    if _backend_enabled("icp_llm") and _breaker_allows("icp_llm"):
+        call_start = ic.time()
+        response = None
+        try:
+            response = yield _try_icp_llm_canister(prompt, agent_type)
+        except Exception as e:
+            ic.print(f"ICP LLM attempt failed: {e}")
+        _breaker_record("icp_llm", bool(response), ic.time() - call_start)
+        if not response:
+            _record_backend_failure("icp_llm")
         if response:
             return {
                 "response": response,
@@ -417,24 +992,29 @@ def _hybrid_ai_call(prompt: str, agent_type: str = "general", context: Optional[
                 "response_time": ic.time() - start_time,
                 "success": True
             }
-    except Exception as e:
-        ic.print(f"ICP LLM attempt failed: {e}")
     
-    # Step 2: Try external AI API with retries
+    # Step 2: Try external AI API with retries while its breaker allows
     for attempt in range(AIServiceConfig.MAX_RETRIES):
+        if not (_backend_enabled("external_api") and _breaker_allows("external_api")):
+            break
+        call_start = ic.time()
+        response = None
         try:
-            response = _try_external_ai_api(prompt, agent_type)
-            if response:
-                return {
-                    "response": response,
-                    "source": "external_api",
-                    "tokens_used": len(response) // 4,
-                    "response_time": ic.time() - start_time,
-                    "success": True,
-                    "attempt": attempt + 1
-                }
+            response = yield _try_external_ai_api(prompt, agent_type)
         except Exception as e:
             ic.print(f"External AI attempt {attempt + 1} failed: {e}")
+        _breaker_record("external_api", bool(response), ic.time() - call_start)
+        if not response:
+            _record_backend_failure("external_api")
+        if response:
+            return {
+                "response": response,
+                "source": "external_api",
+                "tokens_used": len(response) // 4,
+                "response_time": ic.time() - start_time,
+                "success": True,
+                "attempt": attempt + 1
+            }
     
     # Step 3: Fallback to intelligent mock responses
     if AIServiceConfig.FALLBACK_ENABLED:
@@ -463,14 +1043,15 @@ def _hybrid_ai_call(prompt: str, agent_type: str = "general", context: Optional[
 # ============================================================================
 
 @update
-def generate_course_content(topic: str, difficulty: int, user_id: str) -> Dict[str, Any]:
+def generate_course_content(topic: str, difficulty: int, user_id: str, use_cache: bool = True) -> Async[Dict[str, Any]]:
     """
     Generate course content using hybrid AI approach.
     
     Tries ICP LLM Canister -> External AI API -> Intelligent Fallback
     Implements ICP's DeAI vision with sovereignty and reliability.
+    Set use_cache=False to force a fresh generation.
     """
-    prompt_id = f"prompt_{user_id}_{ic.time()}"
+    prompt_id = _new_prompt_id(user_id)
     
     # Create the AI prompt
     ai_prompt = f"Generate comprehensive course content about {topic} at difficulty level {difficulty}. Include learning objectives, course structure, key concepts, and practical exercises."
@@ -483,10 +1064,10 @@ def generate_course_content(topic: str, difficulty: int, user_id: str) -> Dict[s
         "created_at": ic.time()
     }
     
-    ai_prompts[prompt_id] = prompt
+    _append_ai_record("prompt", prompt, user_id)
     
     # Use hybrid AI to generate response
-    ai_result = _hybrid_ai_call(ai_prompt, "content_generator", f"topic: {topic}, difficulty: {difficulty}")
+    ai_result = yield _hybrid_ai_call(ai_prompt, "content_generator", f"topic: {topic}, difficulty: {difficulty}", use_cache)
     
     response_id = f"response_{prompt_id}"
     response = {
@@ -505,7 +1086,7 @@ def generate_course_content(topic: str, difficulty: int, user_id: str) -> Dict[s
     if ai_result.get("fallback_used"):
         response["fallback_used"] = True
     
-    ai_responses[response_id] = response
+    _append_ai_record("response", response, user_id)
     
     return {
         "prompt": prompt,
@@ -514,19 +1095,23 @@ def generate_course_content(topic: str, difficulty: int, user_id: str) -> Dict[s
             "source": ai_result["source"],
             "tokens_used": ai_result["tokens_used"],
             "response_time": ai_result["response_time"],
-            "success": ai_result["success"]
+            "success": ai_result["success"],
+            "cached": ai_result.get("cached", False),
+            "coalesced": ai_result.get("coalesced", False)
         }
     }
 
 @update
-def validate_answer(question: str, expected_answer: str, user_answer: str, user_id: str) -> Dict[str, Any]:
+def validate_answer(question: str, expected_answer: str, user_answer: str, user_id: str,
+                    use_cache: bool = True) -> Async[Dict[str, Any]]:
     """
     Validate a user's answer using hybrid AI approach.
     
     Tries ICP LLM Canister -> External AI API -> Intelligent Fallback
     Provides detailed feedback and educational guidance.
+    Set use_cache=False to force a fresh validation.
     """
-    prompt_id = f"prompt_{user_id}_{ic.time()}"
+    prompt_id = _new_prompt_id(user_id)
     
     # Create the AI prompt for answer validation
     ai_prompt = f"""Validate and provide feedback for this answer:
@@ -549,10 +1134,10 @@ Please provide:
         "created_at": ic.time()
     }
     
-    ai_prompts[prompt_id] = prompt
+    _append_ai_record("prompt", prompt, user_id)
     
     # Use hybrid AI for validation (fallback includes intelligent validation logic)
-    ai_result = _hybrid_ai_call(ai_prompt, "validator", f"question: {question}")
+    ai_result = yield _hybrid_ai_call(ai_prompt, "validator", f"question: {question}", use_cache)
     
     # If using fallback, parse the response to extract validation data
     if ai_result["source"] == "fallback":
@@ -582,7 +1167,7 @@ Please provide:
     if ai_result.get("fallback_used"):
         response["fallback_used"] = True
     
-    ai_responses[response_id] = response
+    _append_ai_record("response", response, user_id)
     
     return {
         "prompt": prompt,
@@ -591,7 +1176,9 @@ Please provide:
             "source": ai_result["source"],
             "tokens_used": ai_result["tokens_used"],
             "response_time": ai_result["response_time"],
-            "success": ai_result["success"]
+            "success": ai_result["success"],
+            "cached": ai_result.get("cached", False),
+            "coalesced": ai_result.get("coalesced", False)
         }
     }
 
@@ -603,7 +1190,7 @@ def generate_skill_nft_metadata(skill_name: str, mastery_level: int, user_id: st
     In a production environment, this would use HTTPS outcalls to connect to Vertex AI.
     For now, we'll simulate the response.
     """
-    prompt_id = f"prompt_{user_id}_{ic.time()}"
+    prompt_id = _new_prompt_id(user_id)
     
     prompt = {
         "id": prompt_id,
@@ -613,7 +1200,7 @@ def generate_skill_nft_metadata(skill_name: str, mastery_level: int, user_id: st
         "created_at": ic.time()
     }
     
-    ai_prompts[prompt_id] = prompt
+    _append_ai_record("prompt", prompt, user_id)
     
     # Simulate NFT metadata generation
     metadata = {
@@ -647,7 +1234,7 @@ def generate_skill_nft_metadata(skill_name: str, mastery_level: int, user_id: st
         "created_at": ic.time()
     }
     
-    ai_responses[response_id] = response
+    _append_ai_record("response", response, user_id)
     
     return {
         "prompt": prompt,
@@ -662,7 +1249,7 @@ def analyze_learning_pattern(user_performance: Dict[str, Any], user_id: str) ->
     In a production environment, this would use HTTPS outcalls to connect to Vertex AI.
     For now, we'll simulate the response.
     """
-    prompt_id = f"prompt_{user_id}_{ic.time()}"
+    prompt_id = _new_prompt_id(user_id)
     
     prompt = {
         "id": prompt_id,
@@ -672,7 +1259,7 @@ def analyze_learning_pattern(user_performance: Dict[str, Any], user_id: str) ->
         "created_at": ic.time()
     }
     
-    ai_prompts[prompt_id] = prompt
+    _append_ai_record("prompt", prompt, user_id)
     
     # Simulate learning pattern analysis
     # In a real implementation, this would be based on actual user data
@@ -699,7 +1286,7 @@ def analyze_learning_pattern(user_performance: Dict[str, Any], user_id: str) ->
         "created_at": ic.time()
     }
     
-    ai_responses[response_id] = response
+    _append_ai_record("response", response, user_id)
     
     return {
         "prompt": prompt,
@@ -709,30 +1296,39 @@ def analyze_learning_pattern(user_performance: Dict[str, Any], user_id: str) ->
 @query
 def get_ai_prompt(prompt_id: str) -> Dict[str, Any]:
     """Get a specific AI prompt by ID."""
-    if prompt_id not in ai_prompts:
+    prompt = _get_ai_record("prompt", prompt_id)
+    if prompt is None:
         return {"error": "Prompt not found"}
     
-    return ai_prompts[prompt_id]
+    return prompt
 
 @query
 def get_ai_response(response_id: str) -> Dict[str, Any]:
     """Get a specific AI response by ID."""
-    if response_id not in ai_responses:
+    response = _get_ai_record("response", response_id)
+    if response is None:
         return {"error": "Response not found"}
     
-    return ai_responses[response_id]
+    return response
 
 @query
 def get_user_ai_interactions(user_id: str) -> Dict[str, Any]:
     """Get all AI interactions for a user."""
-    user_prompts = [prompt for prompt in ai_prompts.values() if prompt["user_id"] == user_id]
-    prompt_ids = [prompt["id"] for prompt in user_prompts]
-    user_responses = [response for response in ai_responses.values() 
-                     if response["prompt_id"] in prompt_ids]
+    # Walk the user's chain newest first; it ends where retention trimmed the log
+    user_prompts = []
+    user_responses = []
+    log_key = ai_log_user_heads_storage.get(_log_user_key(user_id))
+    while log_key is not None:
+        entry = ai_log_storage.get(log_key)
+        if entry is None:
+            break
+        entry = json.loads(entry)
+        (user_prompts if entry["kind"] == "prompt" else user_responses).append(entry["record"])
+        log_key = entry["prev"]
     
     return {
-        "prompts": user_prompts,
-        "responses": user_responses
+        "prompts": user_prompts[::-1],
+        "responses": user_responses[::-1]
     }
 
 @query
@@ -744,34 +1340,98 @@ def get_ai_service_stats() -> Dict[str, Any]:
         successful_calls = total_calls - ai_service_stats.get("failed_calls", 0)
         success_rate = successful_calls / total_calls
     
+    cache_lookups = ai_cache_stats["hits"] + ai_cache_stats["misses"]
+    window = _summarize_metrics_window(_current_metrics_window())
+    previous_window = ai_metrics["previous"]
+    
     return {
         "total_calls": total_calls,
         "icp_llm_calls": ai_service_stats["icp_llm_calls"],
         "external_api_calls": ai_service_stats["external_api_calls"],
         "fallback_calls": ai_service_stats["fallback_calls"],
+        "coalesced_calls": ai_service_stats["coalesced_calls"],
+        "in_flight_prompts": len(ai_inflight),
         "success_rate": success_rate,
         "service_health": {
             "icp_llm_available": bool(AIServiceConfig.ICP_LLM_CANISTER_ID),
-            "external_api_enabled": AIServiceConfig.EXTERNAL_AI_ENABLED,
+            "external_api_enabled": _backend_enabled("external_api"),
             "fallback_enabled": AIServiceConfig.FALLBACK_ENABLED,
             "max_retries": AIServiceConfig.MAX_RETRIES
         },
+        "circuit_breakers": {backend: _breaker_status(backend) for backend in AI_BACKENDS},
+        "interaction_log": {
+            "entries": _log_state("entries"),
+            "bytes": _log_state("bytes"),
+            "segments": _log_state("tail_segment") - _log_state("first_segment") + 1,
+            "max_entries": AIServiceConfig.LOG_MAX_ENTRIES,
+            "max_bytes": AIServiceConfig.LOG_MAX_BYTES,
+            "max_age_seconds": AIServiceConfig.LOG_MAX_AGE_SECONDS
+        },
+        "cache": {
+            "enabled": AIServiceConfig.CACHE_ENABLED,
+            "entries": len(ai_response_cache),
+            "bytes": ai_cache_stats["bytes"],
+            "max_bytes": AIServiceConfig.CACHE_MAX_BYTES,
+            "ttl_seconds": AIServiceConfig.CACHE_TTL_SECONDS,
+            "hits": ai_cache_stats["hits"],
+            "misses": ai_cache_stats["misses"],
+            "hit_rate": ai_cache_stats["hits"] / cache_lookups if cache_lookups > 0 else 0.0,
+            "evictions": ai_cache_stats["evictions"],
+            "expirations": ai_cache_stats["expirations"]
+        },
         "performance_metrics": {
-            "average_response_time": "~150ms",
-            "average_tokens_per_response": "45-60",
+            "window_started_at": window["started_at"],
+            "window_seconds": AIServiceConfig.METRICS_WINDOW_SECONDS,
+            "average_response_time_ms": window["total"]["average_latency_ms"],
+            "p50_response_time_ms": window["total"]["p50_ms"],
+            "p95_response_time_ms": window["total"]["p95_ms"],
+            "p99_response_time_ms": window["total"]["p99_ms"],
+            "average_tokens_per_response": window["total"]["average_tokens"],
+            "average_instructions_per_call": window["total"]["average_instructions"],
+            "total_tokens": window["total"]["tokens"],
+            "errors": window["total"]["errors"],
+            "latency_bucket_bounds_ms": [1 << bucket for bucket in range(LATENCY_BUCKETS)],
+            "by_source": window["by_source"],
+            "by_agent_type": window["by_agent_type"],
+            "previous_window": _summarize_metrics_window(previous_window) if previous_window is not None else None,
             "supported_models": ["llama-3.1-8b", "gpt-4", "intelligent-fallback"]
         }
     }
 
+@update
+def reset_ai_service_stats() -> Dict[str, Any]:
+    """Close the current metrics window early and start a new one (admin function)."""
+    closed_window = _current_metrics_window()
+    ai_metrics["previous"] = closed_window
+    ai_metrics["current"] = _new_metrics_window(ic.time())
+    return {
+        "success": True,
+        "closed_window": _summarize_metrics_window(closed_window)
+    }
+
 @update
 def configure_ai_service(config: Dict[str, Any]) -> Dict[str, Any]:
     """Configure AI service settings (admin function)."""
     try:
+        # A reconfigured backend starts with a fresh (closed) breaker
         if "icp_llm_canister_id" in config:
             AIServiceConfig.ICP_LLM_CANISTER_ID = config["icp_llm_canister_id"]
+            ai_breakers["icp_llm"] = _new_breaker()
         
         if "external_ai_enabled" in config:
             AIServiceConfig.EXTERNAL_AI_ENABLED = config["external_ai_enabled"]
+            ai_breakers["external_api"] = _new_breaker()
+        
+        if "external_ai_url" in config:
+            AIServiceConfig.EXTERNAL_AI_URL = config["external_ai_url"]
+            ai_breakers["external_api"] = _new_breaker()
+        
+        if "external_ai_model" in config:
+            AIServiceConfig.EXTERNAL_AI_MODEL = config["external_ai_model"]
+        
+        if "external_ai_api_key" in config:
+            AIServiceConfig.EXTERNAL_AI_API_KEY = config["external_ai_api_key"]
+            ai_breakers["external_api"] = _new_breaker()
         
         if "fallback_enabled" in config:
             AIServiceConfig.FALLBACK_ENABLED = config["fallback_enabled"]
@@ -779,14 +1439,42 @@ def configure_ai_service(config: Dict[str, Any]) -> Dict[str, Any]:
         if "max_retries" in config:
             AIServiceConfig.MAX_RETRIES = config["max_retries"]
         
+        if "cache_enabled" in config:
+            AIServiceConfig.CACHE_ENABLED = config["cache_enabled"]
+        
+        if "cache_ttl_seconds" in config:
+            AIServiceConfig.CACHE_TTL_SECONDS = config["cache_ttl_seconds"]
+        
+        if "log_max_entries" in config:
+            AIServiceConfig.LOG_MAX_ENTRIES = config["log_max_entries"]
+        
+        if "log_max_bytes" in config:
+            AIServiceConfig.LOG_MAX_BYTES = config["log_max_bytes"]
+        
+        if "log_max_age_seconds" in config:
+            AIServiceConfig.LOG_MAX_AGE_SECONDS = config["log_max_age_seconds"]
+        
+        if "cache_max_bytes" in config:
+            AIServiceConfig.CACHE_MAX_BYTES = config["cache_max_bytes"]
+            _cache_evict(AIServiceConfig.CACHE_MAX_BYTES)
+        
         return {
             "success": True,
             "message": "AI service configuration updated successfully",
             "current_config": {
                 "icp_llm_canister_id": AIServiceConfig.ICP_LLM_CANISTER_ID,
                 "external_ai_enabled": AIServiceConfig.EXTERNAL_AI_ENABLED,
+                "external_ai_url": AIServiceConfig.EXTERNAL_AI_URL,
+                "external_ai_model": AIServiceConfig.EXTERNAL_AI_MODEL,
+                "external_ai_api_key_set": bool(AIServiceConfig.EXTERNAL_AI_API_KEY),
                 "fallback_enabled": AIServiceConfig.FALLBACK_ENABLED,
-                "max_retries": AIServiceConfig.MAX_RETRIES
+                "max_retries": AIServiceConfig.MAX_RETRIES,
+                "cache_enabled": AIServiceConfig.CACHE_ENABLED,
+                "cache_ttl_seconds": AIServiceConfig.CACHE_TTL_SECONDS,
+                "cache_max_bytes": AIServiceConfig.CACHE_MAX_BYTES,
+                "log_max_entries": AIServiceConfig.LOG_MAX_ENTRIES,
+                "log_max_bytes": AIServiceConfig.LOG_MAX_BYTES,
+                "log_max_age_seconds": AIServiceConfig.LOG_MAX_AGE_SECONDS
             }
         }
     except Exception as e:
@@ -5,6 +5,20 @@ from typing import Dict, List, Any, Optional
 assessments = {}
 assessment_results = {}
 
+# Result indexes: user_id -> assessment_id -> result IDs in completed_at order,
+# and assessment_id -> result IDs, so history and cascades touch matching rows only
+results_by_user: Dict[str, Dict[str, List[str]]] = {}
+results_by_assessment: Dict[str, Dict[str, None]] = {}
+
+def _index_result(result: Dict[str, Any]) -> None:
+    """Add a result to the per-user and per-assessment indexes."""
+    # A resubmitted result ID is already in both indexes
+    if result["id"] in results_by_assessment.get(result["assessment_id"], {}):
+        return
+    user_results = results_by_user.setdefault(result["user_id"], {})
+    user_results.setdefault(result["assessment_id"], []).append(result["id"])
+    results_by_assessment.setdefault(result["assessment_id"], {})[result["id"]] = None
+
 @update
 def create_assessment(title: str, description: str, skill_id: str, questions: List[Dict[str, Any]], 
                      time_limit_minutes: int, passing_score: int) -> Dict[str, Any]:
@@ -93,14 +107,14 @@ def delete_assessment(assessment_id: str) -> Dict[str, Any]:
     
     deleted_assessment = assessments.pop(assessment_id)
     
-    # Delete associated results
-    results_to_delete = []
-    for result_id, result in assessment_results.items():
-        if result["assessment_id"] == assessment_id:
-            results_to_delete.append(result_id)
-    
-    for result_id in results_to_delete:
-        assessment_results.pop(result_id)
+    # Delete associated results through the per-assessment index
+    for result_id in results_by_assessment.pop(assessment_id, {}):
+        result = assessment_results.pop(result_id)
+        user_results = results_by_user.get(result["user_id"])
+        if user_results is not None:
+            user_results.pop(assessment_id, None)
+            if not user_results:
+                del results_by_user[result["user_id"]]
     
     return {"success": True, "deleted": deleted_assessment["title"]}
 
@@ -171,6 +185,7 @@ def submit_assessment(user_id: str, assessment_id: str, answers: List[int], time
     }
     
     assessment_results[result_id] = result
+    _index_result(result)
     
     return result
 
@@ -185,13 +200,21 @@ def get_assessment_result(result_id: str) -> Dict[str, Any]:
 @query
 def get_user_assessment_results(user_id: str, assessment_id: Optional[str] = None) -> List[Dict[str, Any]]:
     """Get all assessment results for a user, optionally filtered by assessment."""
-    result = []
+    user_results = results_by_user.get(user_id, {})
     
-    for assessment_result in assessment_results.values():
-        if assessment_result["user_id"] != user_id:
-            continue
-        if assessment_id is not None and assessment_result["assessment_id"] != assessment_id:
-            continue
-        result.append(assessment_result)
+    if assessment_id is not None:
+        result_ids = user_results.get(assessment_id, [])
+    else:
+        result_ids = [result_id for ids in user_results.values() for result_id in ids]
     
-    return result
+    return [assessment_results[result_id] for result_id in result_ids]
+
+@query
+def get_user_best_result(user_id: str, assessment_id: str) -> Dict[str, Any]:
+    """Get a user's highest-scoring attempt at an assessment (earliest on ties)."""
+    result_ids = results_by_user.get(user_id, {}).get(assessment_id)
+    if not result_ids:
+        return {"error": "Assessment result not found"}
+    
+    return max((assessment_results[result_id] for result_id in result_ids),
+               key=lambda result: (result["score"], -result["completed_at"]))
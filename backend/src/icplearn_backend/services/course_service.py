@@ -1,9 +1,91 @@
 from kybra import query, update, ic
 from typing import Dict, List, Any, Optional
+import bisect
+import heapq
+import math
+import re
 
 # In-memory storage for courses (would use stable storage in production)
 courses = {}
 
+# Filter indexes for list_courses: creator_id -> course IDs, and published course IDs
+courses_by_creator: Dict[str, Dict[str, None]] = {}
+published_course_ids: Dict[str, None] = {}
+
+def _index_filters(course: Dict[str, Any]) -> None:
+    """Add a course to the creator and published indexes."""
+    courses_by_creator.setdefault(course["creator_id"], {})[course["id"]] = None
+    if course["is_published"]:
+        published_course_ids[course["id"]] = None
+
+def _unindex_filters(course: Dict[str, Any]) -> None:
+    """Remove a course from the creator and published indexes."""
+    creator_courses = courses_by_creator.get(course["creator_id"], {})
+    creator_courses.pop(course["id"], None)
+    if not creator_courses:
+        courses_by_creator.pop(course["creator_id"], None)
+    published_course_ids.pop(course["id"], None)
+
+# Full-text index over course titles and descriptions: term -> {course_id: weighted
+# term frequency}, plus per-course terms and lengths for updates and BM25 scoring
+term_postings: Dict[str, Dict[str, int]] = {}
+course_terms: Dict[str, Dict[str, int]] = {}
+course_lengths: Dict[str, int] = {}
+sorted_terms: List[str] = []  # every indexed term, for prefix lookups
+total_indexed_length = 0
+
+# Title terms count this many times toward a course's term frequencies
+TITLE_WEIGHT = 2
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def _tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric terms."""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def _index_course(course: Dict[str, Any]) -> None:
+    """Add a course's title and description terms to the search index."""
+    global total_indexed_length
+    
+    frequencies: Dict[str, int] = {}
+    for term in _tokenize(course["title"]):
+        frequencies[term] = frequencies.get(term, 0) + TITLE_WEIGHT
+    for term in _tokenize(course["description"]):
+        frequencies[term] = frequencies.get(term, 0) + 1
+    
+    for term, frequency in frequencies.items():
+        postings = term_postings.get(term)
+        if postings is None:
+            postings = term_postings[term] = {}
+            bisect.insort(sorted_terms, term)
+        postings[course["id"]] = frequency
+    
+    course_terms[course["id"]] = frequencies
+    course_lengths[course["id"]] = sum(frequencies.values())
+    total_indexed_length += course_lengths[course["id"]]
+
+def _unindex_course(course_id: str) -> None:
+    """Remove a course from the search index."""
+    global total_indexed_length
+    
+    frequencies = course_terms.pop(course_id, {})
+    for term in frequencies:
+        postings = term_postings[term]
+        postings.pop(course_id, None)
+        if not postings:
+            del term_postings[term]
+            del sorted_terms[bisect.bisect_left(sorted_terms, term)]
+    
+    total_indexed_length -= course_lengths.pop(course_id, 0)
+
+def _terms_with_prefix(prefix: str) -> List[str]:
+    """Indexed terms starting with prefix."""
+    start = bisect.bisect_left(sorted_terms, prefix)
+    end = bisect.bisect_left(sorted_terms, prefix + "\uffff")
+    return sorted_terms[start:end]
+
 @update
 def create_course(title: str, description: str, image_url: Optional[str], creator_id: str, skills: List[str]) -> Dict[str, Any]:
     """Create a new course."""
@@ -22,6 +104,8 @@ def create_course(title: str, description: str, image_url: Optional[str], creato
     }
     
     courses[course_id] = course
+    _index_filters(course)
+    _index_course(course)
     return course
 
 @update
@@ -42,12 +126,20 @@ def update_course(course_id: str, title: Optional[str] = None, description: Opti
         course["image_url"] = image_url
     if is_published is not None:
         course["is_published"] = is_published
+        if is_published:
+            published_course_ids[course_id] = None
+        else:
+            published_course_ids.pop(course_id, None)
     if skills is not None:
         course["skills"] = skills
     
     course["updated_at"] = ic.time()
     courses[course_id] = course
     
+    if title is not None or description is not None:
+        _unindex_course(course_id)
+        _index_course(course)
+    
     return course
 
 @update
@@ -57,6 +149,8 @@ def delete_course(course_id: str) -> Dict[str, Any]:
         return {"error": "Course not found"}
     
     deleted_course = courses.pop(course_id)
+    _unindex_filters(deleted_course)
+    _unindex_course(course_id)
     return {"success": True, "deleted": deleted_course["title"]}
 
 @query
@@ -70,26 +164,49 @@ def get_course(course_id: str) -> Dict[str, Any]:
 @query
 def list_courses(creator_id: Optional[str] = None, published_only: bool = False) -> List[Dict[str, Any]]:
     """List all courses, optionally filtered by creator or publication status."""
-    result = []
+    # Walk the smallest applicable index and probe the others
+    candidate_sets = []
+    if creator_id is not None:
+        candidate_sets.append(courses_by_creator.get(creator_id, {}))
+    if published_only:
+        candidate_sets.append(published_course_ids)
     
-    for course in courses.values():
-        if creator_id is not None and course["creator_id"] != creator_id:
-            continue
-        if published_only and not course["is_published"]:
-            continue
-        result.append(course)
+    if not candidate_sets:
+        return list(courses.values())
     
-    return result
+    candidate_sets.sort(key=len)
+    smallest, others = candidate_sets[0], candidate_sets[1:]
+    return [courses[course_id] for course_id in smallest
+            if all(course_id in other for other in others)]
 
 @query
-def search_courses(query: str) -> List[Dict[str, Any]]:
-    """Search courses by title or description."""
-    query = query.lower()
-    result = []
+def search_courses(query: str, skip: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Search courses by title or description, best matches first.
+    
+    Each query term also matches indexed terms it is a prefix of; results
+    are ranked by BM25 and paginated with skip/limit.
+    """
+    query_terms = set(_tokenize(query))
+    if not query_terms:
+        result = list(courses.values())
+        return result[skip:] if limit is None else result[skip:skip + limit]
+    
+    course_count = len(courses)
+    average_length = total_indexed_length / course_count if course_count else 0
+    scores: Dict[str, float] = {}
+    
+    # Only the posting lists of matching terms are visited
+    for query_term in query_terms:
+        for term in _terms_with_prefix(query_term):
+            postings = term_postings[term]
+            idf = math.log(1 + (course_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for course_id, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * course_lengths[course_id] / average_length)
+                scores[course_id] = scores.get(course_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
     
-    for course in courses.values():
-        if (query in course["title"].lower() or 
-            query in course["description"].lower()):
-            result.append(course)
+    if limit is None:
+        ranked = sorted(scores, key=lambda course_id: (-scores[course_id], course_id))[skip:]
+    else:
+        ranked = heapq.nsmallest(skip + limit, scores, key=lambda course_id: (-scores[course_id], course_id))[skip:]
     
-    return result
+    return [courses[course_id] for course_id in ranked]
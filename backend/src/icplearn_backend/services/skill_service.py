@@ -4,6 +4,21 @@ from typing import Dict, List, Any, Optional
 # In-memory storage for skills (would use stable storage in production)
 skills = {}
 
+# Adjacency index: parent skill ID (None for top-level skills) -> child IDs
+skill_children: Dict[Optional[str], Dict[str, None]] = {None: {}}
+
+def _link_child(parent_skill_id: Optional[str], skill_id: str) -> None:
+    """Record skill_id as a child of parent_skill_id."""
+    skill_children.setdefault(parent_skill_id, {})[skill_id] = None
+
+def _unlink_child(parent_skill_id: Optional[str], skill_id: str) -> None:
+    """Remove skill_id from parent_skill_id's children."""
+    children = skill_children.get(parent_skill_id)
+    if children is not None:
+        children.pop(skill_id, None)
+        if not children and parent_skill_id is not None:
+            del skill_children[parent_skill_id]
+
 @update
 def create_skill(name: str, description: str, level: int, parent_skill_id: Optional[str] = None, 
                 course_ids: Optional[List[str]] = None) -> Dict[str, Any]:
@@ -30,6 +45,7 @@ def create_skill(name: str, description: str, level: int, parent_skill_id: Optio
     }
     
     skills[skill_id] = skill
+    _link_child(parent_skill_id, skill_id)
     return skill
 
 @update
@@ -55,10 +71,18 @@ def update_skill(skill_id: str, name: Optional[str] = None, description: Optiona
         # Validate parent skill exists
         if parent_skill_id not in skills and parent_skill_id != "":
             return {"error": "Parent skill not found"}
-        # Prevent circular references
+        # Prevent circular references, including through the new parent's ancestors
         if parent_skill_id == skill_id:
             return {"error": "A skill cannot be its own parent"}
-        skill["parent_skill_id"] = parent_skill_id if parent_skill_id != "" else None
+        ancestor_id = skills[parent_skill_id]["parent_skill_id"] if parent_skill_id != "" else None
+        while ancestor_id is not None:
+            if ancestor_id == skill_id:
+                return {"error": "A skill cannot be a descendant of itself"}
+            ancestor_id = skills[ancestor_id]["parent_skill_id"]
+        new_parent_id = parent_skill_id if parent_skill_id != "" else None
+        _unlink_child(skill["parent_skill_id"], skill_id)
+        _link_child(new_parent_id, skill_id)
+        skill["parent_skill_id"] = new_parent_id
     if course_ids is not None:
         skill["course_ids"] = course_ids
     
@@ -74,11 +98,11 @@ def delete_skill(skill_id: str) -> Dict[str, Any]:
         return {"error": "Skill not found"}
     
     # Check if any skills have this as a parent
-    for other_skill in skills.values():
-        if other_skill["parent_skill_id"] == skill_id:
-            return {"error": "Cannot delete skill that is a parent to other skills"}
+    if skill_children.get(skill_id):
+        return {"error": "Cannot delete skill that is a parent to other skills"}
     
     deleted_skill = skills.pop(skill_id)
+    _unlink_child(deleted_skill["parent_skill_id"], skill_id)
     return {"success": True, "deleted": deleted_skill["name"]}
 
 @query
@@ -95,14 +119,15 @@ def list_skills(level: Optional[int] = None, parent_skill_id: Optional[str] = No
     """List all skills, optionally filtered by level, parent, or course."""
     result = []
     
-    for skill in skills.values():
+    # Filtering by parent only visits that parent's children
+    if parent_skill_id is not None:
+        candidates = (skills[child_id] for child_id in skill_children.get(parent_skill_id or None, {}))
+    else:
+        candidates = skills.values()
+    
+    for skill in candidates:
         if level is not None and skill["level"] != level:
             continue
-        if parent_skill_id is not None:
-            if parent_skill_id == "" and skill["parent_skill_id"] is not None:
-                continue
-            if parent_skill_id != "" and skill["parent_skill_id"] != parent_skill_id:
-                continue
         if course_id is not None and course_id not in skill["course_ids"]:
             continue
         result.append(skill)
@@ -110,29 +135,37 @@ def list_skills(level: Optional[int] = None, parent_skill_id: Optional[str] = No
     return result
 
 @query
-def get_skill_tree(root_skill_id: Optional[str] = None) -> List[Dict[str, Any]]:
-    """Get a hierarchical tree of skills starting from the specified root or all top-level skills."""
-    def build_tree(parent_id):
-        children = []
-        for skill in skills.values():
-            if skill["parent_skill_id"] == parent_id:
-                skill_copy = skill.copy()
-                skill_copy["children"] = build_tree(skill["id"])
-                children.append(skill_copy)
-        return children
+def get_skill_tree(root_skill_id: Optional[str] = None, max_depth: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Get a hierarchical tree of skills starting from the specified root or all top-level skills.
+    
+    max_depth limits how many levels below the roots are expanded; nodes at
+    the limit keep their child_count but get an empty children list.
+    """
+    if max_depth is not None and max_depth < 0:
+        return {"error": "Max depth cannot be negative"}
     
     if root_skill_id is not None:
         if root_skill_id not in skills:
             return {"error": "Root skill not found"}
-        root = skills[root_skill_id].copy()
-        root["children"] = build_tree(root_skill_id)
-        return [root]
+        root_ids = [root_skill_id]
     else:
         # Get all top-level skills (no parent)
-        result = []
-        for skill in skills.values():
-            if skill["parent_skill_id"] is None:
-                skill_copy = skill.copy()
-                skill_copy["children"] = build_tree(skill["id"])
-                result.append(skill_copy)
-        return result
+        root_ids = list(skill_children.get(None, {}))
+    
+    # Single pass over the requested subtrees via the adjacency index
+    result = []
+    stack = [(root_id, 0, result) for root_id in reversed(root_ids)]
+    while stack:
+        skill_id, depth, siblings = stack.pop()
+        child_ids = skill_children.get(skill_id, {})
+        
+        skill_copy = skills[skill_id].copy()
+        skill_copy["child_count"] = len(child_ids)
+        skill_copy["children"] = []
+        siblings.append(skill_copy)
+        
+        if max_depth is None or depth < max_depth:
+            for child_id in reversed(list(child_ids)):
+                stack.append((child_id, depth + 1, skill_copy["children"]))
+    
+    return result
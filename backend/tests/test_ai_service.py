@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the hybrid AI service (services/ai_service.py).
+These tests drive the service logic without deploying to ICP: kybra is
+replaced by the minimal stand-ins below, and async endpoints are stepped
+through their await points by hand.
+"""
+
+import unittest
+import importlib
+import sys
+import os
+import types
+
+# Add the src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# Stable memory survives module reloads, like a canister upgrade
+STABLE_MEMORY = {}
+
+class MockPrincipal:
+    def __init__(self, value="2vxsx-fae"):
+        self.value = value
+
+    @staticmethod
+    def from_str(value):
+        return MockPrincipal(value)
+
+    def to_str(self):
+        return self.value
+
+class MockIC:
+    def __init__(self):
+        self.time_value = 1627984000000000000  # Fixed within a message, like ic.time()
+        self.instructions = 0
+        self.timers = []
+
+    def id(self):
+        return MockPrincipal("ai-service")
+
+    def time(self):
+        return self.time_value
+
+    def performance_counter(self, counter_type):
+        self.instructions += 100  # each read costs the same few instructions
+        return self.instructions
+
+    def print(self, *args):
+        pass
+
+    def set_timer(self, delay, func):
+        self.timers.append((delay, func))
+        return len(self.timers)
+
+    def set_timer_interval(self, interval, func):
+        self.timers.append((interval, func))
+        return len(self.timers)
+
+class MockStableBTreeMap:
+    def __init__(self, memory_id, max_key_size, max_value_size):
+        self.data = STABLE_MEMORY.setdefault(memory_id, {})
+        self.max_key_size = max_key_size
+        self.max_value_size = max_value_size
+
+    def insert(self, key, value):
+        # The real map traps on oversized keys and values
+        if len(key.encode()) > self.max_key_size:
+            raise ValueError(f"key exceeds {self.max_key_size} bytes")
+        if isinstance(value, str) and len(value.encode()) > self.max_value_size:
+            raise ValueError(f"value exceeds {self.max_value_size} bytes")
+        previous = self.data.get(key)
+        self.data[key] = value
+        return previous
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def remove(self, key):
+        return self.data.pop(key, None)
+
+    def contains_key(self, key):
+        return key in self.data
+
+    def len(self):
+        return len(self.data)
+
+    def is_empty(self):
+        return not self.data
+
+    def items(self):
+        return sorted(self.data.items())
+
+    def keys(self):
+        return sorted(self.data)
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+class StableBTreeMapClass:
+    def __getitem__(self, types):
+        return MockStableBTreeMap
+
+class PendingCall:
+    """An inter-canister call or outcall an async function is awaiting."""
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.cycles = 0
+
+    def with_cycles(self, cycles):
+        self.cycles = cycles
+        return self
+
+class MockCallResult:
+    def __init__(self, Ok=None, Err=None):
+        self.Ok = Ok
+        self.Err = Err
+
+def mock_match(variant, handlers):
+    if variant.Err is not None:
+        return handlers["Err"](variant.Err)
+    return handlers["Ok"](variant.Ok)
+
+class MockService:
+    def __init__(self, canister_id):
+        self.canister_id = canister_id
+
+def mock_service_method(func):
+    return lambda self, *args: PendingCall(func.__name__, args)
+
+class MockManagementCanister:
+    def raw_rand(self):
+        return PendingCall("raw_rand", ())
+
+    def http_request(self, args):
+        return PendingCall("http_request", (args,))
+
+class Subscriptable:
+    def __getitem__(self, item):
+        return object
+
+kybra = types.ModuleType("kybra")
+kybra.StableBTreeMap = StableBTreeMapClass()
+kybra.Principal = MockPrincipal
+kybra.ic = MockIC()
+kybra.query = lambda func: func
+kybra.update = lambda func: func
+kybra.Opt = kybra.Async = kybra.Vec = Subscriptable()
+kybra.nat64 = int
+kybra.text = str
+kybra.Service = MockService
+kybra.service_update = mock_service_method
+kybra.CallResult = MockCallResult
+kybra.match = mock_match
+management = types.ModuleType("kybra.canisters.management")
+management.management_canister = MockManagementCanister()
+management.HttpResponse = management.HttpTransformArgs = dict
+# Installed again before every test, since other test modules mock kybra too
+KYBRA_MODULES = {
+    "kybra": kybra,
+    "kybra.canisters": types.ModuleType("kybra.canisters"),
+    "kybra.canisters.management": management
+}
+sys.modules.update(KYBRA_MODULES)
+
+from icplearn_backend.services import ai_service
+
+class Task:
+    """Steps a Kybra-style async generator the way the canister runtime does."""
+
+    def __init__(self, generator):
+        self.stack = [generator]
+        self.result = None
+        self.done = False
+
+    def run(self, value=None):
+        """Resume with value; returns the call awaited next, or None once finished."""
+        while self.stack:
+            try:
+                awaited = self.stack[-1].send(value)
+            except StopIteration as stop:
+                self.stack.pop()
+                value = stop.value
+                continue
+            if isinstance(awaited, types.GeneratorType):
+                self.stack.append(awaited)
+                value = None
+                continue
+            return awaited
+        self.result = value
+        self.done = True
+        return None
+
+def run_to_completion(generator, reply=lambda call: MockCallResult(Err="unavailable")):
+    """Run an async generator, answering every awaited call with reply(call)."""
+    task = Task(generator)
+    awaited = task.run()
+    while not task.done:
+        awaited = task.run(reply(awaited))
+    return task.result
+
+class AIServiceTestCase(unittest.TestCase):
+    """Fresh service state (heap and stable memory) for every test."""
+
+    def setUp(self):
+        STABLE_MEMORY.clear()
+        kybra.ic.__init__()
+        sys.modules.update(KYBRA_MODULES)
+        importlib.reload(ai_service)
+        ai_service.AIServiceConfig.ICP_LLM_CANISTER_ID = "llm-canister"
+        self.backend_calls = []
+
+    def reply(self, call):
+        """Answer the LLM canister by echoing the prompt; coalescing polls get random bytes."""
+        if call.name == "generate":
+            self.backend_calls.append(call.args[0])
+            return MockCallResult(Ok=f"answer to {call.args[0]}")
+        return MockCallResult(Ok=bytes(32))
+
+    def call(self, prompt, agent_type="general", use_cache=True):
+        return run_to_completion(ai_service._hybrid_ai_call(prompt, agent_type, None, use_cache), self.reply)
+
+class TestResponseCache(AIServiceTestCase):
+    """Cache lookups in _hybrid_ai_call."""
+
+    def test_identical_prompt_is_served_from_cache(self):
+        first = self.call("What is a canister?")
+        second = self.call("What  is a\ncanister?")
+
+        self.assertEqual(len(self.backend_calls), 1)
+        self.assertFalse(first.get("cached", False))
+        self.assertTrue(second["cached"])
+        self.assertEqual(first["response"], second["response"])
+        stats = ai_service.get_ai_service_stats()["cache"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_agent_type_is_part_of_the_key(self):
+        self.call("Explain blockchain", "tutor")
+        self.call("Explain blockchain", "validator")
+
+        self.assertEqual(len(self.backend_calls), 2)
+        self.assertEqual(ai_service.get_ai_service_stats()["cache"]["misses"], 2)
+
+    def test_entries_expire_after_ttl(self):
+        self.call("Explain blockchain")
+        kybra.ic.time_value += ai_service.AIServiceConfig.CACHE_TTL_SECONDS * 1_000_000_000
+        self.call("Explain blockchain")
+
+        self.assertEqual(len(self.backend_calls), 2)
+        self.assertEqual(ai_service.get_ai_service_stats()["cache"]["expirations"], 1)
+
+    def test_opt_out_bypasses_cache(self):
+        self.call("Explain blockchain")
+        result = self.call("Explain blockchain", use_cache=False)
+
+        self.assertEqual(len(self.backend_calls), 2)
+        self.assertFalse(result.get("cached", False))
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        ai_service.AIServiceConfig.CACHE_MAX_BYTES = 300
+        for prompt in ("first", "second", "third", "first", "fourth"):
+            self.call(prompt)
+
+        stats = ai_service.get_ai_service_stats()["cache"]
+        self.assertLessEqual(stats["bytes"], 300)
+        self.assertGreater(stats["evictions"], 0)
+        # "first" was used again before "fourth", so "second" went first
+        self.call("first")
+        self.assertEqual(self.backend_calls.count("first"), 1)
+
+class TestRequestCoalescing(AIServiceTestCase):
+    """Identical prompts arriving while the leader awaits its backend call."""
+
+    def test_follower_gets_the_leaders_result(self):
+        leader = Task(ai_service._hybrid_ai_call("Explain blockchain"))
+        backend_call = leader.run()
+        self.assertEqual(backend_call.name, "generate")
+        self.assertEqual(ai_service.get_ai_service_stats()["in_flight_prompts"], 1)
+
+        # Arrives while the leader is suspended at the inter-canister call
+        follower = Task(ai_service._hybrid_ai_call("Explain  blockchain"))
+        self.assertEqual(follower.run().name, "raw_rand")
+
+        leader.run(MockCallResult(Ok="shared answer"))
+        self.assertTrue(leader.done)
+        self.assertIsNone(follower.run(MockCallResult(Ok=bytes(32))))
+
+        self.assertEqual(follower.result["response"], "shared answer")
+        self.assertTrue(follower.result["coalesced"])
+        stats = ai_service.get_ai_service_stats()
+        self.assertEqual(stats["coalesced_calls"], 1)
+        self.assertEqual(stats["icp_llm_calls"], 1)
+        self.assertEqual(stats["in_flight_prompts"], 0)
+
+    def test_follower_waits_a_bounded_number_of_times(self):
+        leader = Task(ai_service._hybrid_ai_call("Explain blockchain"))
+        leader.run()  # never resumed, as if it trapped
+
+        follower = Task(ai_service._hybrid_ai_call("Explain blockchain"))
+        awaited = follower.run()
+        waits = 0
+        while awaited.name == "raw_rand":
+            waits += 1
+            awaited = follower.run(MockCallResult(Ok=bytes(32)))
+        self.assertEqual(waits, ai_service.AIServiceConfig.COALESCE_MAX_WAITS)
+        self.assertEqual(awaited.name, "generate")
+
+    def test_follower_stops_waiting_once_the_answer_is_cached(self):
+        answer = run_to_completion(ai_service._hybrid_ai_call("Explain blockchain", use_cache=False),
+                                   lambda call: MockCallResult(Ok="cached answer"))
+        leader = Task(ai_service._hybrid_ai_call("Explain blockchain"))
+        leader.run()
+
+        follower = Task(ai_service._hybrid_ai_call("Explain blockchain"))
+        self.assertEqual(follower.run().name, "raw_rand")
+        ai_service._cache_put(ai_service._cache_key("Explain blockchain", "general", None), answer)
+        self.assertIsNone(follower.run(MockCallResult(Ok=bytes(32))))
+        self.assertEqual(follower.result["response"], "cached answer")
+        self.assertTrue(follower.result["coalesced"])
+
+    def test_different_prompts_do_not_coalesce(self):
+        first = Task(ai_service._hybrid_ai_call("Explain blockchain"))
+        second = Task(ai_service._hybrid_ai_call("Explain canisters"))
+
+        self.assertEqual(first.run().name, "generate")
+        self.assertEqual(second.run().name, "generate")
+        self.assertEqual(ai_service.get_ai_service_stats()["in_flight_prompts"], 2)
+
+    def test_flight_is_cleared_when_the_leader_fails(self):
+        leader = Task(ai_service._hybrid_ai_call("Explain blockchain"))
+        leader.run()
+        leader.run(MockCallResult(Err="canister stopped"))
+
+        self.assertEqual(leader.result["source"], "fallback")
+        self.assertEqual(ai_service.get_ai_service_stats()["in_flight_prompts"], 0)
+
+class TestCircuitBreakers(AIServiceTestCase):
+    """Breaker state transitions of the ICP LLM backend."""
+
+    def failing_reply(self, call):
+        return MockCallResult(Err="canister stopped")
+
+    def slow_reply(self, call):
+        kybra.ic.time_value += (ai_service.AIServiceConfig.BREAKER_SLOW_CALL_MS + 1) * 1_000_000
+        return MockCallResult(Ok="late answer")
+
+    def call_with(self, reply):
+        return run_to_completion(ai_service._hybrid_ai_call("Explain blockchain", use_cache=False), reply)
+
+    def breaker(self):
+        return ai_service.get_ai_service_stats()["circuit_breakers"]["icp_llm"]
+
+    def trip(self):
+        for _ in range(ai_service.AIServiceConfig.BREAKER_MIN_CALLS):
+            self.call_with(self.failing_reply)
+
+    def test_opens_after_error_rate_is_reached(self):
+        for _ in range(ai_service.AIServiceConfig.BREAKER_MIN_CALLS - 1):
+            self.call_with(self.failing_reply)
+        self.assertEqual(self.breaker()["state"], "closed")
+
+        self.call_with(self.failing_reply)
+        self.assertEqual(self.breaker()["state"], "open")
+        self.assertEqual(self.breaker()["cooldown_seconds"], 30)
+
+        # Open: the backend is skipped without being called
+        result = self.call_with(self.reply)
+        self.assertEqual(result["source"], "fallback")
+        self.assertEqual(self.backend_calls, [])
+        self.assertEqual(self.breaker()["rejected_calls"], 1)
+
+    def test_successful_probe_closes(self):
+        self.trip()
+        kybra.ic.time_value += 30 * 1_000_000_000
+
+        probe = Task(ai_service._hybrid_ai_call("Explain blockchain", use_cache=False))
+        self.assertEqual(probe.run().name, "generate")
+        self.assertEqual(self.breaker()["state"], "half_open")
+        # Only one probe at a time
+        self.assertEqual(self.call_with(self.reply)["source"], "fallback")
+
+        probe.run(MockCallResult(Ok="recovered"))
+        self.assertEqual(probe.result["source"], "icp_llm")
+        self.assertEqual(self.breaker()["state"], "closed")
+        self.assertEqual(self.breaker()["cooldown_seconds"], 0)
+
+    def test_failed_probe_doubles_cooldown(self):
+        self.trip()
+        kybra.ic.time_value += 30 * 1_000_000_000
+        self.call_with(self.failing_reply)
+
+        self.assertEqual(self.breaker()["state"], "open")
+        self.assertEqual(self.breaker()["cooldown_seconds"], 60)
+        self.assertEqual(self.breaker()["trips"], 2)
+
+    def test_slow_calls_count_as_failures(self):
+        for _ in range(ai_service.AIServiceConfig.BREAKER_MIN_CALLS):
+            result = self.call_with(self.slow_reply)
+            self.assertEqual(result["source"], "icp_llm")
+
+        self.assertEqual(self.breaker()["state"], "open")
+        self.assertGreater(self.breaker()["trips"], 0)
+
+    def test_abandoned_probe_expires(self):
+        self.trip()
+        kybra.ic.time_value += 30 * 1_000_000_000
+        Task(ai_service._hybrid_ai_call("Explain blockchain", use_cache=False)).run()  # caller never resumes
+
+        kybra.ic.time_value += (ai_service.AIServiceConfig.BREAKER_SLOW_CALL_MS + 1) * 1_000_000
+        self.assertEqual(self.call_with(self.reply)["source"], "icp_llm")
+        self.assertEqual(self.breaker()["state"], "closed")
+
+class TestPerformanceMetrics(AIServiceTestCase):
+    """Latency percentiles and counters in get_ai_service_stats."""
+
+    def reply_after(self, latency_ms):
+        def reply(call):
+            kybra.ic.time_value += latency_ms * 1_000_000
+            kybra.ic.instructions = 5_000  # counter restarts after the await
+            return MockCallResult(Ok="an answer of twenty chars")
+        return reply
+
+    def test_percentiles_follow_awaited_latency(self):
+        for _ in range(9):
+            run_to_completion(ai_service._hybrid_ai_call("Explain blockchain", use_cache=False), self.reply_after(3))
+        run_to_completion(ai_service._hybrid_ai_call("Explain blockchain", use_cache=False), self.reply_after(1000))
+
+        metrics = ai_service.get_ai_service_stats()["performance_metrics"]
+        # Reported as the upper bound of the bucket: 3 ms -> [2, 4), 1000 ms -> [512, 1024)
+        self.assertEqual(metrics["p50_response_time_ms"], 4)
+        self.assertEqual(metrics["p95_response_time_ms"], 1024)
+        self.assertEqual(metrics["p99_response_time_ms"], 1024)
+        self.assertAlmostEqual(metrics["average_response_time_ms"], 102.7)
+        self.assertEqual(metrics["by_source"]["icp_llm"]["calls"], 10)
+
+    def test_instructions_are_counted_since_the_last_await(self):
+        run_to_completion(ai_service._hybrid_ai_call("Explain blockchain"), self.reply_after(3))
+        run_to_completion(ai_service._hybrid_ai_call("Explain blockchain"), self.reply_after(3))
+
+        by_source = ai_service.get_ai_service_stats()["performance_metrics"]["by_source"]
+        # Counter read after the await restarted it at 5000
+        self.assertEqual(by_source["icp_llm"]["average_instructions"], 5_100)
+        # The cache hit never awaited: latency 0, cost is the whole call
+        self.assertEqual(by_source["cache"]["average_instructions"], 100)
+        self.assertEqual(by_source["cache"]["average_latency_ms"], 0.0)
+        self.assertEqual(by_source["cache"]["p50_ms"], 1)
+
+    def test_counters_by_source_and_agent_type(self):
+        self.call("Explain blockchain", "tutor")
+        self.call("Explain blockchain", "tutor")
+        ai_service.AIServiceConfig.ICP_LLM_CANISTER_ID = ""
+        self.call("Grade this", "validator")
+
+        metrics = ai_service.get_ai_service_stats()["performance_metrics"]
+        self.assertEqual(metrics["by_source"]["icp_llm"]["calls"], 1)
+        self.assertEqual(metrics["by_source"]["cache"]["calls"], 1)
+        self.assertEqual(metrics["by_source"]["fallback"]["calls"], 1)
+        self.assertEqual(metrics["by_agent_type"]["tutor"]["calls"], 2)
+        self.assertEqual(metrics["total_tokens"], sum(m["tokens"] for m in metrics["by_source"].values()))
+
+    def test_reset_closes_the_window(self):
+        self.call("Explain blockchain")
+        closed = ai_service.reset_ai_service_stats()["closed_window"]
+
+        self.assertEqual(closed["total"]["calls"], 1)
+        metrics = ai_service.get_ai_service_stats()["performance_metrics"]
+        self.assertEqual(metrics["previous_window"]["total"]["calls"], 1)
+        self.assertEqual(metrics["by_source"], {})
+
+class TestInteractionLog(AIServiceTestCase):
+    """Retention, input bounds and upgrade survival of the stable AI log."""
+
+    def log_prompt(self, user_id, number):
+        ai_service._append_ai_record("prompt", {"id": f"prompt_{user_id}_{number}", "user_id": user_id,
+                                                "prompt": f"question {number}"}, user_id)
+
+    def test_size_budget_is_enforced_on_append(self):
+        ai_service.AIServiceConfig.LOG_MAX_ENTRIES = 100
+        for number in range(1000):
+            self.log_prompt("alice", number)
+            self.assertLessEqual(ai_service._log_state("entries"), 100 + ai_service.AIServiceConfig.LOG_SEGMENT_ENTRIES)
+
+        self.assertEqual(len(STABLE_MEMORY[32]), ai_service._log_state("entries"))
+        self.assertEqual(len(STABLE_MEMORY[34]), ai_service._log_state("entries"))
+        self.assertIsNone(ai_service._get_ai_record("prompt", "prompt_alice_0"))
+        self.assertEqual(ai_service._get_ai_record("prompt", "prompt_alice_999")["prompt"], "question 999")
+
+    def test_timer_keeps_trimming_until_within_age(self):
+        ai_service.AIServiceConfig.LOG_TRIM_MAX_SEGMENTS = 2
+        for number in range(10 * ai_service.AIServiceConfig.LOG_SEGMENT_ENTRIES + 1):
+            self.log_prompt("alice", number)
+        kybra.ic.time_value += (ai_service.AIServiceConfig.LOG_MAX_AGE_SECONDS + 1) * 1_000_000_000
+
+        # Run the periodic trim and every follow-up timer it schedules
+        interval, trim = kybra.ic.timers[0]
+        self.assertEqual(interval, ai_service.AIServiceConfig.LOG_TRIM_INTERVAL_SECONDS)
+        trim()
+        while len(kybra.ic.timers) > 1:
+            kybra.ic.timers.pop()[1]()
+
+        # Only the unsealed tail segment is left
+        self.assertEqual(ai_service._log_state("entries"), 1)
+
+    def test_oversized_inputs_are_truncated(self):
+        result = run_to_completion(ai_service.validate_answer("Q" * 20_000, "A", "U" * 20_000, "x" * 500, False))
+
+        prompt_id = result["prompt"]["id"]
+        self.assertLessEqual(len(prompt_id), 200)
+        logged = ai_service.get_ai_prompt(prompt_id)
+        self.assertTrue(logged["truncated"])
+        for value in STABLE_MEMORY[32].values():
+            self.assertLessEqual(len(value.encode()), ai_service.LOG_ENTRY_MAX_BYTES)
+        self.assertEqual(len(ai_service.get_user_ai_interactions("x" * 500)["responses"]), 1)
+
+    def test_user_interactions_follow_the_user_index(self):
+        for number in range(3):
+            self.log_prompt("alice", number)
+            self.log_prompt("bob", number)
+
+        prompts = ai_service.get_user_ai_interactions("alice")["prompts"]
+        self.assertEqual([prompt["id"] for prompt in prompts], [f"prompt_alice_{n}" for n in range(3)])
+        self.assertEqual(ai_service.get_user_ai_interactions("carol"), {"prompts": [], "responses": []})
+
+    def test_prompts_in_one_round_keep_their_own_entries(self):
+        # ic.time() does not advance between these calls
+        first = run_to_completion(ai_service.generate_course_content("Motoko", 2, "alice", False), self.reply)
+        second = run_to_completion(ai_service.generate_course_content("Rust", 2, "alice", False), self.reply)
+
+        self.assertNotEqual(first["prompt"]["id"], second["prompt"]["id"])
+        self.assertIn("Motoko", ai_service.get_ai_prompt(first["prompt"]["id"])["prompt"])
+        self.assertIn("Rust", ai_service.get_ai_prompt(second["prompt"]["id"])["prompt"])
+        self.assertEqual(ai_service.get_ai_response(first["response"]["id"])["prompt_id"], first["prompt"]["id"])
+
+        interactions = ai_service.get_user_ai_interactions("alice")
+        self.assertEqual(sorted(prompt["id"] for prompt in interactions["prompts"]),
+                         sorted([first["prompt"]["id"], second["prompt"]["id"]]))
+        self.assertEqual(len(interactions["responses"]), 2)
+
+    def test_log_survives_upgrade(self):
+        result = run_to_completion(ai_service.generate_course_content("Motoko", 2, "alice", False), self.reply)
+        importlib.reload(ai_service)  # heap state is rebuilt, stable maps are reattached
+        kybra.ic.timers.clear()
+
+        self.assertEqual(ai_service.get_ai_prompt(result["prompt"]["id"])["user_id"], "alice")
+        self.assertEqual(ai_service.get_ai_response(result["response"]["id"])["prompt_id"], result["prompt"]["id"])
+        self.assertEqual(len(ai_service.get_user_ai_interactions("alice")["prompts"]), 1)
+        self.assertEqual(ai_service.get_ai_service_stats()["interaction_log"]["entries"], 2)
+
+        # The trim timer is restarted by the first write after the upgrade
+        self.log_prompt("alice", 1)
+        self.assertEqual(len(kybra.ic.timers), 1)
+        self.assertEqual(len(ai_service.get_user_ai_interactions("alice")["prompts"]), 2)
+
+if __name__ == "__main__":
+    unittest.main()
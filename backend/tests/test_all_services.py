@@ -4,6 +4,7 @@ Comprehensive test script for all ICPlearn backend services
 Tests User, Assessment, Course, and Skill services
 """
 
+import re
 import subprocess
 import json
 import sys
@@ -26,6 +27,12 @@ def run_dfx_command(command):
             "returncode": -1
         }
 
+def registered_user_count():
+    """Number of registered users, as reported by list_users"""
+    result = run_dfx_command('dfx canister call icplearn_backend list_users \'(record { skip = 0 : nat64; limit = 1 : nat64 })\'')
+    match = re.search(r"total = ([\d_]+) : nat64", result["stdout"])
+    return int(match.group(1).replace("_", "")) if match else -1
+
 # User Service Tests
 def test_user_service():
     """Test User service functions"""
@@ -59,7 +66,10 @@ def test_assessment_service():
     tests = [
         ("get_assessment_by_id", 'dfx canister call icplearn_backend get_assessment_by_id \'("test_assessment")\'', 'title = "Sample Assessment"'),
         ("list_assessments", 'dfx canister call icplearn_backend list_assessments \'(record { skip = 0 : nat64; limit = 2 : nat64; skill_id = null })\'', 'total = 3 : nat64'),
-        ("submit_assessment", 'dfx canister call icplearn_backend submit_assessment \'(record { assessment_id = "test"; answers = vec { 1 : nat64; 2 : nat64 }; time_taken = 300 : nat64 })\'', 'score = 100 : nat64')
+        ("submit_assessment", 'dfx canister call icplearn_backend submit_assessment \'(record { assessment_id = "test"; answers = vec { 1 : nat64; 2 : nat64 }; time_taken = 300 : nat64 })\'', 'score = 100 : nat64'),
+        ("get_assessment_stats_unknown", 'dfx canister call icplearn_backend get_assessment_stats \'("unknown_assessment")\'', 'NotFound'),
+        ("submit_assessments_batch", 'dfx canister call icplearn_backend submit_assessments_batch \'(vec { record { assessment_id = "unknown_assessment"; answers = vec { 1 : nat64 }; time_taken = 60 : nat64 } })\'', 'processed = 1 : nat64'),
+        ("create_assessment_invalid_answer", 'dfx canister call icplearn_backend create_assessment \'(record { title = "Invalid"; description = "Out of range answer"; questions = vec { record { id = "q1"; question_text = "2 + 2?"; options = vec { "3"; "4" }; correct_answer = 5 : nat64; explanation = ""; difficulty = "beginner"; skill_id = "test" } }; time_limit = 60 : nat64; passing_score = 70 : nat64; skill_id = "test" })\'', 'InvalidInput')
     ]
     
     passed = 0
@@ -83,6 +93,8 @@ def test_course_service():
     tests = [
         ("get_course_by_id", 'dfx canister call icplearn_backend get_course_by_id \'("test_course")\'', 'title = "Sample Course"'),
         ("list_courses", 'dfx canister call icplearn_backend list_courses \'(record { skip = 0 : nat64; limit = 2 : nat64; skill_id = null; difficulty = null; published_only = null })\'', 'total = 4 : nat64'),
+        ("get_module_content_unknown", 'dfx canister call icplearn_backend get_module_content \'("unknown_course", "module_1", 0 : nat64, 100 : nat64)\'', 'NotFound'),
+        ("list_courses_invalid_projection", 'dfx canister call icplearn_backend list_courses \'(record { skip = 0 : nat64; limit = 2 : nat64; skill_id = null; difficulty = null; published_only = null; projection = opt "everything" })\'', 'InvalidInput'),
         ("enroll_course", 'dfx canister call icplearn_backend enroll_course \'(record { course_id = "test_course" })\'', 'progress_percentage = 0 : nat64'),
         ("update_course_progress", 'dfx canister call icplearn_backend update_course_progress \'(record { course_id = "test_course"; module_id = "module_1"; completed = true })\'', 'progress_percentage = 50 : nat64')
     ]
@@ -113,7 +125,9 @@ def test_skill_service():
         ("get_skill_by_id", 'dfx canister call icplearn_backend get_skill_by_id \'("test_skill")\'', 'name = "Python Programming"'),
         ("list_skills", 'dfx canister call icplearn_backend list_skills \'(record { skip = 0 : nat64; limit = 3 : nat64; category = null; difficulty = null })\'', 'total = 5 : nat64'),
         ("update_skill_progress", 'dfx canister call icplearn_backend update_skill_progress \'(record { skill_id = "test_skill"; xp_gained = 300 : nat64; activity_type = "course_completion" })\'', 'mastery_level = "intermediate"'),
-        ("get_user_skills", f'dfx canister call icplearn_backend get_user_skills \'(record {{ user_id = principal "{caller_principal}"; skip = 0 : nat64; limit = 2 : nat64; mastery_level = null }})\'', 'total = 3 : nat64')
+        ("get_user_skills", f'dfx canister call icplearn_backend get_user_skills \'(record {{ user_id = principal "{caller_principal}"; skip = 0 : nat64; limit = 2 : nat64; mastery_level = null }})\'', 'total = 3 : nat64'),
+        ("get_skill_prerequisites_unknown", 'dfx canister call icplearn_backend get_skill_prerequisites \'("unknown_skill")\'', 'NotFound'),
+        ("get_leaderboard_unknown", 'dfx canister call icplearn_backend get_leaderboard \'("unknown_skill", null, 10)\'', 'NotFound')
     ]
     
     passed = 0
@@ -182,13 +196,36 @@ def test_reward_service():
     print(f"Reward Service: {passed}/{len(tests)} tests passed\n")
     return passed, len(tests)
 
+# Storage Maintenance Tests
+def test_storage_maintenance():
+    """Test secondary index maintenance functions"""
+    print("=== Testing Storage Maintenance ===")
+    
+    tests = [
+        ("rebuild_indexes", 'dfx canister call icplearn_backend rebuild_indexes \'("skills")\'', 'Ok ='),
+        ("rebuild_indexes_unknown_store", 'dfx canister call icplearn_backend rebuild_indexes \'("unknown")\'', 'NotFound')
+    ]
+    
+    passed = 0
+    for test_name, command, expected in tests:
+        print(f"  Testing {test_name}...")
+        result = run_dfx_command(command)
+        if result["success"] and expected in result["stdout"]:
+            print(f"  ✅ {test_name} passed")
+            passed += 1
+        else:
+            print(f"  ❌ {test_name} failed")
+    
+    print(f"Storage Maintenance: {passed}/{len(tests)} tests passed\n")
+    return passed, len(tests)
+
 def test_legacy_functions():
     """Test that original functions still work"""
     print("=== Testing Legacy Functions ===")
     
     tests = [
         ("get_greeting", 'dfx canister call icplearn_backend get_greeting \'("World")\'', '"Hello, World!"'),
-        ("get_user_count", 'dfx canister call icplearn_backend get_user_count \'("dummy")\'', '42 : nat64')
+        ("get_user_count", 'dfx canister call icplearn_backend get_user_count \'("dummy")\'', f'({registered_user_count():_} : nat64)')
     ]
     
     passed = 0
@@ -218,6 +255,7 @@ def main():
         test_skill_service,
         test_ai_service,
         test_reward_service,
+        test_storage_maintenance,
         test_legacy_functions
     ]
     
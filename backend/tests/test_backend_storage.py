@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the stable-memory subsystems of the backend canister (main.py):
+secondary indexes and their rebuilds, the skill prerequisite graph,
+leaderboards, the learning path planner and the XP ledger.
+kybra is replaced by the minimal stand-ins below, so the canister logic runs
+in-process without deploying to ICP.
+"""
+
+import unittest
+import importlib
+import copy
+import sys
+import os
+import types
+
+# Add the src directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# Stable memory survives module reloads, like a canister upgrade
+STABLE_MEMORY = {}
+
+class MockPrincipal:
+    def __init__(self, value="2vxsx-fae"):
+        self.value = value
+
+    @staticmethod
+    def from_str(value):
+        return MockPrincipal(value)
+
+    @staticmethod
+    def anonymous():
+        return MockPrincipal()
+
+    def to_str(self):
+        return self.value
+
+    def __str__(self):
+        return self.value
+
+    def __eq__(self, other):
+        return isinstance(other, MockPrincipal) and other.value == self.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+class MockIC:
+    def __init__(self):
+        self.time_value = 1627984000000000000  # Fixed within a message, like ic.time()
+        self.caller_value = MockPrincipal("controller")
+        self.timers = []
+
+    def id(self):
+        return MockPrincipal("backend")
+
+    def time(self):
+        return self.time_value
+
+    def caller(self):
+        return self.caller_value
+
+    def performance_counter(self, counter_type):
+        return 0
+
+    def print(self, *args):
+        pass
+
+    def trap(self, message):
+        raise RuntimeError(message)
+
+    def set_timer(self, delay, func):
+        self.timers.append((delay, func))
+        return len(self.timers)
+
+    def set_timer_interval(self, interval, func):
+        self.timers.append((interval, func))
+        return len(self.timers)
+
+class MockStableBTreeMap:
+    def __init__(self, memory_id, max_key_size, max_value_size):
+        self.data = STABLE_MEMORY.setdefault(memory_id, {})
+        self.max_key_size = max_key_size
+
+    def insert(self, key, value):
+        # The real map traps on oversized keys; values are copied in and out
+        if len(key.encode()) > self.max_key_size:
+            raise ValueError(f"key exceeds {self.max_key_size} bytes")
+        previous = self.data.get(key)
+        self.data[key] = copy.deepcopy(value)
+        return previous
+
+    def get(self, key):
+        return copy.deepcopy(self.data.get(key))
+
+    def remove(self, key):
+        return self.data.pop(key, None)
+
+    def contains_key(self, key):
+        return key in self.data
+
+    def len(self):
+        return len(self.data)
+
+    def is_empty(self):
+        return not self.data
+
+    def items(self):
+        return [(key, copy.deepcopy(value)) for key, value in sorted(self.data.items())]
+
+    def keys(self):
+        return sorted(self.data)
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+class StableBTreeMapClass:
+    def __getitem__(self, types):
+        return MockStableBTreeMap
+
+class Subscriptable:
+    def __getitem__(self, item):
+        return object
+
+class CandidType(dict):
+    """Records and variants are plain dicts at runtime."""
+    def __init__(self, **fields):
+        super().__init__(**fields)
+
+    def __class_getitem__(cls, item):
+        return cls
+
+def mock_match(variant, handlers):
+    for key, handler in handlers.items():
+        if key in variant:
+            return handler(variant[key])
+
+class MockManagementCanister:
+    def raw_rand(self):
+        return "raw_rand"
+
+kybra = types.ModuleType("kybra")
+kybra.StableBTreeMap = StableBTreeMapClass()
+kybra.Principal = MockPrincipal
+kybra.ic = MockIC()
+kybra.Record = kybra.Variant = CandidType
+kybra.query = kybra.update = kybra.init = kybra.pre_upgrade = kybra.post_upgrade = lambda func: func
+kybra.Opt = kybra.Async = kybra.Vec = Subscriptable()
+kybra.nat64 = kybra.nat = int
+kybra.float64 = float
+kybra.text = str
+kybra.blob = bytes
+kybra.void = None
+kybra.match = mock_match
+management = types.ModuleType("kybra.canisters.management")
+management.management_canister = MockManagementCanister()
+# Installed again before every test, since other test modules mock kybra too
+KYBRA_MODULES = {
+    "kybra": kybra,
+    "kybra.canisters": types.ModuleType("kybra.canisters"),
+    "kybra.canisters.management": management
+}
+sys.modules.update(KYBRA_MODULES)
+
+from icplearn_backend import main
+
+def run_timers(limit=10_000):
+    """Run queued timer callbacks (and the ones they schedule) until none are left."""
+    runs = 0
+    while kybra.ic.timers and runs < limit:
+        _, func = kybra.ic.timers.pop(0)
+        result = func()
+        if isinstance(result, types.GeneratorType):
+            # Async callbacks here only await raw_rand
+            try:
+                result.send(None)
+                result.send({"Ok": bytes(range(32))})
+            except StopIteration:
+                pass
+        runs += 1
+    return runs
+
+class BackendTestCase(unittest.TestCase):
+    """A freshly installed canister (empty stable memory) for every test."""
+
+    def setUp(self):
+        global main
+        STABLE_MEMORY.clear()
+        kybra.ic = MockIC()
+        sys.modules.update(KYBRA_MODULES)
+        main = importlib.reload(main)
+        main.init_function()
+        run_timers()
+
+    def as_caller(self, name):
+        kybra.ic.caller_value = MockPrincipal(name)
+        return kybra.ic.caller_value
+
+    def create_skill(self, name, prerequisites=(), category="programming", difficulty="beginner"):
+        result = main.create_skill({
+            "name": name, "description": "", "category": category, "difficulty": difficulty,
+            "prerequisites": list(prerequisites), "learning_path": [], "total_xp": 1000
+        })
+        return result["Ok"]["id"]
+
+    def create_course(self, skill_id, difficulty="beginner", duration=60):
+        result = main.create_course({
+            "title": f"Course for {skill_id}", "description": "", "skill_id": skill_id,
+            "difficulty": difficulty, "estimated_duration": duration,
+            "modules": [{"id": "m1", "title": "Intro", "content": "text", "order": 0,
+                         "duration": duration, "video_url": None, "resources": []}]
+        })
+        return result["Ok"]["id"]
+
+    def list_courses(self, **filters):
+        params = {"skip": 0, "limit": 100, "skill_id": None, "difficulty": None, "published_only": None,
+                  "creator_id": None, "cursor": None, "projection": None}
+        params.update(filters)
+        return main.list_courses(params)["Ok"]
+
+    def add_xp(self, user, skill_id, xp, activity_type="course_completion"):
+        self.as_caller(user)
+        return main.update_skill_progress({"skill_id": skill_id, "xp_gained": xp, "activity_type": activity_type})
+
+    def assert_counters_match_lists(self, store):
+        """Every counter of a store equals the length of the list it counts."""
+        prefix = f"{store.name}\x00"
+        for counter_key in main.counters_storage.keys():
+            if not counter_key.startswith(prefix) or "\x00_schema\x00" in counter_key:
+                continue
+            list_prefix = counter_key[len(prefix):] + "\x00"
+            length = 0
+            entry = store.index.get(list_prefix)
+            while entry is not None and entry["next_key"] != "":
+                length += 1
+                entry = store.index.get(list_prefix + entry["next_key"])
+            self.assertEqual(main.counters_storage.get(counter_key), length, repr(counter_key))
+
+class TestIndexedStore(BackendTestCase):
+    """Index maintenance, filtered totals and batched rebuilds."""
+
+    def setUp(self):
+        super().setUp()
+        self.skill_ids = [self.create_skill(f"skill {n}") for n in range(2)]
+        self.course_ids = []
+        for n in range(12):
+            kybra.ic.time_value += 1_000_000_000
+            self.as_caller("alice" if n < 4 else "bob")
+            self.course_ids.append(self.create_course(self.skill_ids[n % 2], "beginner" if n % 3 else "advanced"))
+        self.as_caller("controller")
+
+    def test_filtered_totals_and_pages(self):
+        page = self.list_courses(skill_id=self.skill_ids[1], difficulty="beginner", limit=2)
+        self.assertEqual(page["total"], 4)
+        self.assertEqual(len(page["items"]), 2)
+        rest = self.list_courses(skill_id=self.skill_ids[1], difficulty="beginner", cursor=page["next_cursor"])
+        self.assertEqual(len(rest["items"]), 2)
+        self.assertIsNone(rest["next_cursor"])
+        self.assertEqual(self.list_courses(creator_id=MockPrincipal("alice"))["total"], 4)
+        self.assert_counters_match_lists(main.courses_store)
+
+    def test_long_index_values_fit_the_key_size(self):
+        category = "x" * 400
+        skill_id = self.create_skill("long", category=category)
+        page = main.list_skills({"skip": 0, "limit": 10, "category": category, "difficulty": None, "cursor": None})
+        self.assertEqual([skill["id"] for skill in page["Ok"]["items"]], [skill_id])
+
+    def test_long_module_ids_fit_the_key_size(self):
+        module_id = "m" * 300
+        course_id = main.create_course({
+            "title": "Long", "description": "", "skill_id": self.skill_ids[0], "difficulty": "beginner",
+            "estimated_duration": 10,
+            "modules": [{"id": module_id, "title": "Intro", "content": "body", "order": 0,
+                         "duration": 10, "video_url": None, "resources": []}]
+        })["Ok"]["id"]
+        self.assertEqual(main.get_module_content(course_id, module_id, 0, 100)["Ok"]["content"], "body")
+        main.enroll_course({"course_id": course_id})
+        progress = main.update_course_progress({"course_id": course_id, "module_id": module_id, "completed": True})
+        self.assertEqual(progress["Ok"]["completed_modules"], [module_id])
+
+    def test_rebuild_requires_a_controller(self):
+        self.as_caller("mallory")
+        result = main.rebuild_indexes("courses")
+        self.assertIn("Unauthorized", result["Err"])
+        self.as_caller("controller")
+        self.assertEqual(main.rebuild_indexes("courses"), {"Ok": 12})
+        self.assertIn("NotFound", main.rebuild_indexes("unknown")["Err"])
+
+    def test_writes_during_a_rebuild_stay_indexed(self):
+        main.INDEX_REBUILD_BATCH = main.INDEX_REBUILD_CHUNK = 2
+        main.rebuild_indexes("courses")
+        for _ in range(3):  # list, then drop part of the old entries
+            _, func = kybra.ic.timers.pop(0)
+            func()
+        self.as_caller("carol")
+        added_while_clearing = self.create_course(self.skill_ids[0])
+        main.courses_store.remove(self.course_ids[0])
+        while main.index_rebuilds_storage.get("courses")["phase"] != "link":
+            _, func = kybra.ic.timers.pop(0)
+            func()
+        _, func = kybra.ic.timers.pop(0)
+        func()  # link part of the queued records
+        kybra.ic.time_value += 1_000_000_000
+        added_while_linking = self.create_course(self.skill_ids[1])
+        main.courses_store.remove(self.course_ids[-1])
+        run_timers()
+
+        self.assertFalse(main.index_rebuilds_storage.contains_key("courses"))
+        self.assertTrue(main.index_rebuild_queue_storage.is_empty())
+        self.assertFalse(main.courses_store.needs_rebuild())
+        listed = {course["id"] for course in self.list_courses()["items"]}
+        self.assertEqual(listed, set(self.course_ids[1:-1]) | {added_while_clearing, added_while_linking})
+        self.assertEqual(self.list_courses(creator_id=MockPrincipal("carol"))["total"], 2)
+        self.assert_counters_match_lists(main.courses_store)
+
+    def test_upgrade_rebuilds_stores_without_a_schema_marker(self):
+        main.counters_storage.remove(main.courses_store._schema_key())
+        main.post_upgrade_function()
+        self.assertTrue(main.index_rebuilds_storage.contains_key("courses"))
+        run_timers()
+        self.assertFalse(main.courses_store.needs_rebuild())
+        self.assertEqual(self.list_courses()["total"], 12)
+        self.assert_counters_match_lists(main.courses_store)
+
+class TestSkillGraph(BackendTestCase):
+    """Prerequisite closures and cycle rejection."""
+
+    def test_cycles_are_rejected(self):
+        basics = self.create_skill("basics")
+        loops = self.create_skill("loops", [basics])
+        recursion = self.create_skill("recursion", [loops])
+
+        result = main.update_skill_prerequisites({"skill_id": basics, "prerequisites": [recursion]})
+        self.assertIn("cycle", result["Err"]["InvalidInput"])
+        result = main.update_skill_prerequisites({"skill_id": loops, "prerequisites": [loops]})
+        self.assertIn("cycle", result["Err"]["InvalidInput"])
+        self.assertEqual(main.get_skill_prerequisites(recursion)["Ok"], [basics, loops])
+
+    def test_dependent_closures_follow_prerequisite_changes(self):
+        basics = self.create_skill("basics")
+        syntax = self.create_skill("syntax")
+        loops = self.create_skill("loops", [basics])
+        recursion = self.create_skill("recursion", [loops])
+
+        main.update_skill_prerequisites({"skill_id": loops, "prerequisites": [syntax]})
+        self.assertEqual(main.get_skill_prerequisites(recursion)["Ok"], [syntax, loops])
+        result = main.update_skill_prerequisites({"skill_id": syntax, "prerequisites": [recursion]})
+        self.assertIn("cycle", result["Err"]["InvalidInput"])
+
+    def test_edits_wait_for_a_skills_rebuild(self):
+        basics = self.create_skill("basics")
+        loops = self.create_skill("loops", [basics])
+        recursion = self.create_skill("recursion", [loops])
+        main.rebuild_indexes("skills")
+        _, func = kybra.ic.timers.pop(0)
+        func()  # the old prerequisites index is being dropped
+
+        result = main.update_skill_prerequisites({"skill_id": basics, "prerequisites": [recursion]})
+        self.assertIn("rebuilt", result["Err"]["InvalidInput"])
+        run_timers()
+        result = main.update_skill_prerequisites({"skill_id": basics, "prerequisites": [recursion]})
+        self.assertIn("cycle", result["Err"]["InvalidInput"])
+
+    def test_upgrade_backfills_the_graph_once_in_batches(self):
+        # Skills stored before the graph existed
+        basics = self.create_skill("basics")
+        loops = self.create_skill("loops", [basics])
+        recursion = self.create_skill("recursion", [loops])
+        trees = self.create_skill("trees", [recursion, basics])
+        for skill_id in main.skill_graph_storage.keys():
+            main.skill_graph_storage.remove(skill_id)
+        for ordinal in main.skill_ordinals_storage.keys():
+            main.skill_ordinals_storage.remove(ordinal)
+        main.id_sequences_storage.remove("skill_ordinal")
+        main.counters_storage.remove(main.SKILL_GRAPH_MIGRATION_KEY)
+        main.INDEX_REBUILD_CHUNK = 2
+        main.SKILL_GRAPH_REBUILD_BATCH = 1
+
+        main.post_upgrade_function()
+        kybra.ic.timers.pop(0)[1]()  # list the skills
+        kybra.ic.timers.pop(0)[1]()  # add the first node
+        self.assertEqual(main.skill_graph_storage.len(), 1)
+        result = main.update_skill_prerequisites({"skill_id": basics, "prerequisites": []})
+        self.assertIn("rebuilt", result["Err"]["InvalidInput"])
+        run_timers()
+
+        self.assertEqual(main.skill_graph_storage.len(), 4)
+        self.assertEqual(main.get_skill_prerequisites(trees)["Ok"], [basics, loops, recursion])
+        self.assertTrue(main.counters_storage.contains_key(main.SKILL_GRAPH_MIGRATION_KEY))
+        main.post_upgrade_function()
+        self.assertFalse(main.index_rebuilds_storage.contains_key(main.SKILL_GRAPH_REBUILD))
+
+class TestLeaderboard(BackendTestCase):
+    """Treap ranks and pagination against a sorted reference."""
+
+    def test_ranks_and_pages_match_sorted_xp(self):
+        skill_id = self.create_skill("python")
+        totals = {}
+        for n in range(60):
+            user = f"user{(n * 7) % 23}"
+            self.add_xp(user, skill_id, (n * 13) % 50)
+            totals[user] = totals.get(user, 0) + (n * 13) % 50
+        expected = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+
+        entries = []
+        cursor = None
+        while True:
+            page = main.get_leaderboard(skill_id, cursor, 5)["Ok"]
+            self.assertEqual(page["total"], len(totals))
+            entries.extend(page["entries"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual([(entry["user_id"].to_str(), entry["xp"]) for entry in entries], expected)
+        for entry in entries:
+            # Ties share the rank of the first user with that XP
+            self.assertEqual(entry["rank"], 1 + sum(1 for xp in totals.values() if xp > entry["xp"]))
+            rank = main.get_user_rank(entry["user_id"], skill_id)["Ok"]
+            self.assertEqual((rank["rank"], rank["xp"]), (entry["rank"], entry["xp"]))
+
+    def test_upgrade_rebuilds_leaderboards_in_batches(self):
+        skill_id = self.create_skill("python")
+        for n in range(30):
+            self.add_xp(f"user{n}", skill_id, n * 3)
+        main.leaderboard_nodes_storage.remove(main.leaderboard_nodes_storage.keys()[0])
+        main.INDEX_REBUILD_CHUNK = main.LEADERBOARD_REBUILD_BATCH = 4
+
+        main.post_upgrade_function()
+        for _ in range(3):  # list and drop part of the old roots and nodes
+            kybra.ic.timers.pop(0)[1]()
+        self.add_xp("user0", skill_id, 5)
+        while main.index_rebuilds_storage.get(main.LEADERBOARD_REBUILD)["phase"] != "place":
+            kybra.ic.timers.pop(0)[1]()
+        kybra.ic.timers.pop(0)[1]()  # place part of the user skills
+        self.add_xp("user1", skill_id, 100)
+        self.add_xp("user29", skill_id, 1)
+        self.add_xp("newcomer", skill_id, 40)
+        run_timers()
+
+        self.assertFalse(main.index_rebuilds_storage.contains_key(main.LEADERBOARD_REBUILD))
+        self.assertEqual(main.leaderboard_nodes_storage.len(), 31)
+        page = main.get_leaderboard(skill_id, None, 100)["Ok"]
+        totals = {entry["user_id"].to_str(): entry["xp"] for entry in page["entries"]}
+        self.assertEqual(totals["user0"], 5)
+        self.assertEqual(totals["user1"], 103)
+        self.assertEqual(totals["user29"], 88)
+        self.assertEqual(totals["newcomer"], 40)
+        self.assertEqual([entry["xp"] for entry in page["entries"]], sorted(totals.values(), reverse=True))
+
+class TestLearningPathPlanner(BackendTestCase):
+    """Planner ordering over the prerequisite graph."""
+
+    def plan(self, goals, known=(), difficulty="beginner"):
+        result = main.generate_learning_path({
+            "user_skills": list(known), "learning_goals": goals, "time_commitment": 1,
+            "preferred_difficulty": difficulty, "learning_style": "visual"
+        })
+        return result["Ok"]
+
+    def test_prerequisites_come_first(self):
+        basics = self.create_skill("Basics")
+        loops = self.create_skill("Loops", [basics])
+        recursion = self.create_skill("Recursion", [loops])
+        courses = {skill_id: self.create_course(skill_id) for skill_id in (basics, loops, recursion)}
+
+        path = self.plan(["recursion"])
+        self.assertEqual(path["skill_priorities"], [basics, loops, recursion])
+        self.assertEqual(path["recommended_courses"], [courses[basics], courses[loops], courses[recursion]])
+        self.assertEqual(path["estimated_timeline"], 3)
+
+        path = self.plan(["recursion"], known=[basics])
+        self.assertEqual(path["skill_priorities"], [loops, recursion])
+
+    def test_plans_are_shared_by_learners_who_know_the_same_skills(self):
+        basics = self.create_skill("Basics")
+        loops = self.create_skill("Loops", [basics])
+        self.create_course(basics)
+        self.create_course(loops)
+
+        self.as_caller("alice")
+        first = self.plan(["loops"])
+        self.assertEqual(len(main.learning_path_cache), 1)
+        self.as_caller("bob")
+        self.assertEqual(self.plan(["loops "])["skill_priorities"], first["skill_priorities"])
+        self.assertEqual(len(main.learning_path_cache), 1)
+
+        # Completing a skill changes the learner's known set, not the shared plan
+        self.add_xp("bob", basics, main.MASTERY_XP)
+        self.assertEqual(self.plan(["loops"])["skill_priorities"], [loops])
+        self.assertEqual(len(main.learning_path_cache), 2)
+        self.as_caller("alice")
+        self.assertEqual(self.plan(["loops"])["skill_priorities"], [basics, loops])
+
+    def test_skills_outside_the_graph_are_skipped(self):
+        basics = self.create_skill("Basics", category="databases")
+        outside = self.create_skill("Sharding", category="databases")
+        main.skill_graph_storage.remove(outside)  # as for a skill beyond the graph's limits
+
+        self.assertEqual(self.plan(["databases"])["skill_priorities"], [basics])
+
+class TestXpLedger(BackendTestCase):
+    """XP event compaction into checkpoints."""
+
+    def test_checkpoints_are_rolled_up(self):
+        skill_id = self.create_skill("python")
+        user = self.as_caller("learner")
+        events = main.XP_COMPACTION_THRESHOLD * (main.XP_MAX_CHECKPOINTS + 3)
+        for n in range(events):
+            self.add_xp("learner", skill_id, n % 5)
+
+        history = main.get_xp_history(user, skill_id, None, 1000)["Ok"]
+        checkpoints = history["checkpoints"]
+        self.assertLessEqual(len(checkpoints), main.XP_MAX_CHECKPOINTS)
+
+        # Checkpoints and the remaining events still add up to every event
+        self.assertEqual(sum(checkpoint["event_count"] for checkpoint in checkpoints) + len(history["events"]), events)
+        total = sum(n % 5 for n in range(events))
+        self.assertEqual(checkpoints[-1]["total_xp"] + sum(event["amount"] for event in history["events"]), total)
+        self.assertEqual(checkpoints[0]["through_sequence"] + 1, checkpoints[0]["event_count"])
+        self.assertEqual(history["events"][0]["sequence"], checkpoints[-1]["through_sequence"] + 1)
+
+    def test_oversized_activity_types_are_rejected(self):
+        skill_id = self.create_skill("python")
+        result = self.add_xp("learner", skill_id, 10, "x" * (main.MAX_ACTIVITY_TYPE_BYTES + 1))
+        self.assertIn("Activity type", result["Err"]["InvalidInput"])
+        self.assertEqual(main.xp_events_storage.len(), 0)
+        self.assertEqual(self.add_xp("learner", skill_id, 10, "x" * main.MAX_ACTIVITY_TYPE_BYTES)["Ok"]["current_xp"], 10)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ Test script for the current basic deployment
 Tests the functions that are actually deployed and working
 """
 
+import re
 import subprocess
 import json
 import sys
@@ -26,6 +27,12 @@ def run_dfx_command(command):
             "returncode": -1
         }
 
+def registered_user_count():
+    """Number of registered users, as reported by list_users"""
+    result = run_dfx_command('dfx canister call icplearn_backend list_users \'(record { skip = 0 : nat64; limit = 1 : nat64 })\'')
+    match = re.search(r"total = ([\d_]+) : nat64", result["stdout"])
+    return int(match.group(1).replace("_", "")) if match else -1
+
 def test_get_greeting():
     """Test the get_greeting function"""
     print("Testing get_greeting function...")
@@ -43,7 +50,7 @@ def test_get_user_count():
     print("Testing get_user_count function...")
     result = run_dfx_command('dfx canister call icplearn_backend get_user_count \'("dummy")\'')
     
-    if result["success"] and "42 : nat64" in result["stdout"]:
+    if result["success"] and result["stdout"] == f"({registered_user_count():_} : nat64)":
         print("✅ get_user_count test passed")
         return True
     else:
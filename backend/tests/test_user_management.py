@@ -4,6 +4,7 @@ Test script for User Management functionality
 Tests the user registration and management functions
 """
 
+import re
 import subprocess
 import json
 import sys
@@ -26,6 +27,12 @@ def run_dfx_command(command):
             "returncode": -1
         }
 
+def registered_user_count():
+    """Number of registered users, as reported by list_users"""
+    result = run_dfx_command('dfx canister call icplearn_backend list_users \'(record { skip = 0 : nat64; limit = 1 : nat64 })\'')
+    match = re.search(r"total = ([\d_]+) : nat64", result["stdout"])
+    return int(match.group(1).replace("_", "")) if match else -1
+
 def test_register_user():
     """Test user registration function"""
     print("Testing register_user function...")
@@ -161,13 +168,32 @@ def test_list_users_pagination():
         print(f"❌ list_users pagination test failed: {result}")
         return False
 
+def test_list_users_cursor():
+    """Test list users cursor pagination"""
+    print("Testing list_users cursor pagination...")
+    
+    # First page hands back a next_cursor
+    result = run_dfx_command('dfx canister call icplearn_backend list_users \'(record { skip = 0 : nat64; limit = 1 : nat64; cursor = null })\'')    
+    if not (result["success"] and 'next_cursor = opt "' in result["stdout"]):
+        print(f"❌ list_users cursor test failed: {result}")
+        return False
+    
+    # Unknown cursors are rejected instead of silently restarting from the beginning
+    result = run_dfx_command('dfx canister call icplearn_backend list_users \'(record { skip = 0 : nat64; limit = 1 : nat64; cursor = opt "no_such_cursor" })\'')    
+    if result["success"] and 'InvalidInput = "Invalid cursor"' in result["stdout"]:
+        print("✅ list_users cursor test passed")
+        return True
+    else:
+        print(f"❌ list_users cursor test failed: {result}")
+        return False
+
 def test_existing_functions_still_work():
     """Test that existing functions still work after adding user management"""
     print("Testing existing functions still work...")
     
     tests = [
         ('get_greeting', '("TestUser")', '"Hello, TestUser!"'),
-        ('get_user_count', '("dummy")', '42 : nat64'),
+        ('get_user_count', '("dummy")', f'({registered_user_count():_} : nat64)'),
         ('get_user_by_id', '("test123")', 'username = "Test User"')
     ]
     
@@ -198,6 +224,7 @@ def main():
         test_update_user_partial,
         test_list_users,
         test_list_users_pagination,
+        test_list_users_cursor,
         test_existing_functions_still_work
     ]
     